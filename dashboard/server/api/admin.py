@@ -1,13 +1,18 @@
 from django.contrib import admin
-from .models import Device, DeviceMessage, CapturedImage, UserProfile
+from .models import AlertSubscription, Device, DeviceMessage, CapturedImage, CaptureJob, Detection, DetectionEvent, UserProfile
 
 
 @admin.register(Device)
 class DeviceAdmin(admin.ModelAdmin):
-    list_display = ("device_id", "lat", "lon", "owned_by", "created_at", "updated_at")
+    list_display = ("device_id", "lat", "lon", "owned_by", "model_path", "created_at", "updated_at")
     search_fields = ("device_id",)
     list_filter = ("created_at", "owned_by")
     readonly_fields = ("created_at", "updated_at")
+    fieldsets = (
+        (None, {"fields": ("device_id", "lat", "lon", "owned_by", "model_path")}),
+        ("Capture gate thresholds", {"fields": ("gate_min_foreground", "gate_min_brightness", "gate_min_sharpness")}),
+        ("Timestamps", {"fields": ("created_at", "updated_at")}),
+    )
 
 
 @admin.register(DeviceMessage)
@@ -22,9 +27,34 @@ class DeviceMessageAdmin(admin.ModelAdmin):
 class CapturedImageAdmin(admin.ModelAdmin):
     list_display = ("device", "animal_type", "confidence", "timestamp")
     search_fields = ("device__device_id", "animal_type")
-    list_filter = ("animal_type", "timestamp", "device")
+    list_filter = ("animal_type", "timestamp", "device", "model_version")
     readonly_fields = ("timestamp",)
-    fields = ("device", "image", "animal_type", "confidence", "timestamp")
+    fields = ("device", "image", "animal_type", "confidence", "detections", "model_version", "duplicate_of", "event", "timestamp")
+    raw_id_fields = ("duplicate_of", "event")
+
+
+@admin.register(Detection)
+class DetectionAdmin(admin.ModelAdmin):
+    list_display = ("captured_image", "animal_type", "confidence")
+    search_fields = ("captured_image__device__device_id", "animal_type")
+    list_filter = ("animal_type",)
+
+
+@admin.register(DetectionEvent)
+class DetectionEventAdmin(admin.ModelAdmin):
+    list_display = ("device", "animal_type", "frame_count", "best_confidence", "started_at", "last_seen_at")
+    search_fields = ("device__device_id", "animal_type")
+    list_filter = ("animal_type", "started_at")
+    readonly_fields = ("started_at",)
+    raw_id_fields = ("best_image",)
+
+
+@admin.register(CaptureJob)
+class CaptureJobAdmin(admin.ModelAdmin):
+    list_display = ("job_id", "device", "status", "attempts", "created_at", "finished_at")
+    search_fields = ("job_id", "device__device_id")
+    list_filter = ("status", "created_at")
+    readonly_fields = ("job_id", "created_at", "started_at", "finished_at")
 
 
 @admin.register(UserProfile)
@@ -32,3 +62,11 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "mobile_number", "home_lat", "home_lon")
     search_fields = ("user__username", "mobile_number")
     list_filter = ("user__is_active",)
+
+
+@admin.register(AlertSubscription)
+class AlertSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ("device", "user", "role", "distance")
+    search_fields = ("device__device_id", "user__username")
+    list_filter = ("role",)
+    readonly_fields = ("device", "user", "role", "distance")
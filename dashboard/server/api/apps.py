@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        # Host-specific threads/batch/input size from tune_inference, before anything reads them
+        from .tuning import apply_tuning
+
+        apply_tuning()
+
+        # The in-memory recipient table only follows profiles when alerts use it
+        from . import recipients
+
+        if recipients.is_enabled():
+            recipients.connect_signals()
+
+        # Load and warm up the model before traffic arrives (see api.warmup)
+        from .warmup import should_warm_up_process, start_warmup
+
+        if should_warm_up_process():
+            start_warmup()
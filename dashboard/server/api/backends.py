@@ -0,0 +1,441 @@
+"""
+Inference backends for the capture path.
+
+`pytorch` runs the checkpoint through ultralytics. `onnx` and `openvino` export
+the checkpoint once (cached next to it and refreshed when the checkpoint
+changes) and run it through ONNX Runtime or OpenVINO on the CPU, with the
+letterbox, box decoding and NMS done in NumPy. Every backend returns the same
+detection summaries as `inference.summarize_result`.
+
+With INFERENCE_PRECISION=int8 the exported backends load the INT8 variant that
+`python manage.py quantize_model` produced instead; it is never built on the
+fly because quantization needs calibration images.
+"""
+
+import ast
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+
+from .inference import CONFIDENCE_THRESHOLD, frame_to_image, summarize_result
+
+
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+LETTERBOX_FILL = (114, 114, 114)
+
+
+def get_image_size():
+    return getattr(settings, 'INFERENCE_IMAGE_SIZE', 384)
+
+
+def get_precision():
+    """Numeric precision of the exported model the capture path runs: fp32 or int8."""
+    return getattr(settings, 'INFERENCE_PRECISION', 'fp32') or 'fp32'
+
+
+def get_inference_threads():
+    """Intra-op threads per backend; 0 leaves the runtime default."""
+    threads = getattr(settings, 'INFERENCE_THREADS', 0)
+    if not threads:
+        threads = int(os.environ.get("OMP_NUM_THREADS", 0) or 0)
+    return threads
+
+
+# ==================== Export ====================
+
+EXPORT_FORMATS = ("onnx", "openvino")
+PRECISIONS = ("fp32", "int8")
+
+
+def exported_path(checkpoint, fmt, precision="fp32"):
+    """Where the exported model for `checkpoint` is written (ultralytics' naming for OpenVINO)."""
+    checkpoint = Path(checkpoint)
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision: {precision}")
+    int8 = precision == "int8"
+    if fmt == "onnx":
+        return checkpoint.with_suffix(".int8.onnx" if int8 else ".onnx")
+    if fmt == "openvino":
+        directory = f"{checkpoint.stem}_{'int8_' if int8 else ''}openvino_model"
+        return checkpoint.parent / directory / f"{checkpoint.stem}.xml"
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def model_artifact(checkpoint, backend, precision=None):
+    """
+    File the `backend` loads for `checkpoint`, or None when it is missing.
+    An fp32 export that is not there yet counts as available while the
+    checkpoint it is exported from exists.
+    """
+    checkpoint = Path(checkpoint)
+    if backend not in EXPORT_FORMATS:
+        return checkpoint if checkpoint.exists() else None
+    precision = precision or get_precision()
+    target = exported_path(checkpoint, backend, precision)
+    if target.exists():
+        return target
+    if precision == "fp32" and checkpoint.exists():
+        return checkpoint
+    return None
+
+
+@contextmanager
+def export_lock(target, timeout=600):
+    """Cross-process lock so only one worker exports a checkpoint at a time."""
+    lock_path = Path(f"{target}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.time() - lock_path.stat().st_mtime > timeout:
+                lock_path.unlink(missing_ok=True)  # Left behind by a crashed export
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for export lock {lock_path}")
+            time.sleep(0.5)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        lock_path.unlink(missing_ok=True)
+
+
+def is_fresh(target, checkpoint):
+    if not target.exists():
+        return False
+    if not checkpoint.exists():
+        return True  # Deployed with the export only
+    return target.stat().st_mtime >= checkpoint.stat().st_mtime
+
+
+def ensure_exported(checkpoint, fmt, imgsz=None, force=False):
+    """
+    Export `checkpoint` to `fmt` unless an up-to-date export already exists.
+    Returns the path of the exported model file.
+    """
+    checkpoint = Path(checkpoint)
+    target = exported_path(checkpoint, fmt)
+    if not force and is_fresh(target, checkpoint):
+        return target
+    if not checkpoint.exists():
+        raise FileNotFoundError(f"YOLO model not found at {checkpoint}")
+
+    with export_lock(target):
+        # Another worker may have exported while we waited for the lock
+        if not force and is_fresh(target, checkpoint):
+            return target
+
+        from ultralytics import YOLO
+        started = time.perf_counter()
+        YOLO(str(checkpoint)).export(
+            format=fmt,
+            imgsz=imgsz or get_image_size(),
+            dynamic=True,
+            half=False,
+        )
+        print(f"Exported {checkpoint.name} to {fmt} in {time.perf_counter() - started:.1f}s: {target}")
+
+    if not target.exists():
+        raise FileNotFoundError(f"Export to {fmt} did not produce {target}")
+    return target
+
+
+# ==================== Pre/post-processing ====================
+
+def letterbox(frame, size):
+    """
+    Resize a decoded BGR frame (or PIL image) to fit a `size` x `size` square,
+    keeping the aspect ratio and padding with grey. Returns the RGB uint8
+    array, the scale factor, the (left, top) padding and the original size.
+    """
+    import numpy as np
+    from PIL import Image
+
+    if isinstance(frame, np.ndarray) and frame.shape[:2] == (size, size):
+        # Already letterboxed at ingest (capture.prepare_frame)
+        return np.ascontiguousarray(frame[:, :, ::-1]), 1.0, (0, 0), (size, size)
+
+    image = frame_to_image(frame)
+
+    width, height = image.size
+    ratio = min(size / width, size / height)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    if (new_width, new_height) != (width, height):
+        image = image.resize((new_width, new_height), Image.BILINEAR)
+
+    left = (size - new_width) // 2
+    top = (size - new_height) // 2
+    canvas = Image.new("RGB", (size, size), LETTERBOX_FILL)
+    canvas.paste(image, (left, top))
+    return np.asarray(canvas), ratio, (left, top), (width, height)
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy non-maximum suppression; returns kept indices by descending score."""
+    import numpy as np
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter_w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        inter_h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = inter_w * inter_h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return keep
+
+
+class ExportedModelBackend:
+    """
+    Base class for backends that run an exported YOLO graph directly.
+    Subclasses implement `_load_runtime` and `_run` (NCHW float32 batch in,
+    raw output array out). Like every backend, `predict` takes an optional
+    input size and confidence threshold override (used by the cascade gate).
+    """
+
+    name = None
+    export_format = None
+
+    def __init__(self, checkpoint, precision="fp32"):
+        self.checkpoint = Path(checkpoint)
+        self.precision = precision
+        self.model_file = None
+        self.names = {}
+        self.task = "detect"
+        self.end2end = False
+        self.imgsz = get_image_size()
+        self.static_input = False
+
+    def load(self):
+        if self.precision == "fp32":
+            self.model_file = ensure_exported(self.checkpoint, self.export_format)
+        else:
+            self.model_file = exported_path(self.checkpoint, self.export_format, self.precision)
+            if not is_fresh(self.model_file, self.checkpoint):
+                raise FileNotFoundError(
+                    f"No up-to-date {self.precision} {self.export_format} model at {self.model_file}; "
+                    f"run: python manage.py quantize_model --backend {self.export_format}"
+                )
+        self._load_runtime()
+        if not self.static_input:
+            # Exports are dynamic: run at the configured size, not the one exported with
+            self.imgsz = get_image_size()
+        return self
+
+    def _apply_metadata(self, metadata):
+        names = metadata.get("names")
+        if isinstance(names, str):
+            names = ast.literal_eval(names)
+        if names:
+            self.names = {int(k): v for k, v in names.items()}
+
+        imgsz = metadata.get("imgsz")
+        if isinstance(imgsz, str):
+            imgsz = ast.literal_eval(imgsz)
+        if imgsz:
+            self.imgsz = max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+        self.task = metadata.get("task", self.task)
+        end2end = metadata.get("end2end", False)
+        self.end2end = end2end in (True, "True")
+
+    def predict(self, frames, imgsz=None, conf=None):
+        import numpy as np
+
+        prepared = [letterbox(frame, imgsz or self.imgsz) for frame in frames]
+        batch = np.stack([array for array, _, _, _ in prepared]).transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+        output = self._run(batch)
+        return [
+            self._decode(output[i], ratio, pad, size, conf or CONFIDENCE_THRESHOLD)
+            for i, (_, ratio, pad, size) in enumerate(prepared)
+        ]
+
+    def _label(self, class_id):
+        return self.names.get(class_id, str(class_id))
+
+    def _decode(self, output, ratio, pad, size, conf=CONFIDENCE_THRESHOLD):
+        import numpy as np
+
+        summary = {"mode": "detect", "size": size, "detections": []}
+
+        if self.task == "classify" or output.ndim == 1:
+            class_id = int(output.argmax())
+            summary["mode"] = "classify"
+            summary["detections"].append({
+                "class_id": class_id,
+                "label": self._label(class_id),
+                "confidence": float(output[class_id]),
+                "box": None,
+            })
+            return summary
+
+        if self.end2end:
+            # (max_det, 6): x1, y1, x2, y2, score, class - NMS already applied
+            rows = output[output[:, 4] > conf]
+            boxes, scores, class_ids = rows[:, :4], rows[:, 4], rows[:, 5].astype(int)
+        else:
+            # (4 + classes, anchors): cx, cy, w, h, then per-class scores
+            predictions = output.T
+            class_scores = predictions[:, 4:]
+            class_ids = class_scores.argmax(axis=1)
+            scores = class_scores[np.arange(len(class_ids)), class_ids]
+            mask = scores > conf
+            xywh, scores, class_ids = predictions[mask, :4], scores[mask], class_ids[mask]
+
+            boxes = np.empty_like(xywh)
+            boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+            boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+
+            # Offset boxes per class so NMS only suppresses within a class
+            offsets = class_ids[:, None].astype(boxes.dtype) * 7680.0
+            keep = nms(boxes + offsets, scores, IOU_THRESHOLD)[:MAX_DETECTIONS]
+            boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+
+        # Undo the letterbox and clip to the original frame
+        width, height = size
+        boxes = boxes.copy()
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / ratio).clip(0, width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / ratio).clip(0, height)
+
+        for box, score, class_id in zip(boxes.tolist(), scores.tolist(), class_ids.tolist()):
+            summary["detections"].append({
+                "class_id": int(class_id),
+                "label": self._label(int(class_id)),
+                "confidence": float(score),
+                "box": [round(v, 1) for v in box],
+            })
+        summary["detections"].sort(key=lambda d: d["confidence"], reverse=True)
+        return summary
+
+    def _load_runtime(self):
+        raise NotImplementedError
+
+    def _run(self, batch):
+        raise NotImplementedError
+
+
+# ==================== Backends ====================
+
+class PyTorchBackend:
+    """Runs the checkpoint through ultralytics (PyTorch)."""
+
+    name = "pytorch"
+
+    def __init__(self, checkpoint):
+        self.checkpoint = Path(checkpoint)
+        self.model = None
+        self._predict_lock = threading.Lock()
+
+    def load(self):
+        from ultralytics import YOLO
+
+        threads = get_inference_threads()
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+
+        self.model = YOLO(str(self.checkpoint))
+        return self
+
+    def predict(self, frames, imgsz=None, conf=None):
+        # The YOLO instance is shared by every thread of the process and its
+        # predictor keeps per-call args (imgsz, conf) and results state
+        with self._predict_lock:
+            results = self.model.predict(
+                frames, imgsz=imgsz or get_image_size(), conf=conf or CONFIDENCE_THRESHOLD, verbose=False
+            )
+            return [summarize_result(result) for result in results]
+
+
+class OnnxRuntimeBackend(ExportedModelBackend):
+    """Runs the ONNX export through ONNX Runtime's CPU execution provider."""
+
+    name = "onnx"
+    export_format = "onnx"
+
+    def _load_runtime(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = get_inference_threads()
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.session = ort.InferenceSession(
+            str(self.model_file), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.static_input = all(isinstance(dim, int) for dim in self.session.get_inputs()[0].shape[2:])
+        self._apply_metadata(self.session.get_modelmeta().custom_metadata_map)
+
+    def _run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(ExportedModelBackend):
+    """Runs the OpenVINO IR export on the CPU plugin."""
+
+    name = "openvino"
+    export_format = "openvino"
+
+    def _load_runtime(self):
+        import openvino as ov
+
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        threads = get_inference_threads()
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+
+        model = core.read_model(str(self.model_file))
+        self.static_input = model.input(0).get_partial_shape().is_static
+        self.compiled = core.compile_model(model, "CPU", config)
+        self.output = self.compiled.output(0)
+        self._run_lock = threading.Lock()
+
+        metadata_file = Path(self.model_file).parent / "metadata.yaml"
+        if metadata_file.exists():
+            import yaml
+            with open(metadata_file) as f:
+                self._apply_metadata(yaml.safe_load(f) or {})
+
+    def _run(self, batch):
+        # A compiled model's implicit infer request is not safe to share across threads
+        with self._run_lock:
+            return self.compiled(batch)[self.output]
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PyTorchBackend, OnnxRuntimeBackend, OpenVinoBackend)
+}
+
+
+def create_backend(name, checkpoint, precision=None):
+    """Instantiate (but do not load) the backend called `name` (precision default: INFERENCE_PRECISION)."""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    precision = precision or get_precision()
+    if backend_class is PyTorchBackend:
+        if precision != "fp32":
+            raise ValueError(f"{precision} models need the onnx or openvino backend, not pytorch")
+        return backend_class(checkpoint)
+    return backend_class(checkpoint, precision)
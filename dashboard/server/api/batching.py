@@ -0,0 +1,164 @@
+"""
+Dynamic micro-batching in front of the YOLO model.
+Frames that arrive within a short window are run through a single batched
+`predict` call and each result is handed back to the request that sent it.
+"""
+
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from django.conf import settings
+
+from .metrics import Histogram
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class MicroBatcher:
+    """
+    Collects frames from concurrent requests and runs them as one batch.
+
+    A single background thread waits for the first frame, then keeps pulling
+    frames until either `max_batch_size` is reached or `max_wait_ms` has
+    passed since that first frame. `predict_fn` receives the list of frames and
+    must return one result per frame, in order.
+
+    Frames may carry keyword overrides for `predict_fn` (e.g. the cascade
+    gate's `imgsz` and `conf`). A collected batch is split by overrides and
+    each group is predicted in turn on the same thread, so one model never
+    runs two batches at once.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=10):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, frame, **options):
+        """Queue a frame for inference (with `predict_fn` overrides) and return a Future for its result."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((frame, future, time.perf_counter(), tuple(sorted(options.items()))))
+        return future
+
+    def predict(self, frame, timeout=None, **options):
+        """Blocking helper: submit a frame and wait for its result."""
+        return self.submit(frame, **options).result(timeout=timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self.queue_depth(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so a pre-forked worker starts its own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._thread.start()
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+
+            groups = {}
+            for frame, future, enqueued_at, options in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self.queue_wait_ms.observe((started - enqueued_at) * 1000.0)
+                frames, futures = groups.setdefault(options, ([], []))
+                frames.append(frame)
+                futures.append(future)
+
+            for options, (frames, futures) in groups.items():
+                self._predict_group(frames, futures, dict(options))
+
+    def _predict_group(self, frames, futures, options):
+        self.batch_sizes.observe(len(frames))
+
+        try:
+            results = self.predict_fn(frames, **options)
+            if len(results) != len(frames):
+                raise RuntimeError(
+                    f"Batched predict returned {len(results)} results for {len(frames)} frames"
+                )
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+
+_batchers = {}
+_batcher_lock = threading.Lock()
+
+
+def get_batcher(model_path=None):
+    """
+    Return the process-wide batcher for a checkpoint (None = default model),
+    configured from settings. Frames are only batched with frames for the
+    same model and the same `imgsz`/`conf` overrides, but every frame for a
+    model goes through its one batcher thread.
+    """
+    key = str(model_path) if model_path else None
+    batcher = _batchers.get(key)
+    if batcher is None:
+        with _batcher_lock:
+            batcher = _batchers.get(key)
+            if batcher is None:
+                from .inference import predict_images
+                batcher = _batchers[key] = MicroBatcher(
+                    functools.partial(predict_images, model_path=model_path),
+                    max_batch_size=getattr(settings, 'INFERENCE_MAX_BATCH_SIZE', 8),
+                    max_wait_ms=getattr(settings, 'INFERENCE_MAX_WAIT_MS', 10),
+                )
+    return batcher
+
+
+def all_batchers():
+    """Batchers created in this process, keyed by checkpoint (None = default model)."""
+    return dict(_batchers)
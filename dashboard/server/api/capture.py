@@ -0,0 +1,481 @@
+"""
+Capture ingestion pipeline.
+Shared by the synchronous upload view and the background capture job worker:
+classify the frame, store it with its detection geometry, and send alerts.
+"""
+
+import io
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from . import dedup, motion, result_cache
+from .backends import LETTERBOX_FILL, get_image_size
+from .models import CaptureJob, Device, CapturedImage, Detection
+from .events import record_frame
+from .cascade import STAGE_FULL, predict_capture
+from .inference import render_annotated
+from .links import signed_path
+from .metrics import capture_outcomes, capture_queries, capture_stages, count_queries
+from .model_routing import resolve_model_path
+from .notifications import send_wildlife_alerts
+from .rendering import annotated_image_path, pack_detections, should_render_eagerly
+from .shadow import get_evaluator
+
+
+# Normalize model labels to match class labels
+ANIMAL_TYPE_MAP = {
+    "bision": "Bison",
+    "bison": "Bison",
+    "boar": "Boar",
+    "wild boar": "Boar",
+    "leopord": "Leopard",
+    "leopard": "Leopard",
+    "bear": "Bear",
+    "elephant": "Elephant",
+    "human": "Human",
+    "lion": "Lion",
+    "tiger": "Tiger",
+}
+
+
+def normalize_animal_type(animal_type):
+    """Map a raw model label onto one of the CapturedImage animal choices."""
+    normalized_key = str(animal_type).strip().lower()
+    animal_type = ANIMAL_TYPE_MAP.get(normalized_key, animal_type)
+
+    # Validate animal type
+    valid_animals = [choice[0] for choice in CapturedImage.ANIMAL_CHOICES]
+    if animal_type not in valid_animals:
+        animal_type = "Human"  # Default fallback
+    return animal_type
+
+
+def copy_detection_rows(source_id, captured_images):
+    """Unsaved copies of the Detection rows of capture `source_id` for each of `captured_images`."""
+    boxes = list(Detection.objects.filter(captured_image_id=source_id).values(
+        "animal_type", "class_id", "confidence", "x1", "y1", "x2", "y2",
+    ))
+    return [Detection(captured_image=captured_image, **box) for captured_image in captured_images for box in boxes]
+
+
+def build_detection_rows(captured_image, summary):
+    """Unsaved Detection rows for every box in a summary, for bulk_create."""
+    rows = []
+    for detection in summary["detections"]:
+        x1, y1, x2, y2 = detection["box"] or (None, None, None, None)
+        rows.append(Detection(
+            captured_image=captured_image,
+            animal_type=normalize_animal_type(detection["label"]),
+            class_id=detection["class_id"],
+            confidence=detection["confidence"],
+            x1=x1, y1=y1, x2=x2, y2=y2,
+        ))
+    return rows
+
+
+def decode_upload(image_file):
+    """
+    Decode an uploaded image once into a contiguous BGR uint8 array.
+
+    PIL reads straight from the upload (no intermediate bytes copy) and packs
+    the pixels as BGR in a single pass, the layout ultralytics, the exported
+    backends and the inference service all consume without converting again.
+    The file is rewound so storage can stream the original bytes afterwards.
+    """
+    import numpy as np
+
+    image_file.seek(0)
+    with Image.open(image_file) as image:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        width, height = image.size
+        pixels = image.tobytes("raw", "BGR")
+    image_file.seek(0)
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 3)
+
+
+def encode_annotated(frame, summary):
+    """Draw the detections onto the decoded frame and JPEG-encode the result."""
+    with capture_stages.time("plot"):
+        annotated = render_annotated(frame, summary)
+    with capture_stages.time("encode"):
+        annotated_buffer = io.BytesIO()
+        annotated.save(annotated_buffer, format='JPEG', quality=90)
+    return annotated_buffer.getvalue()
+
+
+def prepare_frame(image_file, size):
+    """
+    Decode an upload straight into a `size` x `size` letterboxed BGR frame.
+
+    JPEGs are decoded with DCT scaling (PIL draft mode) at the smallest 1/2,
+    1/4 or 1/8 scale that is still at least the target size, so a UXGA frame
+    is never fully decoded. The rest is resized, padded with grey the way the
+    predictor would, and packed as BGR. Returns the frame and the
+    `(ratio, (left, top), (width, height))` needed to map boxes back onto the
+    original. The file is rewound; the stored original is left untouched.
+    """
+    import numpy as np
+
+    image_file.seek(0)
+    with Image.open(image_file) as image:
+        width, height = image.size
+        ratio = min(size / width, size / height)
+        new_size = (round(width * ratio), round(height * ratio))
+
+        image.draft("RGB", new_size)  # No-op for formats without DCT scaling
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.size != new_size:
+            image = image.resize(new_size, Image.BILINEAR)
+
+        pad = ((size - new_size[0]) // 2, (size - new_size[1]) // 2)
+        canvas = Image.new("RGB", (size, size), LETTERBOX_FILL)
+        canvas.paste(image, pad)
+        pixels = canvas.tobytes("raw", "BGR")
+    image_file.seek(0)
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(size, size, 3), (ratio, pad, (width, height))
+
+
+def restore_summary(summary, transform):
+    """Map a summary computed on a `prepare_frame` frame back to original pixels."""
+    ratio, (left, top), (width, height) = transform
+    for detection in summary["detections"]:
+        if detection["box"] is not None:
+            x1, y1, x2, y2 = detection["box"]
+            detection["box"] = [
+                round(min(max((x1 - left) / ratio, 0.0), width), 1),
+                round(min(max((y1 - top) / ratio, 0.0), height), 1),
+                round(min(max((x2 - left) / ratio, 0.0), width), 1),
+                round(min(max((y2 - top) / ratio, 0.0), height), 1),
+            ]
+    summary["size"] = (width, height)
+    return summary
+
+
+def content_box(transform):
+    """Box `(left, top, right, bottom)` of the picture inside a `prepare_frame` frame."""
+    ratio, (left, top), (width, height) = transform
+    return (left, top, left + round(width * ratio), top + round(height * ratio))
+
+
+def should_preresize():
+    return getattr(settings, 'CAPTURE_PRERESIZE_ENABLED', True)
+
+
+def load_frame(image_file):
+    """
+    Decode an upload for inference: the pre-resized model input and its
+    transform, or the full-resolution frame and None when pre-resizing is off.
+    """
+    if should_preresize():
+        return prepare_frame(image_file, get_image_size())
+    return decode_upload(image_file), None
+
+
+def run_inference(image_file):
+    """
+    Decode an upload once and run inference on it; returns (frame, summary).
+    The summary is always in original image coordinates.
+    """
+    frame, transform = load_frame(image_file)
+
+    # Run inference (cascade gate, inference service, micro-batcher or in-process model)
+    summary = predict_capture(frame)
+    if transform is not None:
+        summary = restore_summary(summary, transform)
+    return frame, summary
+
+
+def annotate(image_file, frame, summary):
+    """Annotated JPEG bytes for a summary (the original upload for classification)."""
+    if summary["mode"] == "classify":
+        # For classification, annotated image is same as original
+        image_data = image_file.read()
+        image_file.seek(0)
+        return image_data
+    if (frame.shape[1], frame.shape[0]) != tuple(summary["size"]):
+        # Pre-resized model input: draw on the full-resolution original instead
+        with capture_stages.time("decode_original"):
+            frame = decode_upload(image_file)
+    # Detection mode - draw bounding boxes onto the frame
+    return encode_annotated(frame, summary)
+
+
+def classify_image(image_file):
+    """Run YOLO classification on the image and return annotated image."""
+    # Decode once; the same buffer feeds inference and annotation
+    frame, summary = run_inference(image_file)
+
+    if not summary["detections"]:
+        return None, 0.0, None
+
+    best = summary["detections"][0]
+    return best["label"], best["confidence"], annotate(image_file, frame, summary)
+
+
+def no_detection_payload(device_id, skipped_reason=None):
+    payload = {
+        "status": "no_detection",
+        "message": "No animal detected in the image",
+        "data": {
+            "device_id": device_id,
+            "animal_type": None,
+            "confidence": 0.0,
+            "timestamp": None
+        }
+    }
+    if skipped_reason is not None:
+        payload["message"] = "Frame skipped before classification"
+        payload["data"]["skipped_reason"] = skipped_reason
+    return payload
+
+
+def build_capture_payload(captured_image, build_absolute_uri, message):
+    """Success response payload for a stored capture."""
+    image_url = None
+    annotated_url = None
+    if captured_image.image:
+        image_url = build_absolute_uri(captured_image.image.url)
+    annotated_path = annotated_image_path(captured_image)
+    if annotated_path:
+        annotated_url = build_absolute_uri(annotated_path)
+
+    return {
+        "status": "success",
+        "message": message,
+        "data": {
+            "id": captured_image.id,
+            "device_id": captured_image.device.device_id,
+            "animal_type": captured_image.animal_type,
+            "confidence": captured_image.confidence,
+            "confidence_percentage": f"{captured_image.confidence * 100:.2f}%",
+            "timestamp": captured_image.timestamp.isoformat(),
+            "image_url": image_url,
+            "annotated_image_url": annotated_url
+        }
+    }
+
+
+def ingest_duplicate(original_id, build_absolute_uri, job=None):
+    """
+    Store a burst duplicate as a reference to its original capture, reusing
+    the original's image and classification. Its Detection rows are copied
+    from the original so box filters find it too. Returns None if the
+    original is gone (the caller then runs inference as usual).
+    """
+    original = CapturedImage.objects.select_related('device').filter(pk=original_id).first()
+    if original is None:
+        return None
+
+    with transaction.atomic():
+        captured_image = CapturedImage.objects.create(
+            device=original.device,
+            image=original.image.name,
+            annotated_image=original.annotated_image.name or None,
+            animal_type=original.animal_type,
+            confidence=original.confidence,
+            detections=original.detections,
+            model_version=original.model_version,
+            duplicate_of=original
+        )
+        Detection.objects.bulk_create(copy_detection_rows(original.id, [captured_image]))
+        _link_job(job, captured_image)
+
+    # Counts towards the visit, but no alerts: the original frame's event has them
+    event, _ = record_frame(captured_image)
+
+    payload = build_capture_payload(
+        captured_image, build_absolute_uri, "Near-duplicate frame, reused previous classification"
+    )
+    payload["data"]["duplicate_of"] = original.id
+    payload["data"]["event_id"] = event.id
+    return payload
+
+
+def lookup_retry(device_id, image_file):
+    """
+    Payload of an earlier byte-identical upload from this device, if cached,
+    and the upload's cache key: `(payload or None, key or None)`. Pass the
+    key on to `ingest_capture` so the upload is only hashed once.
+    """
+    if not result_cache.is_enabled():
+        return None, None
+    with capture_stages.time("retry_lookup"):
+        key = result_cache.cache_key(device_id, image_file)
+        payload = result_cache.get_cache().get(key)
+    if payload is not None:
+        payload["cached"] = True
+        capture_outcomes.inc("cached")
+    return payload, key
+
+
+def ingest_capture(device_id, image_file, build_absolute_uri, stored_image_name=None, job=None, retry_key=None):
+    """
+    Classify a captured frame, store it and send wildlife alerts.
+
+    A byte-identical retry of an upload from the same device returns the
+    original payload, marked `"cached": true`, without doing any of that.
+
+    Args:
+        device_id: Device identifier sent with the upload
+        image_file: Uploaded or stored image file
+        build_absolute_uri: Callable turning a media URL into an absolute URL
+        stored_image_name: Storage name of an already saved copy of the
+            upload; when given it is reused instead of writing the file again
+        job: CaptureJob being processed; the stored capture is linked to it
+            in the insert transaction so a retry can tell it was stored
+        retry_key: Result cache key from `lookup_retry`; computed here
+            (hashing the upload) when not given
+
+    Returns:
+        Response payload dict with `status`, `message` and `data`
+    """
+    outcome = "error"
+    with count_queries() as counter, capture_stages.time("total"):
+        try:
+            if not result_cache.is_enabled():
+                payload = _ingest_capture(device_id, image_file, build_absolute_uri, stored_image_name, job)
+            else:
+                payload, hit = result_cache.get_cache().get_or_compute(
+                    retry_key or result_cache.cache_key(device_id, image_file),
+                    lambda: _ingest_capture(device_id, image_file, build_absolute_uri, stored_image_name, job),
+                )
+                if hit:
+                    payload["cached"] = True
+            outcome = capture_outcome(payload)
+        finally:
+            capture_outcomes.inc(outcome)
+            capture_queries.observe(counter["queries"])
+    return payload
+
+
+def capture_outcome(payload):
+    """Metrics label for how a capture was handled."""
+    data = payload.get("data", {})
+    if payload.get("cached"):
+        return "cached"
+    if data.get("skipped_reason"):
+        return "skipped"
+    if data.get("duplicate_of"):
+        return "duplicate"
+    return payload["status"]
+
+
+def _link_job(job, captured_image):
+    """Record the stored capture on its job; call inside the insert transaction."""
+    if job is not None:
+        CaptureJob.objects.filter(pk=job.pk).update(captured_image=captured_image)
+        job.captured_image_id = captured_image.id
+
+
+def _ingest_capture(device_id, image_file, build_absolute_uri, stored_image_name, job=None):
+    # The device decides which checkpoint classifies its frames
+    device = Device.objects.filter(device_id=device_id).first()
+    model_path = resolve_model_path(device)
+
+    with capture_stages.time("decode"):
+        frame, transform = load_frame(image_file)
+
+    # Dark, blurred or unchanged frames are not worth a model pass
+    if motion.is_enabled():
+        box = content_box(transform) if transform is not None else None
+        with capture_stages.time("quality_gate"):
+            skipped_reason = motion.get_gate().check(device_id, frame, device, box)
+        if skipped_reason is not None:
+            return no_detection_payload(device_id, skipped_reason)
+
+    # Near-identical frames of a burst reuse the earlier classification
+    frame_hash = None
+    if dedup.is_enabled():
+        index = dedup.get_index()
+        with capture_stages.time("dedup"):
+            frame_hash = dedup.difference_hash(frame)
+            reference = index.find(device_id, frame_hash)
+        if reference == dedup.NO_DETECTION:
+            index.mark_skipped()
+            return no_detection_payload(device_id)
+        if reference is not None:
+            payload = ingest_duplicate(reference, build_absolute_uri, job)
+            if payload is not None:
+                index.mark_skipped()
+                return payload
+            index.forget(device_id, reference)
+
+    # Run YOLO classification (cascade gate, inference service, micro-batcher or in-process model)
+    with capture_stages.time("predict"):
+        summary = predict_capture(frame, model_path)
+
+    # Candidate model, if any, sees the same default-model frames off the request path
+    evaluator = get_evaluator()
+    if evaluator is not None and model_path is None and summary.get("cascade_stage", STAGE_FULL) == STAGE_FULL:
+        evaluator.submit(frame, summary)
+
+    if transform is not None:
+        summary = restore_summary(summary, transform)
+
+    # Handle no detection
+    if not summary["detections"]:
+        if frame_hash is not None:
+            dedup.get_index().record(device_id, frame_hash, dedup.NO_DETECTION)
+        return no_detection_payload(device_id)
+
+    best = summary["detections"][0]
+    animal_type = normalize_animal_type(best["label"])
+    confidence = best["confidence"]
+
+    # Get or create device
+    if device is None:
+        device, _ = Device.objects.get_or_create(device_id=device_id)
+
+    # Save captured image with its detection geometry; the annotated image is
+    # rendered on first request unless eager rendering is configured
+    captured_image = CapturedImage(
+        device=device,
+        animal_type=animal_type,
+        confidence=confidence,
+        detections=pack_detections(summary),
+        model_version=summary.get("model_version", "")
+    )
+    with capture_stages.time("storage"):
+        if stored_image_name:
+            captured_image.image = stored_image_name
+        else:
+            captured_image.image.save(image_file.name, image_file, save=False)
+
+    with capture_stages.time("db_insert"), transaction.atomic():
+        captured_image.save()
+
+        # Keep every box, not just the best one
+        Detection.objects.bulk_create(build_detection_rows(captured_image, summary))
+        _link_job(job, captured_image)
+
+    if should_render_eagerly():
+        annotated_filename = f"annotated_{captured_image.id}.jpg"
+        annotated_content = ContentFile(annotate(image_file, frame, summary))
+        with capture_stages.time("storage"):
+            captured_image.annotated_image.save(annotated_filename, annotated_content, save=True)
+
+    if frame_hash is not None:
+        dedup.get_index().record(device_id, frame_hash, captured_image.id)
+
+    # Build response
+    payload = build_capture_payload(
+        captured_image, build_absolute_uri, "Image captured and classified"
+    )
+
+    # One alert fan-out per animal visit; later frames only update the event
+    with capture_stages.time("event"):
+        event, created = record_frame(captured_image)
+    payload["data"]["event_id"] = event.id
+    if created:
+        # Send wildlife alerts (WhatsApp to nearby users, call to device owner).
+        # The event image link always shows the visit's best frame so far and
+        # is signed, so recipients need no account and pks cannot be walked
+        event_image_url = build_absolute_uri(signed_path("detection_event_image", event))
+        with capture_stages.time("alert_dispatch"):
+            send_wildlife_alerts(device, animal_type, confidence, event_image_url)
+
+    return payload
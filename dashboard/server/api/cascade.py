@@ -0,0 +1,196 @@
+"""
+Cascade inference for capture frames.
+
+Most trap frames are empty or easy. When CASCADE_ENABLED is set, each frame
+first goes through a cheap gate: CASCADE_GATE_MODEL_PATH (a small
+checkpoint), or the capture model itself at CASCADE_GATE_IMAGE_SIZE. The gate
+runs with CASCADE_LOW_CONFIDENCE as its threshold:
+
+- nothing at or above the low threshold: the frame is empty, no full pass;
+- a top detection at or above CASCADE_HIGH_CONFIDENCE: the gate result is used;
+- anything in between is uncertain and goes to the full detector.
+
+A sample of the frames the gate decided on (CASCADE_AUDIT_RATE) also runs the
+full model off the request path, so `stats()` shows how often the gate
+disagrees (missed animals, different top label) next to the per-stage hit
+rates and latencies.
+"""
+
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+from .metrics import Histogram
+
+
+STAGE_GATE_EMPTY = "gate_empty"
+STAGE_GATE_ACCEPTED = "gate_accepted"
+STAGE_FULL = "full"
+
+LATENCY_BUCKETS_MS = (2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+AUDIT_MAX_PENDING = 2
+
+
+class Cascade:
+    """Gate-then-full predictor with per-stage counters, latencies and recall audit."""
+
+    def __init__(self, gate_model_path, gate_image_size, low, high, audit_rate):
+        self.gate_model_path = gate_model_path or None
+        self.gate_image_size = gate_image_size
+        self.low = low
+        self.high = high
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self._audit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cascade-audit")
+        self._audit_pending = 0
+        self.counters = {
+            "frames": 0,
+            STAGE_GATE_EMPTY: 0,
+            STAGE_GATE_ACCEPTED: 0,
+            STAGE_FULL: 0,
+            "audited": 0,
+            "audit_dropped": 0,
+            "audit_missed": 0,
+            "audit_label_mismatch": 0,
+            "audit_errors": 0,
+        }
+        self._latency = {
+            "gate": Histogram(LATENCY_BUCKETS_MS),
+            "full": Histogram(LATENCY_BUCKETS_MS),
+            "total": Histogram(LATENCY_BUCKETS_MS),
+        }
+
+    def predict_gate(self, frame, model_path=None):
+        """Gate pass; `model_path` is the frame's full model, used when there is no gate checkpoint."""
+        from .inference import predict_frame
+
+        # Same dispatch as the full pass (service, batcher or direct), so the
+        # gate model lives wherever the full model does
+        return predict_frame(
+            frame,
+            self.gate_model_path or model_path,
+            imgsz=None if self.gate_model_path else self.gate_image_size,
+            conf=self.low,
+        )
+
+    def predict(self, frame, model_path=None):
+        """Summary for `frame` in frame coordinates, tagged with the `cascade_stage` that decided it."""
+        from .inference import CONFIDENCE_THRESHOLD, predict_frame
+
+        started = time.perf_counter()
+        gate = self.predict_gate(frame, model_path)
+        gate_ms = (time.perf_counter() - started) * 1000
+        self._latency["gate"].observe(gate_ms)
+
+        top = gate["detections"][0]["confidence"] if gate["detections"] else 0.0
+        if top < self.low:
+            stage, summary = STAGE_GATE_EMPTY, dict(gate, detections=[])
+        elif top >= self.high:
+            # Keep the usual threshold for the secondary detections of an accepted frame
+            detections = [d for d in gate["detections"] if d["confidence"] >= CONFIDENCE_THRESHOLD]
+            stage, summary = STAGE_GATE_ACCEPTED, dict(gate, detections=detections)
+        else:
+            full_started = time.perf_counter()
+            summary = predict_frame(frame, model_path)
+            self._latency["full"].observe((time.perf_counter() - full_started) * 1000)
+            stage = STAGE_FULL
+
+        self._latency["total"].observe((time.perf_counter() - started) * 1000)
+        with self._lock:
+            self.counters["frames"] += 1
+            self.counters[stage] += 1
+
+        if stage != STAGE_FULL and self.audit_rate and random.random() < self.audit_rate:
+            self._submit_audit(frame, model_path, stage, summary)
+
+        summary["cascade_stage"] = stage
+        return summary
+
+    def _submit_audit(self, frame, model_path, stage, summary):
+        with self._lock:
+            if self._audit_pending >= AUDIT_MAX_PENDING:
+                self.counters["audit_dropped"] += 1
+                return
+            self._audit_pending += 1
+        gate_label = summary["detections"][0]["label"] if summary["detections"] else None
+        self._audit_executor.submit(self._audit, frame, model_path, stage, gate_label)
+
+    def _audit(self, frame, model_path, stage, gate_label):
+        from .inference import predict_frame
+
+        try:
+            full = predict_frame(frame, model_path)
+            full_label = full["detections"][0]["label"] if full["detections"] else None
+            with self._lock:
+                self.counters["audited"] += 1
+                if stage == STAGE_GATE_EMPTY and full_label is not None:
+                    self.counters["audit_missed"] += 1
+                elif stage == STAGE_GATE_ACCEPTED and full_label != gate_label:
+                    self.counters["audit_label_mismatch"] += 1
+        except Exception:
+            traceback.print_exc()
+            with self._lock:
+                self.counters["audit_errors"] += 1
+        finally:
+            with self._lock:
+                self._audit_pending -= 1
+
+    def stats(self):
+        latency = {name: histogram.snapshot() for name, histogram in self._latency.items()}
+        with self._lock:
+            counters = dict(self.counters)
+            pending = self._audit_pending
+
+        frames = counters["frames"]
+        resolved = counters[STAGE_GATE_EMPTY] + counters[STAGE_GATE_ACCEPTED]
+        full_mean_ms = latency["full"]["mean"]
+        return {
+            "gate_model_path": str(self.gate_model_path) if self.gate_model_path else None,
+            "gate_image_size": None if self.gate_model_path else self.gate_image_size,
+            "low_confidence": self.low,
+            "high_confidence": self.high,
+            "audit_rate": self.audit_rate,
+            **counters,
+            "audit_pending": pending,
+            "gate_resolved_ratio": round(resolved / frames, 4) if frames else 0.0,
+            "mean_cost_ms": latency["total"]["mean"],
+            # What every frame would cost without the gate, from the frames that went to the full model
+            "full_only_cost_ms": full_mean_ms,
+            "cost_ratio": round(latency["total"]["mean"] / full_mean_ms, 4) if full_mean_ms else None,
+            "latency_ms": latency,
+        }
+
+
+_cascade = None
+_cascade_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, 'CASCADE_ENABLED', False)
+
+
+def get_cascade():
+    global _cascade
+    if _cascade is None:
+        with _cascade_lock:
+            if _cascade is None:
+                _cascade = Cascade(
+                    gate_model_path=getattr(settings, 'CASCADE_GATE_MODEL_PATH', ''),
+                    gate_image_size=getattr(settings, 'CASCADE_GATE_IMAGE_SIZE', 192),
+                    low=getattr(settings, 'CASCADE_LOW_CONFIDENCE', 0.1),
+                    high=getattr(settings, 'CASCADE_HIGH_CONFIDENCE', 0.7),
+                    audit_rate=getattr(settings, 'CASCADE_AUDIT_RATE', 0.02),
+                )
+    return _cascade
+
+
+def predict_capture(frame, model_path=None):
+    """Capture-path predictor: the cascade when enabled, otherwise the full model."""
+    from .inference import predict_frame
+
+    if is_enabled():
+        return get_cascade().predict(frame, model_path)
+    return predict_frame(frame, model_path)
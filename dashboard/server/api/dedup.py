@@ -0,0 +1,137 @@
+"""
+Burst deduplication of capture frames.
+
+PIR-triggered cameras send bursts of near-identical frames. Each frame that
+goes through inference is remembered per device by its perceptual hash (a
+64-bit difference hash); a later frame from the same device within the time
+window whose hash differs by at most the threshold bits reuses that
+classification instead of running the model again.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from django.conf import settings
+
+
+HASH_SIZE = 8
+MAX_ENTRIES_PER_DEVICE = 32
+
+# Reference recorded for frames in which the model found nothing
+NO_DETECTION = "no_detection"
+
+
+def difference_hash(frame):
+    """64-bit dHash of a decoded BGR frame: sign of horizontal gradients on a 9x8 greyscale thumbnail."""
+    from PIL import Image
+    from .inference import frame_to_image
+
+    image = frame_to_image(frame)
+    # Cheap box reduce first so the final resample works on a small image
+    factor = max(1, min(image.width // (HASH_SIZE * 8), image.height // (HASH_SIZE * 8)))
+    if factor > 1:
+        image = image.reduce(factor)
+    pixels = list(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR).getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BurstIndex:
+    """
+    Thread-safe per-device index of recently classified frames.
+
+    Only frames that actually ran inference are recorded, and the window is
+    measured from that frame, so a long burst is re-checked by the model at
+    least once per window instead of drifting along a chain of duplicates.
+    """
+
+    def __init__(self, threshold, window_seconds):
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self._entries = defaultdict(lambda: deque(maxlen=MAX_ENTRIES_PER_DEVICE))
+        self._lock = threading.Lock()
+        self.counters = {"checked": 0, "skipped": 0, "recorded": 0}
+
+    def _prune(self, entries, now):
+        while entries and now - entries[0][1] > self.window_seconds:
+            entries.popleft()
+
+    def find(self, device_id, frame_hash):
+        """Return the closest recent entry's reference for this device, or None."""
+        now = time.monotonic()
+        with self._lock:
+            self.counters["checked"] += 1
+            entries = self._entries.get(device_id)
+            if not entries:
+                return None
+            self._prune(entries, now)
+
+            best = None
+            for entry_hash, _, reference in entries:
+                distance = hamming_distance(entry_hash, frame_hash)
+                if distance <= self.threshold and (best is None or distance < best[0]):
+                    best = (distance, reference)
+            return None if best is None else best[1]
+
+    def mark_skipped(self):
+        """Count a frame whose inference was skipped because of a match."""
+        with self._lock:
+            self.counters["skipped"] += 1
+
+    def record(self, device_id, frame_hash, reference):
+        """Remember a classified frame. `reference` is what `find` hands back."""
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries[device_id]
+            self._prune(entries, now)
+            entries.append((frame_hash, now, reference))
+            self.counters["recorded"] += 1
+
+    def forget(self, device_id, reference):
+        """Drop entries pointing at `reference` (e.g. the record was deleted)."""
+        with self._lock:
+            entries = self._entries.get(device_id)
+            if entries:
+                kept = [entry for entry in entries if entry[2] != reference]
+                entries.clear()
+                entries.extend(kept)
+
+    def stats(self):
+        with self._lock:
+            checked = self.counters["checked"]
+            return {
+                **self.counters,
+                "skip_ratio": round(self.counters["skipped"] / checked, 4) if checked else 0.0,
+                "devices": len(self._entries),
+                "threshold": self.threshold,
+                "window_seconds": self.window_seconds,
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, 'CAPTURE_DEDUP_ENABLED', True)
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = BurstIndex(
+                    threshold=getattr(settings, 'CAPTURE_DEDUP_THRESHOLD', 6),
+                    window_seconds=getattr(settings, 'CAPTURE_DEDUP_WINDOW_SECONDS', 10),
+                )
+    return _index
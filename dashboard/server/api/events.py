@@ -0,0 +1,64 @@
+"""
+Detection events: one record per animal visit at a device.
+
+Frames of the same species from the same device are merged into the open
+event while they keep arriving within `DETECTION_EVENT_WINDOW_SECONDS` of
+the previous one. Only the frame that opens an event triggers alerts; later
+frames bump the frame count and replace the best frame when more confident.
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Device, DetectionEvent
+
+
+def get_event_window():
+    return timedelta(seconds=getattr(settings, 'DETECTION_EVENT_WINDOW_SECONDS', 120))
+
+
+def record_frame(captured_image):
+    """
+    Attach a stored frame to its device's open event for the species, or open
+    a new one. Returns `(event, created)`; alert only when `created` is True.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Row lock on the device serializes frames from concurrent workers
+        Device.objects.select_for_update().filter(pk=captured_image.device_id).first()
+
+        event = (
+            DetectionEvent.objects
+            .filter(
+                device_id=captured_image.device_id,
+                animal_type=captured_image.animal_type,
+                last_seen_at__gte=now - get_event_window(),
+            )
+            .order_by('-last_seen_at')
+            .first()
+        )
+
+        created = event is None
+        if created:
+            event = DetectionEvent.objects.create(
+                device_id=captured_image.device_id,
+                animal_type=captured_image.animal_type,
+                last_seen_at=now,
+                best_confidence=captured_image.confidence,
+                best_image=captured_image,
+            )
+        else:
+            event.frame_count += 1
+            event.last_seen_at = now
+            update_fields = ['frame_count', 'last_seen_at']
+            if captured_image.confidence > event.best_confidence:
+                event.best_confidence = captured_image.confidence
+                event.best_image = captured_image
+                update_fields += ['best_confidence', 'best_image']
+            event.save(update_fields=update_fields)
+
+        captured_image.event = event
+        captured_image.save(update_fields=['event'])
+    return event, created
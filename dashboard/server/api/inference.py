@@ -0,0 +1,444 @@
+"""
+YOLO inference for the capture path.
+Loads each checkpoint once per worker process and shares it across requests,
+and reduces ultralytics results to plain detection dicts that can be passed
+between threads and processes.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent.parent.parent.parent / "best_models" / "best.pt"
+CONFIDENCE_THRESHOLD = 0.25
+
+
+def get_rss_bytes():
+    """Return the resident set size of the current process in bytes (0 if unknown)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        import os
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def checkpoint_signature(path):
+    """Identity of a checkpoint file on disk; changes when the file is replaced."""
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def model_version(path):
+    """Version label for a checkpoint: a short hash of its content, so a copy keeps its version."""
+    import hashlib
+
+    path = Path(path)
+    if not path.exists():
+        return path.stem  # Deployed with an exported model only
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()[:12]
+
+
+def dummy_frame():
+    """Blank letterbox-grey frame at the model input size, for warm-up runs."""
+    import numpy as np
+    from .backends import LETTERBOX_FILL, get_image_size
+
+    size = get_image_size()
+    return np.full((size, size, 3), LETTERBOX_FILL, dtype=np.uint8)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models keyed by backend and checkpoint path.
+
+    DRF builds a new view instance per request, so models must not live on the
+    view. The registry loads a checkpoint the first time it is asked for and
+    hands the same instance to every later caller. Loads are serialised with a
+    per-checkpoint lock so concurrent first requests only deserialize it once,
+    while requests for models that are already loaded are not held up.
+    Entries are inference backends (see api.backends) exposing `predict(frames)`.
+
+    Device- and region-specific checkpoints (see api.model_routing) share the
+    registry, so it is an LRU bounded by MODEL_REGISTRY_MAX_MODELS and by the
+    on-disk size of the loaded weights (MODEL_REGISTRY_MAX_MB); the least
+    recently used models are evicted first.
+
+    Checkpoints are hot-swapped: at most every MODEL_RELOAD_CHECK_SECONDS a
+    `get` checks whether the file was replaced, and if so the new version is
+    loaded and warmed up in the background while the old one keeps serving.
+    The entry is then swapped in one assignment; requests already holding the
+    old instance finish on it.
+    """
+
+    def __init__(self):
+        self._models = OrderedDict()
+        self._stats = {}
+        self._signatures = {}
+        self._checked_at = {}
+        self._reloading = set()
+        self._latency = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "load_seconds_total": 0.0}
+
+    def _key(self, model_path, backend):
+        return (backend or get_backend_name(), str(model_path or get_default_model_path()))
+
+    def _touch(self, key):
+        """Return the cached model for `key` (marking it recently used), or None."""
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.counters["hits"] += 1
+            return model
+
+    def get(self, model_path=None, backend=None):
+        """Return the loaded backend for `model_path`, loading it on first use."""
+        key = self._key(model_path, backend)
+
+        model = self._touch(key)
+        if model is not None:
+            self._check_for_update(key)
+            return model
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            model = self._touch(key)
+            if model is None:
+                model, loaded = self._load(key)
+                with self._lock:
+                    self.counters["misses"] += 1
+                    self._publish(key, model, loaded)
+                    self._evict(keep=key)
+        return model
+
+    def _publish(self, key, model, loaded):
+        """Install a model returned by `_load` with its statistics. Caller holds the lock."""
+        self._models[key] = model
+        self._signatures[key] = loaded["signature"]
+        self._checked_at[key] = time.monotonic()
+        self._stats[key] = loaded["stats"]
+        self.counters["load_seconds_total"] += loaded["stats"]["load_seconds"]
+
+    def _evict(self, keep):
+        """Drop least recently used models over the count/size budget. Caller holds the lock."""
+        max_models = getattr(settings, 'MODEL_REGISTRY_MAX_MODELS', 4) or len(self._models)
+        max_bytes = (getattr(settings, 'MODEL_REGISTRY_MAX_MB', 1024) or 0) * 1024 * 1024
+
+        def total_bytes():
+            return sum(self._stats.get(key, {}).get("weights_bytes", 0) for key in self._models)
+
+        while len(self._models) > 1 and (
+            len(self._models) > max_models or (max_bytes and total_bytes() > max_bytes)
+        ):
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            # In-flight requests keep their reference; memory is freed after them
+            self._drop(oldest)
+            self.counters["evictions"] += 1
+            logger.info("Evicted YOLO model %s (%s) from the registry", Path(oldest[1]).name, oldest[0])
+
+    def _drop(self, key):
+        """Forget everything kept for `key`. Caller holds the lock."""
+        model = self._models.pop(key, None)
+        for per_key in (self._stats, self._signatures, self._checked_at, self._load_locks):
+            per_key.pop(key, None)
+        if model is not None:
+            self._forget_latency(model.version)
+
+    def _forget_latency(self, version):
+        """Drop the latency histogram of a version no loaded model has any more. Caller holds the lock."""
+        if all(model.version != version for model in self._models.values()):
+            self._latency.pop(version, None)
+
+    def _load(self, key):
+        """
+        Load the model for `key` without touching shared state; returns it
+        with what `_publish` records for it (under the lock) once it is used.
+        """
+        from .backends import create_backend
+
+        backend_name, path = key
+        path = Path(path)
+        if backend_name == "pytorch" and not path.exists():
+            raise FileNotFoundError(f"YOLO model not found at {path}")
+
+        rss_before = get_rss_bytes()
+        started = time.perf_counter()
+
+        signature = checkpoint_signature(path)
+        model = create_backend(backend_name, path).load()
+        model.version = model_version(path)
+        precision = getattr(model, "precision", "fp32")
+        if precision != "fp32":
+            # Keeps quantized and full-precision latency and shadow results apart
+            model.version = f"{model.version}-{precision}"
+
+        load_seconds = time.perf_counter() - started
+        rss_delta = max(get_rss_bytes() - rss_before, 0)
+
+        weights_file = Path(getattr(model, "model_file", None) or path)
+        weights_bytes = weights_file.stat().st_size if weights_file.is_file() else 0
+
+        logger.info(
+            "Loaded YOLO model %s (%s, %s) in %.2fs (+%.1f MB RSS)",
+            path.name, backend_name, model.version, load_seconds, rss_delta / (1024 * 1024),
+        )
+        return model, {
+            "signature": signature,
+            "stats": {
+                "path": str(path),
+                "backend": backend_name,
+                "version": model.version,
+                "load_seconds": round(load_seconds, 4),
+                "rss_delta_bytes": rss_delta,
+                "weights_bytes": weights_bytes,
+                "loaded_at": time.time(),
+            },
+        }
+
+    def _check_for_update(self, key):
+        interval = getattr(settings, 'MODEL_RELOAD_CHECK_SECONDS', 5)
+        if not interval or time.monotonic() - self._checked_at.get(key, 0) < interval:
+            return
+
+        with self._lock:
+            if key in self._reloading or time.monotonic() - self._checked_at.get(key, 0) < interval:
+                return
+            self._checked_at[key] = time.monotonic()
+
+        # A slow filesystem must not hold up every get()
+        signature = checkpoint_signature(key[1])
+        with self._lock:
+            if signature is None or signature == self._signatures.get(key) or key in self._reloading:
+                return
+            if key not in self._models:
+                return  # Evicted meanwhile
+            self._reloading.add(key)
+
+        threading.Thread(target=self._reload, args=(key, signature), name="model-reload", daemon=True).start()
+
+    def _reload(self, key, signature):
+        """Load and warm up the replaced checkpoint, then swap it in."""
+        try:
+            model, loaded = self._load(key)
+            model.predict([dummy_frame()])
+        except Exception:
+            with self._lock:
+                # Keep serving the old version; try again once the file changes
+                self._signatures[key] = signature
+                self._reloading.discard(key)
+            logger.warning("Hot reload of %s failed, keeping the current model", key[1], exc_info=True)
+            return
+
+        with self._lock:
+            self._reloading.discard(key)
+            previous = self._models.get(key)
+            if previous is None:
+                return  # Unloaded meanwhile
+            # Statistics and signature switch together with the model
+            self._publish(key, model, loaded)
+            if previous.version != model.version:
+                self._forget_latency(previous.version)
+        logger.info("Swapped model %s: %s -> %s", Path(key[1]).name, getattr(previous, "version", "?"), model.version)
+
+    def record_latency(self, version, seconds):
+        histogram = self._latency.get(version)
+        if histogram is None:
+            from .metrics import Histogram
+            with self._lock:
+                histogram = self._latency.setdefault(version, Histogram(LATENCY_BUCKETS_MS))
+        histogram.observe(seconds * 1000)
+
+    def is_loaded(self, model_path=None, backend=None):
+        return self._key(model_path, backend) in self._models
+
+    def unload(self, model_path=None, backend=None):
+        """Drop a cached model so the next `get` reloads it from disk."""
+        key = self._key(model_path, backend)
+        with self._lock:
+            self._drop(key)
+
+    def stats(self):
+        """Return cache counters, load statistics for every cached model and latency per version."""
+        with self._lock:
+            counters = dict(self.counters)
+            models = [dict(self._stats[key]) for key in reversed(self._models) if key in self._stats]
+        lookups = counters["hits"] + counters["misses"]
+        counters["load_seconds_total"] = round(counters["load_seconds_total"], 4)
+        return {
+            **counters,
+            "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "models": models,
+            "latency_ms_by_version": {
+                version: histogram.snapshot() for version, histogram in list(self._latency.items())
+            },
+            "process_rss_bytes": get_rss_bytes(),
+        }
+
+
+def get_default_model_path():
+    """Checkpoint used by the capture path, overridable with YOLO_MODEL_PATH."""
+    return Path(getattr(settings, 'YOLO_MODEL_PATH', None) or DEFAULT_MODEL_PATH)
+
+
+def get_backend_name():
+    """Inference backend used by the capture path: pytorch, onnx or openvino."""
+    return getattr(settings, 'INFERENCE_BACKEND', 'pytorch') or 'pytorch'
+
+
+registry = ModelRegistry()
+
+
+def get_model(model_path=None, backend=None):
+    """Return the shared inference backend for this worker process."""
+    return registry.get(model_path, backend)
+
+
+def summarize_result(result):
+    """
+    Reduce an ultralytics Results object to a picklable summary.
+
+    Returns a dict with the task `mode` ("classify" or "detect"), the frame
+    `size` as (width, height), and `detections` ordered by confidence, each
+    with `class_id`, `label`, `confidence` and `box` ([x1, y1, x2, y2] in
+    pixels, or None for classification results).
+    """
+    height, width = result.orig_shape[:2]
+    summary = {"mode": "detect", "size": (int(width), int(height)), "detections": []}
+
+    if result.probs is not None:
+        class_id = int(result.probs.top1)
+        summary["mode"] = "classify"
+        summary["detections"].append({
+            "class_id": class_id,
+            "label": result.names[class_id],
+            "confidence": float(result.probs.top1conf),
+            "box": None,
+        })
+    elif result.boxes is not None and len(result.boxes) > 0:
+        boxes = result.boxes
+        for xyxy, conf, cls in zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist()):
+            class_id = int(cls)
+            summary["detections"].append({
+                "class_id": class_id,
+                "label": result.names[class_id],
+                "confidence": float(conf),
+                "box": [round(float(v), 1) for v in xyxy],
+            })
+        summary["detections"].sort(key=lambda d: d["confidence"], reverse=True)
+
+    return summary
+
+
+def predict_images(frames, model_path=None, backend=None, imgsz=None, conf=None):
+    """
+    Run one batched predict over `frames` and return a summary per frame,
+    each tagged with the `model_version` that produced it. `imgsz` and
+    `conf` override the input size and confidence threshold.
+    """
+    model = get_model(model_path, backend)
+    started = time.perf_counter()
+    summaries = model.predict(frames, imgsz=imgsz, conf=conf)
+    registry.record_latency(model.version, time.perf_counter() - started)
+
+    for summary in summaries:
+        summary["model_version"] = model.version
+    return summaries
+
+
+def predict_frame(frame, model_path=None, imgsz=None, conf=None):
+    """
+    Run inference on a single frame and return its summary.
+
+    Frames go to the standalone inference service when INFERENCE_SERVICE_ADDRESS
+    is set, otherwise through the in-process micro-batcher (or straight to the
+    model when batching is disabled). `model_path` selects a device- or
+    region-specific checkpoint; None uses the default model. `imgsz` and
+    `conf` override the input size and confidence threshold.
+    """
+    if getattr(settings, 'INFERENCE_SERVICE_ADDRESS', ''):
+        from .inference_service import get_client
+        return get_client().predict(frame, model_path, imgsz=imgsz, conf=conf)
+
+    if getattr(settings, 'INFERENCE_BATCHING_ENABLED', True):
+        from .batching import get_batcher
+        return get_batcher(model_path).predict(frame, imgsz=imgsz, conf=conf)
+
+    return predict_images([frame], model_path, imgsz=imgsz, conf=conf)[0]
+
+
+BOX_COLORS = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255),
+    (49, 210, 207), (10, 249, 72), (23, 204, 146), (134, 219, 61),
+]
+
+
+def frame_to_image(frame):
+    """
+    Return a new RGB PIL image for a decoded BGR frame (or a PIL image).
+    The pixels are unpacked from BGR while copying, so no intermediate array
+    is created.
+    """
+    from PIL import Image
+
+    if isinstance(frame, Image.Image):
+        return frame.convert("RGB")  # convert() always returns a new image
+    height, width = frame.shape[:2]
+    return Image.frombuffer("RGB", (width, height), frame, "raw", "BGR", 0, 1)
+
+
+def render_annotated(frame, summary):
+    """Draw the detection boxes from `summary` onto a copy of the frame."""
+    from PIL import ImageDraw
+
+    annotated = frame_to_image(frame)
+    draw = ImageDraw.Draw(annotated)
+    line_width = max(2, round(sum(annotated.size) / 2 * 0.003))
+
+    for detection in summary["detections"]:
+        box = detection["box"]
+        if box is None:
+            continue
+        color = BOX_COLORS[detection["class_id"] % len(BOX_COLORS)]
+        label = f"{detection['label']} {detection['confidence']:.2f}"
+
+        draw.rectangle(box, outline=color, width=line_width)
+        text_box = draw.textbbox((box[0], box[1]), label)
+        text_height = text_box[3] - text_box[1] + 4
+        top = box[1] - text_height if box[1] >= text_height else box[1]
+        draw.rectangle(
+            [box[0], top, box[0] + (text_box[2] - text_box[0]) + 4, top + text_height],
+            fill=color,
+        )
+        draw.text((box[0] + 2, top + 2), label, fill=(255, 255, 255))
+
+    return annotated
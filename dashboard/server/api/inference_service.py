@@ -0,0 +1,303 @@
+"""
+Standalone YOLO inference service.
+
+A pool of worker processes each holds its own copy of the model, so CPU-heavy
+inference can be sized separately from the Django web workers. Django talks to
+the service through `InferenceClient`: decoded frames are handed over in shared
+memory and only a small request header crosses the local socket.
+
+Start the service with: python manage.py run_inference_service
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def parse_address(address):
+    """
+    Turn a configured address into something multiprocessing understands.
+    "host:port" becomes a TCP tuple; anything else is used as a Unix socket
+    path (or a Windows named pipe when it starts with \\\\.\\pipe\\).
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and not address.startswith("\\\\"):
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+def get_authkey(address=None):
+    """
+    Connection authkey for the service at `address` (default:
+    INFERENCE_SERVICE_ADDRESS). Only a local socket or pipe may fall back to
+    SECRET_KEY; over TCP, where the peer is whatever holds the port, an
+    explicit INFERENCE_SERVICE_AUTHKEY is required.
+    """
+    authkey = getattr(settings, 'INFERENCE_SERVICE_AUTHKEY', '')
+    if authkey:
+        return str(authkey).encode()
+    address = address if address is not None else getattr(settings, 'INFERENCE_SERVICE_ADDRESS', '')
+    if not isinstance(parse_address(address), str):
+        raise ImproperlyConfigured(
+            f"INFERENCE_SERVICE_AUTHKEY must be set for the TCP inference service address {address}"
+        )
+    return str(settings.SECRET_KEY).encode()
+
+
+def to_bgr_array(frame):
+    """Convert a PIL image (or pass through a BGR numpy array) for ultralytics."""
+    import numpy as np
+
+    if isinstance(frame, np.ndarray):
+        return frame
+    return np.asarray(frame.convert("RGB"))[:, :, ::-1]
+
+
+# ==================== Worker processes ====================
+
+_worker_model_path = None
+
+
+def _init_worker(model_path, threads):
+    """Pin intra-op threads and load the model once per worker process."""
+    global _worker_model_path
+    _worker_model_path = model_path
+
+    if threads:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    from .inference import get_model
+    get_model(model_path)
+
+
+def _attach_shared_memory(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # Before Python 3.13 attaching registers the segment with this process's
+    # resource tracker, which would unlink the client's segment on exit
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+def _predict_shared(shm_name, shape, dtype, model_path=None, imgsz=None, conf=None):
+    import numpy as np
+    from .inference import predict_images
+
+    shm = _attach_shared_memory(shm_name)
+    try:
+        # Copy out so the segment can be released before inference; the
+        # predictor keeps references to its input after predict() returns
+        frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+    return predict_images([frame], model_path or _worker_model_path, imgsz=imgsz, conf=conf)[0]
+
+
+def _predict_inline(data, shape, dtype, model_path=None, imgsz=None, conf=None):
+    import numpy as np
+    from .inference import predict_images
+
+    frame = np.frombuffer(data, dtype=dtype).reshape(shape)
+    return predict_images([frame], model_path or _worker_model_path, imgsz=imgsz, conf=conf)[0]
+
+
+# ==================== Server ====================
+
+class InferenceServer:
+    """
+    Accepts client connections and fans predict requests out to the pool.
+    Each connection is served by its own thread; the pool bounds how many
+    frames run at once.
+    """
+
+    def __init__(self, address, authkey, workers, model_path, threads_per_worker=None):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.workers = workers
+        self.model_path = str(model_path)
+        self.threads_per_worker = threads_per_worker
+        self.executor = None
+
+    def serve_forever(self):
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.model_path, self.threads_per_worker),
+        )
+
+        if isinstance(self.address, str) and not self.address.startswith("\\\\") and os.path.exists(self.address):
+            os.unlink(self.address)  # Stale socket from a previous run
+
+        try:
+            with Listener(self.address, authkey=self.authkey) as listener:
+                print(
+                    f"Inference service listening on {listener.address} "
+                    f"with {self.workers} workers ({self.threads_per_worker or 'default'} threads each)"
+                )
+                while True:
+                    try:
+                        conn = listener.accept()
+                    except Exception as e:
+                        print(f"Rejected inference client: {e}")
+                        continue
+                    threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self._dispatch(request))
+
+    def _dispatch(self, request):
+        op = request.get("op")
+        try:
+            if op == "ping":
+                return {"ok": True, "result": {
+                    "pid": os.getpid(),
+                    "workers": self.workers,
+                    "threads_per_worker": self.threads_per_worker,
+                    "model_path": self.model_path,
+                }}
+            if op == "predict":
+                # Device/region-specific checkpoints are loaded by the workers on demand
+                model_path = request.get("model")
+                overrides = {"imgsz": request.get("imgsz"), "conf": request.get("conf")}
+                if "shm" in request:
+                    future = self.executor.submit(
+                        _predict_shared, request["shm"], request["shape"], request["dtype"], model_path, **overrides
+                    )
+                else:
+                    future = self.executor.submit(
+                        _predict_inline, request["data"], request["shape"], request["dtype"], model_path, **overrides
+                    )
+                return {"ok": True, "result": future.result()}
+            return {"ok": False, "error": f"Unknown operation: {op}"}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+# ==================== Client ====================
+
+class InferenceServiceError(RuntimeError):
+    """Raised when the inference service reports a failure."""
+
+
+class InferenceClient:
+    """
+    Thin client used by the Django workers.
+
+    Connections are not thread-safe, so each thread keeps its own. Frames are
+    written to a fresh shared-memory segment per request unless
+    `use_shared_memory` is off (e.g. the service runs on another host), in
+    which case the raw pixels are sent over the socket.
+    """
+
+    def __init__(self, address, authkey, use_shared_memory=True, timeout=30):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.use_shared_memory = use_shared_memory
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, request):
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send(request)
+                if conn.poll(self.timeout):
+                    reply = conn.recv()
+                    break
+            except (EOFError, OSError):
+                # Service restarted or the connection went stale; reconnect once
+                self._drop_connection()
+                if attempt == 1:
+                    raise
+                continue
+            # The reply may still arrive later, so this connection is unusable
+            self._drop_connection()
+            raise TimeoutError(f"Inference service did not reply within {self.timeout}s")
+
+        if not reply.get("ok"):
+            raise InferenceServiceError(reply.get("error", "Unknown inference service error"))
+        return reply["result"]
+
+    def ping(self):
+        return self._call({"op": "ping"})
+
+    def predict(self, frame, model_path=None, imgsz=None, conf=None):
+        """Send one frame to the service and return its detection summary."""
+        import numpy as np
+
+        array = to_bgr_array(frame)
+        header = {"op": "predict", "shape": array.shape, "dtype": str(array.dtype)}
+        if model_path:
+            header["model"] = str(model_path)
+        if imgsz is not None:
+            header["imgsz"] = imgsz
+        if conf is not None:
+            header["conf"] = conf
+
+        if not self.use_shared_memory:
+            header["data"] = np.ascontiguousarray(array).tobytes()
+            return self._call(header)
+
+        shm = shared_memory.SharedMemory(create=True, size=array.nbytes)
+        try:
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            header["shm"] = shm.name
+            return self._call(header)
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide inference service client, configured from settings."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient(
+                    settings.INFERENCE_SERVICE_ADDRESS,
+                    get_authkey(settings.INFERENCE_SERVICE_ADDRESS),
+                    use_shared_memory=getattr(settings, 'INFERENCE_SERVICE_SHARED_MEMORY', True),
+                    timeout=getattr(settings, 'INFERENCE_SERVICE_TIMEOUT', 30),
+                )
+    return _client
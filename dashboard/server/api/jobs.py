@@ -0,0 +1,207 @@
+"""
+Durable capture job queue backed by the CaptureJob table.
+
+Uploads accepted in asynchronous mode are stored and acknowledged right away;
+the jobs are then drained by `python manage.py process_capture_jobs` or by an
+in-process worker thread started on first use. Failed jobs are retried with
+exponential backoff; a job whose capture was already stored is finished from
+that capture instead of being ingested again.
+"""
+
+import os
+import threading
+import time
+import traceback
+from datetime import timedelta
+from urllib.parse import urljoin
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CaptureJob, Device
+
+
+_wakeup = threading.Event()
+_worker_lock = threading.Lock()
+_worker_threads = []
+_worker_pid = None
+
+
+def enqueue_capture(device_id, image_file, base_url):
+    """Store an upload as a pending CaptureJob and wake the workers."""
+    device, _ = Device.objects.get_or_create(device_id=device_id)
+    job = CaptureJob.objects.create(device=device, image=image_file, base_url=base_url)
+    transaction.on_commit(_wakeup.set)
+
+    if getattr(settings, 'CAPTURE_JOB_IN_PROCESS_WORKER', True):
+        start_in_process_worker()
+    return job
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest pending job that is due to `processing` and
+    return it. Uses SKIP LOCKED where supported, and a conditional update so
+    two workers can never claim the same job on databases without row locks.
+    """
+    while True:
+        with transaction.atomic():
+            job = (
+                CaptureJob.objects.select_for_update(skip_locked=True)
+                .filter(Q(not_before__isnull=True) | Q(not_before__lte=timezone.now()), status='pending')
+                .order_by('created_at')
+                .first()
+            )
+            if job is None:
+                return None
+
+            now = timezone.now()
+            claimed = CaptureJob.objects.filter(pk=job.pk, status='pending').update(
+                status='processing',
+                attempts=job.attempts + 1,
+                started_at=now,
+            )
+        if claimed:
+            job.status = 'processing'
+            job.attempts += 1
+            job.started_at = now
+            return job
+
+
+def requeue_stale_jobs():
+    """Return jobs abandoned by a crashed worker to the queue (or fail them)."""
+    stale_after = getattr(settings, 'CAPTURE_JOB_STALE_SECONDS', 300)
+    max_attempts = getattr(settings, 'CAPTURE_JOB_MAX_ATTEMPTS', 3)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+
+    stale = CaptureJob.objects.filter(status='processing', started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status='failed', error='Worker did not finish the job', finished_at=timezone.now()
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(status='pending')
+    if failed or requeued:
+        print(f"Capture jobs: requeued {requeued} stale job(s), failed {failed}")
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt: CAPTURE_JOB_RETRY_BACKOFF_SECONDS, doubled per attempt."""
+    backoff = getattr(settings, 'CAPTURE_JOB_RETRY_BACKOFF_SECONDS', 5)
+    return timedelta(seconds=backoff * 2 ** max(0, attempts - 1))
+
+
+def stored_capture_payload(job, build_absolute_uri):
+    """
+    Payload of the capture an earlier attempt already stored, or None. The
+    capture, its boxes and the job link commit together, so a failure after
+    that (rendering, events, alerts) must not store and alert a second time.
+    """
+    from .capture import build_capture_payload
+    from .models import CapturedImage
+
+    if job.captured_image_id is None:
+        return None
+    captured_image = CapturedImage.objects.select_related('device').filter(pk=job.captured_image_id).first()
+    if captured_image is None:
+        return None
+    payload = build_capture_payload(
+        captured_image, build_absolute_uri, "Image captured and classified (recovered after a failed attempt)"
+    )
+    payload["data"]["event_id"] = captured_image.event_id
+    if captured_image.duplicate_of_id:
+        payload["data"]["duplicate_of"] = captured_image.duplicate_of_id
+    return payload
+
+
+def run_job(job):
+    """Classify, store and alert for one claimed job, recording the outcome."""
+    from .capture import ingest_capture
+
+    def build_absolute_uri(url):
+        return urljoin(job.base_url, url) if job.base_url else url
+
+    try:
+        payload = stored_capture_payload(job, build_absolute_uri)
+        if payload is None:
+            with job.image.open('rb') as image_file:
+                payload = ingest_capture(
+                    job.device.device_id,
+                    image_file,
+                    build_absolute_uri,
+                    stored_image_name=job.image.name,
+                    job=job,
+                )
+    except Exception as e:
+        traceback.print_exc()
+        max_attempts = getattr(settings, 'CAPTURE_JOB_MAX_ATTEMPTS', 3)
+        job.error = f"{type(e).__name__}: {e}"
+        if job.attempts >= max_attempts:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+        else:
+            job.status = 'pending'
+            job.not_before = timezone.now() + retry_delay(job.attempts)
+        job.save(update_fields=['status', 'error', 'finished_at', 'not_before'])
+        return job
+
+    if payload["status"] == "no_detection" or payload["data"].get("duplicate_of") or payload.get("cached"):
+        # Synchronous mode does not keep frames without detections either;
+        # burst duplicates and retries reference the image of the original frame
+        job.image.delete(save=False)
+
+    job.status = 'done'
+    job.result = payload
+    job.captured_image_id = payload["data"].get("id")
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'captured_image', 'error', 'finished_at', 'image'])
+    return job
+
+
+def work(poll_interval=1.0, stop_event=None, burst=False):
+    """
+    Process capture jobs until `stop_event` is set.
+    With `burst=True`, return as soon as the queue is empty.
+    """
+    last_stale_check = 0.0
+    while stop_event is None or not stop_event.is_set():
+        close_old_connections()
+
+        if time.monotonic() - last_stale_check > 60:
+            requeue_stale_jobs()
+            last_stale_check = time.monotonic()
+
+        _wakeup.clear()
+        job = claim_next_job()
+        if job is None:
+            if burst:
+                return
+            _wakeup.wait(poll_interval)
+            continue
+
+        started = time.perf_counter()
+        run_job(job)
+        print(f"Capture job {job.job_id} {job.status} in {time.perf_counter() - started:.2f}s")
+
+
+def start_in_process_worker():
+    """Start the background job threads for this process (once per PID)."""
+    global _worker_pid
+    if _worker_pid == os.getpid() and all(thread.is_alive() for thread in _worker_threads):
+        return
+
+    with _worker_lock:
+        if _worker_pid == os.getpid() and all(thread.is_alive() for thread in _worker_threads):
+            return
+
+        _worker_threads[:] = [t for t in _worker_threads if _worker_pid == os.getpid() and t.is_alive()]
+        _worker_pid = os.getpid()
+        thread_count = max(1, getattr(settings, 'CAPTURE_JOB_WORKER_THREADS', 1))
+        while len(_worker_threads) < thread_count:
+            thread = threading.Thread(target=work, name="capture-job-worker", daemon=True)
+            thread.start()
+            _worker_threads.append(thread)
+
+
+def queue_depth():
+    return CaptureJob.objects.filter(status='pending').count()
@@ -0,0 +1,36 @@
+"""
+Signed links to per-object media endpoints.
+
+Annotated images, stored boxes and event images are served to clients that
+cannot send a JWT (image tags, alert messages), so their URLs carry a `sig`
+query parameter signed with SECRET_KEY. A valid signature grants access to
+that one object; the raw primary key alone only works within the visibility
+rules of the capture list (see views.visible_captures).
+"""
+
+from urllib.parse import urlencode
+from django.core import signing
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+
+
+def _signer(model):
+    return signing.Signer(salt=f"api.links.{model._meta.label_lower}")
+
+
+def sign(obj):
+    """Signature for `obj`, valid for every endpoint of its model."""
+    return _signer(type(obj)).signature(str(obj.pk))
+
+
+def signed_path(url_name, obj):
+    """URL path of `url_name` for `obj` with its signature appended."""
+    return f"{reverse(url_name, args=[obj.pk])}?{urlencode({'sig': sign(obj)})}"
+
+
+def has_valid_signature(request, model, pk):
+    """Whether the request carries the signature of `model` instance `pk`."""
+    signature = request.query_params.get('sig')
+    if not signature:
+        return False
+    return constant_time_compare(signature, _signer(model).signature(str(pk)))
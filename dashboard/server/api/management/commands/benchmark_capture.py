@@ -0,0 +1,292 @@
+"""
+Management command to benchmark the capture path by replaying a directory of
+images at a fixed concurrency. Reports frames/s, latency percentiles and peak
+RSS, and can write the result as JSON to compare runs (models, backends,
+thread counts) with --compare.
+
+Targets:
+  classify  `classify_image` only: decode, inference and annotation
+  capture   POST /api/device/capture/ through the full Django stack: the
+            frames are stored under a throwaway device that is deleted
+            (with its files) afterwards unless --keep is given
+
+Run with: python manage.py benchmark_capture ../../model/dataset/images/val --target capture --concurrency 4 --json run.json
+"""
+
+import json
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from api.backends import get_image_size
+from api.capture import classify_image
+from api.inference import get_backend_name, get_default_model_path, get_rss_bytes
+from api.metrics import capture_stages
+from api.models import CapturedImage, Device
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Settings that change what is measured; recorded with every result
+RECORDED_SETTINGS = (
+    'INFERENCE_PRECISION',
+    'INFERENCE_THREADS',
+    'INFERENCE_BATCHING_ENABLED',
+    'INFERENCE_MAX_BATCH_SIZE',
+    'INFERENCE_MAX_WAIT_MS',
+    'INFERENCE_SERVICE_ADDRESS',
+    'CAPTURE_PRERESIZE_ENABLED',
+    'CASCADE_ENABLED',
+    'CAPTURE_GATE_ENABLED',
+    'ANNOTATION_RENDER_MODE',
+)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class RssSampler:
+    """Samples the process RSS on a background thread and keeps the peak."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = get_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, get_rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, get_rss_bytes())
+
+
+class Command(BaseCommand):
+    help = 'Replay a directory of images through classify_image or the capture endpoint and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Image file or directory of images')
+        parser.add_argument('--target', choices=['classify', 'capture'], default='classify', help='What each request runs')
+        parser.add_argument('--concurrency', type=int, default=1, help='Requests in flight at once')
+        parser.add_argument('--limit', type=int, default=200, help='Maximum number of distinct images to load')
+        parser.add_argument('--frames', type=int, default=None, help='Frames to send in total (default: every image once)')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests sent first')
+        parser.add_argument('--device-id', default='benchmark', help='Device id the capture target uploads as')
+        parser.add_argument('--with-caches', action='store_true', help='Keep the result cache and burst dedup on (off by default, since replayed frames repeat)')
+        parser.add_argument('--keep', action='store_true', help='Keep the captures stored by the capture target')
+        parser.add_argument('--label', default='', help='Free-form name for this run, stored in the JSON result')
+        parser.add_argument('--json', dest='json_path', help='Write the result as JSON to this file ("-" for stdout)')
+        parser.add_argument('--compare', help='Earlier JSON result to print the differences against')
+
+    def handle(self, *args, **options):
+        root = Path(options['path'])
+        files = [root] if root.is_file() else sorted(
+            p for p in root.rglob('*') if p.suffix.lower() in IMAGE_EXTS
+        )
+        files = files[:options['limit']]
+        if not files:
+            raise CommandError(f'No images found under {root}')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+
+        corpus = [(path.name, path.read_bytes()) for path in files]
+        total = options['frames'] or len(corpus)
+        target = options['target']
+        device_id = options['device_id']
+
+        if target == 'capture' and not options['keep'] and Device.objects.filter(device_id=device_id).exists():
+            raise CommandError(
+                f'Device "{device_id}" already exists; pick another --device-id or pass --keep'
+            )
+
+        overrides = {} if options['with_caches'] else {
+            'CAPTURE_RESULT_CACHE_ENABLED': False,
+            'CAPTURE_DEDUP_ENABLED': False,
+        }
+        started_at = datetime.now(timezone.utc).isoformat()
+        with override_settings(**overrides):
+            if target == 'capture':
+                # Created up front so concurrent first uploads do not race to create it
+                Device.objects.get_or_create(device_id=device_id)
+            send = self._sender(target, device_id)
+            try:
+                for i in range(options['warmup']):
+                    send(*corpus[i % len(corpus)])
+                result = self._run(send, corpus, total, options['concurrency'])
+            finally:
+                if target == 'capture' and not options['keep']:
+                    self._cleanup(device_id)
+
+        result.update({
+            'label': options['label'],
+            'target': target,
+            'corpus': str(root),
+            'images': len(corpus),
+            'started_at': started_at,
+            'host': {'python': platform.python_version(), 'machine': platform.machine(), 'node': platform.node()},
+            'model': {
+                'path': str(get_default_model_path()),
+                'backend': get_backend_name(),
+                'image_size': get_image_size(),
+            },
+            'settings': {name: getattr(settings, name, None) for name in RECORDED_SETTINGS},
+        })
+        if options['json_path'] != '-':
+            self._report(result)
+
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(result, indent=2))
+        elif options['json_path']:
+            Path(options['json_path']).write_text(json.dumps(result, indent=2))
+            self.stdout.write(f"Result written to {options['json_path']}")
+
+        if options['compare']:
+            self._compare(json.loads(Path(options['compare']).read_text()), result)
+
+    def _sender(self, target, device_id):
+        """Callable sending one frame; raises on failure."""
+        if target == 'classify':
+            def send(name, data):
+                classify_image(SimpleUploadedFile(name, data, content_type='image/jpeg'))
+            return send
+
+        url = reverse('capture_image')
+        local = threading.local()
+
+        def send(name, data):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+            response = client.post(url, {
+                'device_id': device_id,
+                'async': '0',
+                'image': SimpleUploadedFile(name, data, content_type='image/jpeg'),
+            })
+            if response.status_code not in (200, 201):
+                raise RuntimeError(f'HTTP {response.status_code}: {response.content[:200]!r}')
+        return send
+
+    def _run(self, send, corpus, total, concurrency):
+        next_frame = iter(range(total))
+        lock = threading.Lock()
+        latencies = []
+        errors = []
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        index = next(next_frame, None)
+                    if index is None:
+                        return
+                    started = time.perf_counter()
+                    try:
+                        send(*corpus[index % len(corpus)])
+                    except Exception as e:
+                        with lock:
+                            errors.append(f'{type(e).__name__}: {e}')
+                        continue
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed * 1000)
+            finally:
+                connection.close()
+
+        stages_before = capture_stages.snapshot()
+        rss_before = get_rss_bytes()
+        with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as executor:
+            started = time.perf_counter()
+            for future in [executor.submit(worker) for _ in range(concurrency)]:
+                future.result()
+            wall_seconds = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'concurrency': concurrency,
+            'frames': len(latencies),
+            'errors': len(errors),
+            'first_errors': errors[:5],
+            'wall_seconds': round(wall_seconds, 4),
+            'frames_per_second': round(len(latencies) / wall_seconds, 3) if wall_seconds else 0.0,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                'p50': round(percentile(latencies, 0.50), 3),
+                'p95': round(percentile(latencies, 0.95), 3),
+                'p99': round(percentile(latencies, 0.99), 3),
+                'max': round(latencies[-1], 3) if latencies else 0.0,
+            },
+            'rss_before_bytes': rss_before,
+            'peak_rss_bytes': rss.peak,
+            'stages_mean_ms': self._stage_means(stages_before, capture_stages.snapshot()),
+        }
+
+    def _stage_means(self, before, after):
+        """Mean time per capture stage over this run only."""
+        means = {}
+        for stage, snapshot in after.items():
+            previous = before.get(stage, {'count': 0, 'sum': 0.0})
+            count = snapshot['count'] - previous['count']
+            if count:
+                means[stage] = round((snapshot['sum'] - previous['sum']) / count, 3)
+        return means
+
+    def _cleanup(self, device_id):
+        device = Device.objects.filter(device_id=device_id).first()
+        if device is None:
+            return
+        for captured_image in CapturedImage.objects.filter(device=device):
+            captured_image.image.delete(save=False)
+            if captured_image.annotated_image:
+                captured_image.annotated_image.delete(save=False)
+        device.delete()
+
+    def _report(self, result):
+        latency = result['latency_ms']
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['target']} x{result['concurrency']}: {result['frames']} frame(s) in {result['wall_seconds']:.2f}s"
+        ))
+        self.stdout.write(f"  throughput:  {result['frames_per_second']:.2f} frames/s")
+        self.stdout.write(
+            f"  latency:     p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+            f"p99 {latency['p99']:.1f} ms, max {latency['max']:.1f} ms"
+        )
+        self.stdout.write(f"  peak RSS:    {result['peak_rss_bytes'] / (1024 * 1024):.1f} MB")
+        if result['stages_mean_ms']:
+            stages = ', '.join(f'{stage} {ms:.1f}' for stage, ms in sorted(result['stages_mean_ms'].items()))
+            self.stdout.write(f"  stages (ms): {stages}")
+        if result['errors']:
+            self.stdout.write(self.style.WARNING(f"  errors:      {result['errors']} (first: {result['first_errors'][0]})"))
+
+    def _compare(self, baseline, result):
+        self.stdout.write(f"Compared with {baseline.get('label') or 'baseline'}:")
+        rows = [
+            ('frames/s', baseline['frames_per_second'], result['frames_per_second']),
+            ('p50 ms', baseline['latency_ms']['p50'], result['latency_ms']['p50']),
+            ('p95 ms', baseline['latency_ms']['p95'], result['latency_ms']['p95']),
+            ('p99 ms', baseline['latency_ms']['p99'], result['latency_ms']['p99']),
+            ('peak RSS MB', baseline['peak_rss_bytes'] / (1024 * 1024), result['peak_rss_bytes'] / (1024 * 1024)),
+        ]
+        for name, before, after in rows:
+            change = f'{(after - before) / before * 100:+.1f}%' if before else 'n/a'
+            self.stdout.write(f'  {name:<12} {before:10.2f} -> {after:10.2f}  ({change})')
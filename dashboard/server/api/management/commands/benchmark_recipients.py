@@ -0,0 +1,193 @@
+"""
+Management command to benchmark the alert recipient lookups (the indexed
+`get_users_within_radius`, the in-memory recipient table and the precomputed
+device subscriptions) against the full-table scan they replaced, on a
+synthetic population of user profiles and devices.
+The profiles are created inside a transaction that is rolled back at the end,
+so the database is left as it was.
+Every query is checked to return the same recipients as the scan.
+
+Run with: python manage.py benchmark_recipients --profiles 100000 --queries 50
+"""
+
+import math
+import random
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Device, UserProfile
+from api.notifications import get_users_within_radius, haversine_distance
+from api.recipients import RecipientTable, find_nearby_users
+from api.subscriptions import nearby_users as subscriptions_nearby_users, subscribe_device
+
+
+def scan_users_within_radius(device_lat, device_lon, radius_km=10, user_type=None):
+    """The previous lookup: haversine over every profile with coordinates."""
+    nearby_users = []
+    profiles = UserProfile.objects.filter(
+        home_lat__isnull=False,
+        home_lon__isnull=False,
+        mobile_number__isnull=False
+    ).exclude(mobile_number='')
+    if user_type:
+        profiles = profiles.filter(user_type=user_type)
+
+    for profile in profiles.order_by('pk'):
+        distance = haversine_distance(device_lat, device_lon, profile.home_lat, profile.home_lon)
+        if distance <= radius_km:
+            nearby_users.append({
+                'user': profile.user,
+                'mobile_number': profile.mobile_number,
+                'distance': distance
+            })
+    return nearby_users
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare the indexed, in-memory and precomputed recipient lookups with the full-table scan on synthetic profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=100000, help='Synthetic profiles to create')
+        parser.add_argument('--queries', type=int, default=20, help='Alert lookups (ranger + public) per implementation')
+        parser.add_argument('--center', type=float, nargs=2, default=[11.41, 76.70], metavar=('LAT', 'LON'), help='Centre of the population')
+        parser.add_argument('--spread-km', type=float, default=150.0, help='Half-width of the square the homes are spread over')
+        parser.add_argument('--ranger-share', type=float, default=0.02, help='Share of profiles that are rangers')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+
+    def handle(self, *args, **options):
+        if options['profiles'] < 1 or options['queries'] < 1:
+            raise CommandError('--profiles and --queries must be at least 1')
+        try:
+            with transaction.atomic():
+                self._populate(options)
+                self._run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Synthetic profiles and devices rolled back')
+
+    def _random_point(self, rng, options):
+        lat, lon = options['center']
+        spread_deg = options['spread_km'] / 111.0
+        return lat + rng.uniform(-spread_deg, spread_deg), lon + rng.uniform(-spread_deg, spread_deg)
+
+    def _populate(self, options):
+        rng = random.Random(options['seed'])
+        count = options['profiles']
+        self.stdout.write(self.style.WARNING(f'Creating {count} synthetic profiles...'))
+        started = time.perf_counter()
+
+        prefix = f'bench-{rng.getrandbits(32):08x}'
+        users = User.objects.bulk_create(
+            [User(username=f'{prefix}-{i}', password='!') for i in range(count)],
+            batch_size=5000,
+        )
+        if users and users[0].pk is None:
+            # Backends that do not return ids from bulk_create
+            users = list(User.objects.filter(username__startswith=f'{prefix}-').order_by('pk'))
+
+        profiles = []
+        for i, user in enumerate(users):
+            lat, lon = self._random_point(rng, options)
+            profiles.append(UserProfile(
+                user=user,
+                mobile_number=f'+9{i:012d}'[:15],
+                home_lat=lat,
+                home_lon=lon,
+                user_type='ranger' if rng.random() < options['ranger_share'] else 'public',
+            ))
+        UserProfile.objects.bulk_create(profiles, batch_size=5000)
+        self.stdout.write(f'  done in {time.perf_counter() - started:.1f}s')
+
+    def _run(self, options):
+        rng = random.Random(options['seed'] + 1)
+        devices = [self._random_point(rng, options) for _ in range(options['queries'])]
+
+        def lookup(implementation, lat, lon):
+            # The two lookups send_wildlife_alerts makes per detection
+            return (
+                implementation(lat, lon, radius_km=50, user_type='ranger'),
+                implementation(lat, lon, radius_km=10, user_type='public'),
+            )
+
+        # Every synthetic profile was written moments ago; in steady state a
+        # sync only re-reads the few changed within the lookback
+        table = RecipientTable(lookback_seconds=0)
+        started = time.perf_counter()
+        table.reload()
+        load_ms = (time.perf_counter() - started) * 1000
+
+        def table_lookup(lat, lon):
+            nearby = find_nearby_users(lat, lon, {'ranger': 50, 'public': 10}, table)
+            return nearby['ranger'], nearby['public']
+
+        # Precomputed subscriptions need devices at the query points
+        created = Device.objects.bulk_create([
+            Device(device_id=f'bench-{i}', lat=lat, lon=lon) for i, (lat, lon) in enumerate(devices)
+        ])
+        if created and created[0].pk is None:
+            created = list(Device.objects.filter(device_id__startswith='bench-').order_by('pk'))
+        by_point = {(device.lat, device.lon): device for device in created}
+        started = time.perf_counter()
+        subscription_count = sum(subscribe_device(device) for device in created)
+        subscribe_ms = (time.perf_counter() - started) / len(created) * 1000
+
+        def subscription_lookup(lat, lon):
+            nearby = subscriptions_nearby_users(by_point[(lat, lon)])
+            return nearby['ranger'], nearby['public']
+
+        implementations = (
+            ('scan', lambda lat, lon: lookup(scan_users_within_radius, lat, lon)),
+            ('indexed', lambda lat, lon: lookup(get_users_within_radius, lat, lon)),
+            ('table', table_lookup),
+            ('subscribed', subscription_lookup),
+        )
+        timings = {}
+        results = {}
+        for name, implementation in implementations:
+            implementation(*devices[0])  # Warm the connection and caches
+            started = time.perf_counter()
+            results[name] = [implementation(lat, lon) for lat, lon in devices]
+            timings[name] = (time.perf_counter() - started) / len(devices) * 1000
+
+        # The geo match alone, before the matched users are fetched
+        started = time.perf_counter()
+        for lat, lon in devices:
+            table.within(lat, lon, {'ranger': 50, 'public': 10})
+        match_ms = (time.perf_counter() - started) / len(devices) * 1000
+
+        def same(expected, actual):
+            # Same users in the same order; distances to floating-point rounding
+            return len(expected) == len(actual) and all(
+                (a['user'].pk, a['mobile_number']) == (b['user'].pk, b['mobile_number'])
+                and math.isclose(a['distance'], b['distance'], rel_tol=1e-9, abs_tol=1e-9)
+                for a, b in zip(expected, actual)
+            )
+
+        recipients = sum(len(rangers) + len(public) for rangers, public in results['scan']) / len(devices)
+        self.stdout.write(f"  recipients per alert: {recipients:.1f} (mean over {len(devices)} devices)")
+        self.stdout.write(f"  table load:  {load_ms:9.2f} ms once per worker")
+        self.stdout.write(
+            f"  subscribe:   {subscribe_ms:9.2f} ms per device move ({subscription_count} subscriptions in total)"
+        )
+        self.stdout.write(f"  full scan:   {timings['scan']:9.2f} ms per alert")
+        for name in ('indexed', 'table', 'subscribed'):
+            self.stdout.write(
+                f"  {name + ':':<12} {timings[name]:9.2f} ms per alert ({timings['scan'] / timings[name]:.1f}x faster)"
+            )
+        self.stdout.write(f"    table, of which the in-memory geo match: {match_ms:.2f} ms")
+
+        for name in ('indexed', 'table', 'subscribed'):
+            mismatches = sum(
+                not same(scan[0], other[0]) or not same(scan[1], other[1])
+                for scan, other in zip(results['scan'], results[name])
+            )
+            if mismatches:
+                self.stdout.write(self.style.ERROR(f'  {name}: {mismatches} lookup(s) returned different recipients'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'  {name}: identical recipients for every lookup'))
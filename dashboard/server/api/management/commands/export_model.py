@@ -0,0 +1,34 @@
+"""
+Management command to export the YOLO checkpoint for the CPU backends.
+Run with: python manage.py export_model --format onnx openvino
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.backends import EXPORT_FORMATS, ensure_exported, get_image_size
+from api.inference import get_default_model_path
+
+
+class Command(BaseCommand):
+    help = 'Export best.pt to ONNX and/or OpenVINO IR next to the checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            nargs='+',
+            choices=EXPORT_FORMATS,
+            default=['onnx'],
+            help='Export formats to produce',
+        )
+        parser.add_argument('--model', default=None, help='Path to the YOLO checkpoint')
+        parser.add_argument('--imgsz', type=int, default=None, help='Export input size (default: INFERENCE_IMAGE_SIZE)')
+        parser.add_argument('--force', action='store_true', help='Re-export even if an up-to-date export exists')
+
+    def handle(self, *args, **options):
+        checkpoint = options['model'] or get_default_model_path()
+        imgsz = options['imgsz'] or get_image_size()
+
+        for fmt in options['format']:
+            self.stdout.write(self.style.WARNING(f'Exporting {checkpoint} to {fmt} (imgsz={imgsz})...'))
+            target = ensure_exported(checkpoint, fmt, imgsz=imgsz, force=options['force'])
+            self.stdout.write(self.style.SUCCESS(f'  {fmt}: {target}'))
@@ -0,0 +1,33 @@
+"""
+Management command to process queued asynchronous capture uploads.
+Run with: python manage.py process_capture_jobs
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Classify, annotate and send alerts for queued capture jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between checks of an empty queue',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of waiting for new jobs',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Processing capture jobs...'))
+        try:
+            work(poll_interval=options['poll_interval'], burst=options['burst'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Capture job worker stopped'))
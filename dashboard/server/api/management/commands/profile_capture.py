@@ -0,0 +1,117 @@
+"""
+Management command to measure time and peak memory per upload in the capture
+image pipeline (decode, preprocessing, inference, annotation).
+Run with: python manage.py profile_capture path/to/images --skip-inference --pipeline full-decode
+"""
+
+import io
+import time
+import tracemalloc
+from pathlib import Path
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from api.backends import get_image_size, letterbox
+from api.capture import decode_upload, prepare_frame, restore_summary
+from api.inference import get_rss_bytes, predict_frame, render_annotated
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _legacy_pipeline(upload, summary_fn):
+    """Reference copy of the pre-single-decode pipeline, for comparison."""
+    import numpy as np
+
+    image_data = upload.read()
+    upload.seek(0)
+    image = Image.open(io.BytesIO(image_data))
+    # ultralytics converted PIL input to a contiguous BGR array itself
+    np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])
+    summary = summary_fn(image)
+    annotated = render_annotated(image, summary)
+    buffer = io.BytesIO()
+    annotated.save(buffer, format='JPEG', quality=90)
+    upload.read()  # Storage read the upload again when saving the ImageField
+    return summary
+
+
+def _full_decode_pipeline(upload, summary_fn):
+    """Single full-resolution decode, resized by the predictor."""
+    return summary_fn(decode_upload(upload))
+
+
+def _preresize_pipeline(upload, summary_fn):
+    """DCT-scaled decode straight to the letterboxed model input."""
+    frame, transform = prepare_frame(upload, get_image_size())
+    return restore_summary(summary_fn(frame), transform)
+
+
+PIPELINES = {
+    'legacy': _legacy_pipeline,
+    'full-decode': _full_decode_pipeline,
+    'preresize': _preresize_pipeline,
+}
+
+
+class Command(BaseCommand):
+    help = 'Profile time and peak Python-heap memory per upload for the capture image pipeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Image file or directory of images')
+        parser.add_argument('--limit', type=int, default=50, help='Maximum number of images to profile')
+        parser.add_argument(
+            '--pipeline',
+            choices=PIPELINES,
+            default='preresize',
+            help='Pipeline to profile: the old multi-decode one, a single full decode, or the pre-resized decode',
+        )
+        parser.add_argument(
+            '--skip-inference',
+            action='store_true',
+            help='Replace predict with the predictor letterbox and a fixed box, so only decode/preprocess/annotate are measured',
+        )
+
+    def handle(self, *args, **options):
+        root = Path(options['path'])
+        files = [root] if root.is_file() else sorted(
+            p for p in root.rglob('*') if p.suffix.lower() in IMAGE_EXTS
+        )
+        files = files[:options['limit']]
+        if not files:
+            self.stderr.write(self.style.ERROR(f'No images found under {root}'))
+            return
+
+        def fixed_summary(frame):
+            letterbox(frame, get_image_size())  # The resize the predictor would do
+            width, height = frame.size if isinstance(frame, Image.Image) else (frame.shape[1], frame.shape[0])
+            return {"mode": "detect", "size": (width, height), "detections": [{
+                "class_id": 0, "label": "Bear", "confidence": 0.9,
+                "box": [width * 0.25, height * 0.25, width * 0.75, height * 0.75],
+            }]}
+
+        summary_fn = fixed_summary if options['skip_inference'] else predict_frame
+        pipeline = PIPELINES[options['pipeline']]
+
+        # Warm up imports and the model outside the measurements
+        pipeline(SimpleUploadedFile(files[0].name, files[0].read_bytes()), summary_fn)
+
+        timings = []
+        peaks = []
+        rss_before = get_rss_bytes()
+        for path in files:
+            upload = SimpleUploadedFile(path.name, path.read_bytes(), content_type='image/jpeg')
+            tracemalloc.start()
+            started = time.perf_counter()
+            pipeline(upload, summary_fn)
+            timings.append(time.perf_counter() - started)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(f"{options['pipeline']} pipeline over {len(files)} image(s):"))
+        self.stdout.write(f'  mean time:   {sum(timings) / len(timings) * 1000:.1f} ms')
+        self.stdout.write(f'  p95 time:    {timings[int(0.95 * (len(timings) - 1))] * 1000:.1f} ms')
+        self.stdout.write(f'  mean peak:   {sum(peaks) / len(peaks) / (1024 * 1024):.2f} MB (traced heap)')
+        self.stdout.write(f'  max peak:    {max(peaks) / (1024 * 1024):.2f} MB (traced heap)')
+        self.stdout.write(f'  RSS growth:  {(get_rss_bytes() - rss_before) / (1024 * 1024):.1f} MB')
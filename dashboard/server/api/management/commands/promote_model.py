@@ -0,0 +1,62 @@
+"""
+Management command to promote a candidate checkpoint to the active model.
+The checkpoint is copied over YOLO_MODEL_PATH atomically (the previous one is
+kept as <name>.prev.pt); running workers notice the new file within
+MODEL_RELOAD_CHECK_SECONDS, load and warm it up in the background and swap it
+in without dropping requests.
+Run with: python manage.py promote_model [path/to/candidate.pt] [--rollback]
+"""
+
+import os
+import shutil
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.inference import get_default_model_path, model_version
+
+
+class Command(BaseCommand):
+    help = 'Atomically replace the active YOLO checkpoint (default: the shadow model) so workers hot-swap to it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'checkpoint',
+            nargs='?',
+            default=None,
+            help='Candidate checkpoint (default: YOLO_SHADOW_MODEL_PATH)',
+        )
+        parser.add_argument('--rollback', action='store_true', help='Restore the checkpoint replaced by the last promotion')
+
+    def handle(self, *args, **options):
+        active = get_default_model_path()
+        backup = active.with_name(f"{active.stem}.prev{active.suffix}")
+
+        if options['rollback']:
+            if not backup.exists():
+                raise CommandError(f'No previous checkpoint at {backup}')
+            source = backup
+        else:
+            source = Path(options['checkpoint'] or getattr(settings, 'YOLO_SHADOW_MODEL_PATH', '') or '')
+            if not str(source) or not source.is_file():
+                raise CommandError('Pass a checkpoint path or set YOLO_SHADOW_MODEL_PATH')
+            if source.resolve() == active.resolve():
+                raise CommandError(f'{source} is already the active checkpoint')
+
+        previous_version = model_version(active) if active.exists() else None
+        new_version = model_version(source)
+
+        # Copy next to the target first so the final rename is atomic. copyfile
+        # (not copy2) gives the file a fresh mtime, which also invalidates exports
+        staging = active.with_name(f".{active.name}.{os.getpid()}.tmp")
+        shutil.copyfile(source, staging)
+        if active.exists() and not options['rollback']:
+            shutil.copyfile(active, backup)
+        os.replace(staging, active)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Active model {active.name}: {previous_version or "none"} -> {new_version}'
+        ))
+        self.stdout.write(
+            f'Workers swap within {getattr(settings, "MODEL_RELOAD_CHECK_SECONDS", 5)}s of their next request'
+        )
@@ -0,0 +1,146 @@
+"""
+Management command to build the INT8 variant of the YOLO checkpoint for the
+onnx or openvino backend and compare it with FP32 on accuracy (mAP on the
+data.yaml val split), latency and memory. Writes a JSON and Markdown report
+next to the checkpoint; set INFERENCE_PRECISION=int8 to serve the variant.
+Run with: python manage.py quantize_model --backend onnx --data ../../model/data.yaml
+"""
+
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+
+from api.backends import EXPORT_FORMATS, get_image_size
+from api.inference import get_default_model_path
+from api.quantization import (
+    dataset_split, evaluate_variant, list_images, quantize_onnx, quantize_openvino,
+)
+
+
+class Command(BaseCommand):
+    help = 'Quantize best.pt to INT8 (ONNX Runtime or OpenVINO) and report accuracy, latency and memory against FP32'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=EXPORT_FORMATS, default='onnx', help='Runtime to quantize for')
+        parser.add_argument('--method', choices=['static', 'dynamic'], default='static', help='ONNX only: calibrated activations (static) or weights only (dynamic)')
+        parser.add_argument('--model', default=None, help='Path to the YOLO checkpoint (default: YOLO_MODEL_PATH)')
+        parser.add_argument('--data', default=None, help='ultralytics data.yaml; its train split calibrates and its val split is evaluated')
+        parser.add_argument('--calibration-images', default=None, help='Directory of calibration images (default: the train split of --data)')
+        parser.add_argument('--calibration-count', type=int, default=300, help='Calibration images to use')
+        parser.add_argument('--val-images', default=None, help='Directory of images for the latency runs (default: the val split of --data)')
+        parser.add_argument('--val-count', type=int, default=100, help='Images per latency run')
+        parser.add_argument('--imgsz', type=int, default=None, help='Input size (default: INFERENCE_IMAGE_SIZE)')
+        parser.add_argument('--skip-accuracy', action='store_true', help='Only measure latency and memory')
+        parser.add_argument('--skip-quantize', action='store_true', help='Evaluate an existing INT8 model')
+        parser.add_argument('--report', default=None, help='Report path without extension (default: <checkpoint stem>_int8_report)')
+
+    def handle(self, *args, **options):
+        checkpoint = Path(options['model'] or get_default_model_path())
+        if not checkpoint.exists():
+            raise CommandError(f'YOLO model not found at {checkpoint}')
+        backend = options['backend']
+        imgsz = options['imgsz'] or get_image_size()
+        data_yaml = options['data']
+        if data_yaml and not Path(data_yaml).exists():
+            raise CommandError(f'{data_yaml} not found')
+
+        if not options['skip_quantize']:
+            self._quantize(checkpoint, backend, options, data_yaml, imgsz)
+
+        val_dir = options['val_images'] or (data_yaml and dataset_split(data_yaml, 'val'))
+        if not val_dir:
+            raise CommandError('No images for the latency runs; pass --val-images or a --data whose val split exists')
+        val_images = list_images(val_dir, options['val_count'])
+        if not val_images:
+            raise CommandError(f'No images found under {val_dir}')
+
+        accuracy_data = None if options['skip_accuracy'] else data_yaml
+        if accuracy_data is None and not options['skip_accuracy']:
+            self.stdout.write(self.style.WARNING('No --data given: accuracy is not measured'))
+
+        variants = [('pytorch', 'fp32'), (backend, 'fp32'), (backend, 'int8')]
+        results = []
+        for name, precision in variants:
+            self.stdout.write(self.style.WARNING(f'Evaluating {name} {precision}...'))
+            results.append(evaluate_variant(name, precision, checkpoint, val_images, accuracy_data, imgsz))
+
+        report = {
+            'checkpoint': str(checkpoint),
+            'backend': backend,
+            'method': 'nncf' if backend == 'openvino' else options['method'],
+            'imgsz': imgsz,
+            'data': data_yaml,
+            'latency_images': str(val_dir),
+            'variants': results,
+            'int8_vs_fp32': self._compare(results[1], results[2]),
+        }
+        self._write_report(report, options['report'] or str(checkpoint.parent / f'{checkpoint.stem}_int8_report'))
+
+    def _quantize(self, checkpoint, backend, options, data_yaml, imgsz):
+        if backend == 'openvino':
+            if not data_yaml:
+                raise CommandError('OpenVINO INT8 calibrates on a dataset; pass --data')
+            self.stdout.write(self.style.WARNING('Quantizing for OpenVINO (NNCF)...'))
+            target = quantize_openvino(checkpoint, data_yaml, imgsz)
+        else:
+            images = None
+            if options['method'] == 'static':
+                calibration_dir = options['calibration_images'] or (data_yaml and dataset_split(data_yaml, 'train'))
+                if not calibration_dir:
+                    raise CommandError('Static quantization needs --calibration-images or a --data whose train split exists')
+                images = list_images(calibration_dir, options['calibration_count'])
+                if not images:
+                    raise CommandError(f'No calibration images found under {calibration_dir}')
+            self.stdout.write(self.style.WARNING(
+                f"Quantizing for ONNX Runtime ({options['method']}"
+                f"{f', {len(images)} calibration images' if images else ''})..."
+            ))
+            target = quantize_onnx(checkpoint, images, imgsz, options['method'])
+        self.stdout.write(self.style.SUCCESS(f'  int8: {target}'))
+
+    def _compare(self, fp32, int8):
+        comparison = {
+            'speedup': round(fp32['latency']['mean_ms'] / int8['latency']['mean_ms'], 3),
+            'p95_ms_delta': round(int8['latency']['p95_ms'] - fp32['latency']['p95_ms'], 3),
+            'weights_ratio': round(int8['weights_bytes'] / fp32['weights_bytes'], 3) if fp32['weights_bytes'] else None,
+            'load_rss_delta_bytes': int8['load_rss_delta_bytes'] - fp32['load_rss_delta_bytes'],
+        }
+        if fp32['accuracy'] and int8['accuracy']:
+            comparison['map50_drop'] = round(fp32['accuracy']['map50'] - int8['accuracy']['map50'], 4)
+            comparison['map50_95_drop'] = round(fp32['accuracy']['map50_95'] - int8['accuracy']['map50_95'], 4)
+        return comparison
+
+    def _write_report(self, report, base):
+        json_path = Path(f'{base}.json')
+        json_path.write_text(json.dumps(report, indent=2))
+
+        lines = [
+            f"# INT8 evaluation of {Path(report['checkpoint']).name}",
+            '',
+            f"Backend `{report['backend']}` ({report['method']}), imgsz {report['imgsz']}, "
+            f"latency over {report['variants'][0]['latency']['frames']} image(s) from `{report['latency_images']}`.",
+            '',
+            '| Variant | mAP50 | mAP50-95 | Mean ms | p95 ms | Weights MB | Load RSS MB |',
+            '|---------|-------|----------|---------|--------|------------|-------------|',
+        ]
+        for variant in report['variants']:
+            accuracy = variant['accuracy'] or {}
+            lines.append(
+                f"| {variant['backend']} {variant['precision']} "
+                f"| {accuracy.get('map50', '-')} | {accuracy.get('map50_95', '-')} "
+                f"| {variant['latency']['mean_ms']:.1f} | {variant['latency']['p95_ms']:.1f} "
+                f"| {variant['weights_bytes'] / (1024 * 1024):.1f} "
+                f"| {variant['load_rss_delta_bytes'] / (1024 * 1024):.1f} |"
+            )
+        comparison = report['int8_vs_fp32']
+        lines += ['', f"INT8 is {comparison['speedup']:.2f}x the speed of {report['backend']} FP32"]
+        if 'map50_drop' in comparison:
+            lines[-1] += f" for a mAP50 drop of {comparison['map50_drop']:.4f} (mAP50-95: {comparison['map50_95_drop']:.4f})"
+        lines[-1] += '.'
+        lines += ['', f"Serve it with `INFERENCE_BACKEND={report['backend']}` and `INFERENCE_PRECISION=int8`.", '']
+
+        markdown_path = Path(f'{base}.md')
+        markdown_path.write_text('\n'.join(lines))
+
+        self.stdout.write('\n'.join(lines[4:-3]))
+        self.stdout.write(self.style.SUCCESS(f'Report written to {json_path} and {markdown_path}'))
@@ -0,0 +1,27 @@
+"""
+Management command to recompute every device's alert subscriptions (the users
+within ALERT_RADII_KM of it) from scratch. Needed after bulk imports or
+queryset updates of device or home locations, which bypass the save signals
+that keep the table current, after changing the radii, and after turning
+ALERT_SUBSCRIPTIONS_ENABLED back on.
+Run with: python manage.py rebuild_alert_subscriptions
+"""
+
+import time
+from django.core.management.base import BaseCommand
+
+from api.models import AlertSubscription
+from api.subscriptions import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed device -> alert recipient subscriptions'
+
+    def handle(self, *args, **options):
+        before = AlertSubscription.objects.count()
+        self.stdout.write(self.style.WARNING('Rebuilding alert subscriptions...'))
+        started = time.perf_counter()
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} subscription(s) (was {before}) in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,143 @@
+"""
+Management command to re-score stored captures after a model update. Each
+capture is scored with the checkpoint its device is routed to (per-device
+model_path, MODEL_REGION_ROUTES, else the default), or with --model for all
+of them when given. Captures are streamed in primary-key order,
+classified in batches and written back in bulk; progress is checkpointed
+after every chunk so an interrupted run resumes where it stopped. Captures
+already scored by their checkpoint's current version are skipped.
+
+Events and alerts are not touched: only the stored label, score, boxes and
+model version of each capture change.
+
+Run with: python manage.py reclassify_captures --max-rate 20 --max-pending-jobs 10
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+
+from api.inference import get_default_model_path
+from api.models import CapturedImage
+from api.reclassify import (
+    RateLimiter, classify_rows, iter_chunks, load_progress, save_progress, save_results,
+    target_version, wait_for_live_queue,
+)
+
+
+class Command(BaseCommand):
+    help = 'Re-classify stored captures with the current model in resumable, rate-limited batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=None, help='Checkpoint to score every capture with (default: each device\'s routed checkpoint)')
+        parser.add_argument('--device-id', default=None, help='Only captures from this device')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Captures read, classified and written per transaction')
+        parser.add_argument('--batch-size', type=int, default=16, help='Frames per predict call')
+        parser.add_argument('--max-rate', type=float, default=10.0, help='Frames per second at most, paced per predict batch (0 = unlimited)')
+        parser.add_argument('--max-pending-jobs', type=int, default=10, help='Pause while more capture jobs than this are queued (0 = never)')
+        parser.add_argument('--nice', type=int, default=10, help='Lower the CPU priority of this process by this much (POSIX only)')
+        parser.add_argument('--progress-file', default=None, help='Checkpoint file (default: reclassify_<model version>.json next to the checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore saved progress and start from the first capture')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many captures (the run can be resumed)')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--chunk-size and --batch-size must be at least 1')
+        model_path = Path(options['model']) if options['model'] else None
+        checkpoint = model_path or get_default_model_path()
+        if not checkpoint.exists():
+            raise CommandError(f'YOLO model not found at {checkpoint}')
+
+        if options['nice'] and hasattr(os, 'nice'):
+            os.nice(options['nice'])
+
+        version = target_version(model_path)
+        progress_file = Path(options['progress_file'] or checkpoint.parent / f'reclassify_{version}.json')
+
+        # Routed captures are compared with their own checkpoint's version in classify_rows
+        queryset = CapturedImage.objects.all() if model_path is None else CapturedImage.objects.exclude(model_version=version)
+        if options['device_id']:
+            queryset = queryset.filter(device__device_id=options['device_id'])
+
+        progress = None if options['restart'] else load_progress(progress_file)
+        if progress and (progress.get('model_version') != version or progress.get('device_id') != options['device_id']):
+            raise CommandError(
+                f'{progress_file} belongs to another run ({progress.get("model_version")}, '
+                f'device {progress.get("device_id")}); pass --restart or --progress-file'
+            )
+        if progress is None:
+            # Later captures are scored at ingest, so the run never chases new rows
+            last = CapturedImage.objects.order_by('-pk').values_list('pk', flat=True).first()
+            progress = {
+                'model_version': version,
+                'checkpoint': str(checkpoint),
+                'device_id': options['device_id'],
+                'started_at': datetime.now(timezone.utc).isoformat(),
+                'up_to_pk': last or 0,
+                'last_pk': 0,
+                'processed': 0,
+                'changed': 0,
+                'skipped': 0,
+                'current': 0,
+            }
+        else:
+            self.stdout.write(f"Resuming after capture {progress['last_pk']} ({progress['processed']} done)")
+
+        remaining = queryset.filter(
+            duplicate_of__isnull=True, pk__gt=progress['last_pk'], pk__lte=progress['up_to_pk']
+        ).count()
+        scorer = version if model_path else f'their routed checkpoints (default {version})'
+        self.stdout.write(self.style.WARNING(
+            f'Checking {remaining} capture(s) against {scorer} '
+            f'(max {options["max_rate"] or "unlimited"} frames/s); progress in {progress_file}'
+        ))
+
+        limiter = RateLimiter(options['max_rate'])
+        started = time.perf_counter()
+        done = 0
+        try:
+            for chunk in iter_chunks(progress['last_pk'], progress['up_to_pk'], options['chunk_size'], queryset):
+                if options['limit'] is not None:
+                    chunk = chunk[:options['limit'] - done]
+                    if not chunk:
+                        break
+
+                if wait_for_live_queue(options['max_pending_jobs']):
+                    self.stdout.write('  resumed after the capture job queue drained')
+
+                results = classify_rows(chunk, model_path, options['batch_size'], limiter)
+                changed = save_results(chunk, results)
+                classified = sum(result is not None for result in results.values())
+                skipped = sum(result is None for result in results.values())
+                # Rows classify_rows left out were already scored by their checkpoint's version
+                current = len(chunk) - len(results)
+
+                done += len(chunk)
+                progress.update(
+                    last_pk=chunk[-1].pk,
+                    processed=progress['processed'] + classified,
+                    changed=progress['changed'] + changed,
+                    skipped=progress['skipped'] + skipped,
+                    current=progress.get('current', 0) + current,
+                    updated_at=datetime.now(timezone.utc).isoformat(),
+                )
+                save_progress(progress_file, progress)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"  {done}/{remaining} checked ({done / elapsed:.1f}/s): up to capture {progress['last_pk']}, "
+                    f"{classified} re-classified, {current} already current, {changed} label change(s)"
+                )
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(f"Interrupted; rerun to resume after capture {progress['last_pk']}"))
+            return
+
+        progress['finished'] = done >= remaining
+        save_progress(progress_file, progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-classified {progress['processed']} capture(s), {progress['skipped']} skipped (missing or unreadable image), "
+            f"{progress.get('current', 0)} already current; "
+            f"{progress['changed']} row(s) changed label, burst duplicates included"
+        ))
@@ -0,0 +1,68 @@
+"""
+Management command to run the standalone YOLO inference service.
+Run with: python manage.py run_inference_service --workers 4
+"""
+
+import os
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand
+
+from api.backends import model_artifact
+from api.inference import get_backend_name, get_default_model_path
+from api.inference_service import InferenceServer, get_authkey
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of YOLO worker processes that serve inference to the Django workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--address',
+            default=getattr(settings, 'INFERENCE_SERVICE_ADDRESS', '') or '127.0.0.1:8765',
+            help='Unix socket path or host:port to listen on',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'INFERENCE_SERVICE_WORKERS', 0),
+            help='Number of worker processes (default: one per CPU core)',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=0,
+            help='Intra-op threads per worker (default: cores divided by workers)',
+        )
+        parser.add_argument('--model', default=None, help='Path to the YOLO checkpoint')
+
+    def handle(self, *args, **options):
+        cpu_count = os.cpu_count() or 1
+        workers = options['workers'] or cpu_count
+        threads = options['threads'] or max(1, cpu_count // workers)
+        model_path = options['model'] or get_default_model_path()
+
+        # Deployments may ship only the ONNX/OpenVINO export of the checkpoint
+        backend = get_backend_name()
+        if model_artifact(model_path, backend) is None:
+            self.stderr.write(self.style.ERROR(f'No {backend} model for {model_path}'))
+            return
+
+        try:
+            authkey = get_authkey(options['address'])
+        except ImproperlyConfigured as e:
+            self.stderr.write(self.style.ERROR(str(e)))
+            return
+
+        self.stdout.write(self.style.WARNING(f'Starting inference service with {workers} workers...'))
+        server = InferenceServer(
+            options['address'],
+            authkey,
+            workers=workers,
+            model_path=model_path,
+            threads_per_worker=threads,
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Inference service stopped'))
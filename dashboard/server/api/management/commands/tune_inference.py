@@ -0,0 +1,177 @@
+"""
+Management command to find the fastest inference thread count, micro-batch
+size and input size for this host by sweeping them over a sample corpus.
+
+Each worker process runs its own model, so the thread budget is the CPU count
+divided by --workers (gunicorn workers on the box). Input sizes other than the
+configured one are only eligible if the top label agrees with it on at least
+--min-agreement of the corpus. The fastest eligible configuration (frames/s,
+within --max-latency-ms per batch if given) is written to
+INFERENCE_TUNING_FILE and applied by serving processes at startup.
+
+Run with: python manage.py tune_inference path/to/images --workers 3 --image-sizes 320 384 448
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from api.backends import create_backend
+from api.capture import prepare_frame
+from api.inference import get_backend_name, get_default_model_path, model_version
+from api.tuning import cpu_count, get_tuning_file, host_fingerprint, save_tuning, untuned_setting
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def thread_candidates(budget):
+    """Powers of two up to the per-worker budget, plus the budget itself."""
+    candidates = {budget}
+    threads = 1
+    while threads < budget:
+        candidates.add(threads)
+        threads *= 2
+    return sorted(candidates)
+
+
+def top_label(summary):
+    return summary["detections"][0]["label"] if summary["detections"] else None
+
+
+class Command(BaseCommand):
+    help = 'Sweep inference threads, batch size and input size on this host and save the fastest configuration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory of sample images (e.g. the val split)')
+        parser.add_argument('--limit', type=int, default=32, help='Images to load from the corpus')
+        parser.add_argument('--rounds', type=int, default=3, help='Passes over the corpus per configuration')
+        parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 1) or 1), help='Worker processes sharing this host (default: WEB_CONCURRENCY or 1)')
+        parser.add_argument('--threads', type=int, nargs='+', default=None, help='Thread counts to try (default: powers of two up to CPUs / workers)')
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8], help='Micro-batch sizes to try')
+        parser.add_argument('--image-sizes', type=int, nargs='+', default=None, help='Input sizes to try, multiples of 32 (default: INFERENCE_IMAGE_SIZE only)')
+        parser.add_argument('--min-agreement', type=float, default=0.95, help='Minimum top-label agreement with INFERENCE_IMAGE_SIZE for other sizes')
+        parser.add_argument('--max-latency-ms', type=float, default=None, help='Reject configurations whose p95 batch latency exceeds this')
+        parser.add_argument('--output', default=None, help='Where to write the result (default: INFERENCE_TUNING_FILE, or inference_tuning.json next to the checkpoint)')
+        parser.add_argument('--dry-run', action='store_true', help='Report the best configuration without saving it')
+
+    def handle(self, *args, **options):
+        root = Path(options['path'])
+        files = sorted(p for p in root.rglob('*') if p.suffix.lower() in IMAGE_EXTS)[:options['limit']]
+        if not files:
+            raise CommandError(f'No images found under {root}')
+        output = options['output'] or get_tuning_file()
+
+        reference_size = untuned_setting('INFERENCE_IMAGE_SIZE', 384)
+        sizes = sorted(set(options['image_sizes'] or [reference_size]) | {reference_size})
+        if any(size % 32 for size in sizes):
+            raise CommandError('Input sizes must be multiples of 32')
+        budget = max(1, cpu_count() // max(1, options['workers']))
+        threads_list = options['threads'] or thread_candidates(budget)
+        checkpoint = get_default_model_path()
+
+        self.stdout.write(
+            f'{get_backend_name()} on {cpu_count()} CPU(s) / {options["workers"]} worker(s): '
+            f'threads {threads_list}, batch sizes {options["batch_sizes"]}, input sizes {sizes}'
+        )
+
+        corpus = [(path.name, path.read_bytes()) for path in files]
+        frames_by_size = {
+            size: [prepare_frame(SimpleUploadedFile(name, data), size)[0] for name, data in corpus]
+            for size in sizes
+        }
+
+        agreement = self._agreement(checkpoint, frames_by_size, reference_size)
+        for size in sizes:
+            self.stdout.write(f'  imgsz {size}: top-label agreement {agreement[size]:.3f}')
+
+        results = []
+        for threads in threads_list:
+            with override_settings(INFERENCE_THREADS=threads):
+                backend = create_backend(get_backend_name(), checkpoint).load()
+                for size in sizes:
+                    for batch_size in options['batch_sizes']:
+                        trial = self._measure(backend, frames_by_size[size], size, batch_size, options['rounds'])
+                        trial.update(threads=threads, image_size=size, batch_size=batch_size, agreement=agreement[size])
+                        trial['eligible'] = (
+                            (size == reference_size or agreement[size] >= options['min_agreement'])
+                            and (options['max_latency_ms'] is None or trial['p95_batch_ms'] <= options['max_latency_ms'])
+                        )
+                        results.append(trial)
+                        self.stdout.write(
+                            f"  threads {threads:>2}  imgsz {size}  batch {batch_size:>2}: "
+                            f"{trial['frames_per_second']:7.2f} frames/s, p95 batch {trial['p95_batch_ms']:7.1f} ms"
+                            f"{'' if trial['eligible'] else '  (ineligible)'}"
+                        )
+                del backend
+
+        eligible = [trial for trial in results if trial['eligible']]
+        if not eligible:
+            raise CommandError('No configuration met the agreement and latency limits')
+        best = max(eligible, key=lambda trial: trial['frames_per_second'])
+        baseline = next(
+            (t for t in results if t['image_size'] == reference_size and t['threads'] == (untuned_setting('INFERENCE_THREADS', 0) or budget) and t['batch_size'] == 1),
+            None,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Best: threads {best['threads']}, batch {best['batch_size']}, imgsz {best['image_size']} "
+            f"-> {best['frames_per_second']:.2f} frames/s"
+            + (f" ({best['frames_per_second'] / baseline['frames_per_second']:.2f}x the untuned batch-1 run)" if baseline else '')
+        ))
+
+        tuning = {
+            'tuned_at': datetime.now(timezone.utc).isoformat(),
+            'host': host_fingerprint(),
+            'workers': options['workers'],
+            'checkpoint': str(checkpoint),
+            'model_version': model_version(checkpoint),
+            'corpus': str(root),
+            'settings': {
+                'INFERENCE_THREADS': best['threads'],
+                'INFERENCE_MAX_BATCH_SIZE': best['batch_size'],
+                'INFERENCE_IMAGE_SIZE': best['image_size'],
+            },
+            'best': best,
+            'trials': results,
+        }
+        if options['dry_run']:
+            return
+        save_tuning(output, tuning)
+        self.stdout.write(f'Saved to {output}; serving processes apply it at startup')
+
+    def _agreement(self, checkpoint, frames_by_size, reference_size):
+        """Share of frames whose top label at each size matches the reference size."""
+        backend = create_backend(get_backend_name(), checkpoint).load()
+        labels = {
+            size: [top_label(backend.predict([frame], imgsz=size)[0]) for frame in frames]
+            for size, frames in frames_by_size.items()
+        }
+        reference = labels[reference_size]
+        return {
+            size: sum(a == b for a, b in zip(values, reference)) / len(reference)
+            for size, values in labels.items()
+        }
+
+    def _measure(self, backend, frames, size, batch_size, rounds):
+        batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+        backend.predict(batches[0], imgsz=size)  # Warm up this shape
+
+        timings = []
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for batch in batches:
+                batch_started = time.perf_counter()
+                backend.predict(batch, imgsz=size)
+                timings.append((time.perf_counter() - batch_started) * 1000)
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        return {
+            'frames_per_second': round(len(frames) * rounds / elapsed, 3),
+            'mean_batch_ms': round(sum(timings) / len(timings), 3),
+            'p95_batch_ms': round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3),
+        }
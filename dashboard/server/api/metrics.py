@@ -0,0 +1,120 @@
+"""
+Lightweight in-process metrics for the inference and capture paths.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+STAGE_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """
+    Thread-safe histogram with fixed upper-bound buckets.
+
+    Bucket counts are reported cumulatively (Prometheus style), so the value for
+    a bucket is the number of observations less than or equal to its bound.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            value_sum = self._sum
+
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = total
+
+        return {
+            "buckets": cumulative,
+            "count": total,
+            "sum": round(value_sum, 6),
+            "mean": round(value_sum / total, 6) if total else 0.0,
+        }
+
+
+class StageTimers:
+    """A histogram per named stage, created on first use."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, milliseconds):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram(self.buckets))
+        histogram.observe(milliseconds)
+
+    @contextmanager
+    def time(self, stage):
+        """Time the `with` block (also when it raises) in milliseconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - started) * 1000)
+
+    def snapshot(self):
+        return {stage: histogram.snapshot() for stage, histogram in list(self._histograms.items())}
+
+
+class Counter:
+    """Thread-safe counters by label."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label, amount=1):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+@contextmanager
+def count_queries():
+    """Count the SQL queries run on the default connection inside the block; yields a dict."""
+    from django.db import connection
+
+    counter = {"queries": 0}
+
+    def wrapper(execute, sql, params, many, context):
+        counter["queries"] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+# Capture path: time per stage, SQL queries per capture and outcomes
+capture_stages = StageTimers(STAGE_BUCKETS_MS)
+capture_queries = Histogram(QUERY_COUNT_BUCKETS)
+capture_outcomes = Counter()
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:37
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_add_annotated_image"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="capturedimage",
+            name="animal_type",
+            field=models.CharField(
+                choices=[
+                    ("Bear", "Bear"),
+                    ("Bison", "Bison"),
+                    ("Elephant", "Elephant"),
+                    ("Human", "Human"),
+                    ("Leopard", "Leopard"),
+                    ("Lion", "Lion"),
+                    ("Tiger", "Tiger"),
+                    ("Boar", "Boar"),
+                    ("Bision", "Bision"),
+                    ("Leopord", "Leopord"),
+                    ("Wild Boar", "Wild Boar"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="CaptureJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "job_id",
+                    models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+                ),
+                (
+                    "image",
+                    models.ImageField(
+                        help_text="Uploaded image awaiting classification",
+                        upload_to="captured_images/%Y/%m/%d/",
+                    ),
+                ),
+                (
+                    "base_url",
+                    models.CharField(
+                        blank=True,
+                        help_text="Absolute base URL used to build media links",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                (
+                    "result",
+                    models.JSONField(
+                        blank=True,
+                        help_text="Capture response payload once processed",
+                        null=True,
+                    ),
+                ),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "captured_image",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="jobs",
+                        to="api.capturedimage",
+                    ),
+                ),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="capture_jobs",
+                        to="api.device",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Capture Job",
+                "verbose_name_plural": "Capture Jobs",
+                "ordering": ["created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "created_at"],
+                        name="api_capture_status_5eccac_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_capturejob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="capturedimage",
+            name="detections",
+            field=models.JSONField(
+                blank=True,
+                help_text="Compact YOLO boxes, classes and scores used to render the annotated image",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_capturedimage_detections"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Detection",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "animal_type",
+                    models.CharField(
+                        choices=[
+                            ("Bear", "Bear"),
+                            ("Bison", "Bison"),
+                            ("Elephant", "Elephant"),
+                            ("Human", "Human"),
+                            ("Leopard", "Leopard"),
+                            ("Lion", "Lion"),
+                            ("Tiger", "Tiger"),
+                            ("Boar", "Boar"),
+                            ("Bision", "Bision"),
+                            ("Leopord", "Leopord"),
+                            ("Wild Boar", "Wild Boar"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("class_id", models.PositiveSmallIntegerField()),
+                (
+                    "confidence",
+                    models.FloatField(help_text="Box confidence from YOLO model (0-1)"),
+                ),
+                ("x1", models.FloatField(blank=True, null=True)),
+                ("y1", models.FloatField(blank=True, null=True)),
+                ("x2", models.FloatField(blank=True, null=True)),
+                ("y2", models.FloatField(blank=True, null=True)),
+                (
+                    "captured_image",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="boxes",
+                        to="api.capturedimage",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Detection",
+                "verbose_name_plural": "Detections",
+                "ordering": ["captured_image", "-confidence"],
+                "indexes": [
+                    models.Index(
+                        fields=["animal_type", "confidence"],
+                        name="api_detecti_animal__834b68_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_detection"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="capturedimage",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Earlier frame of the same burst whose image and classification this record reuses",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="api.capturedimage",
+            ),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_capturedimage_duplicate_of"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DetectionEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "animal_type",
+                    models.CharField(
+                        choices=[
+                            ("Bear", "Bear"),
+                            ("Bison", "Bison"),
+                            ("Elephant", "Elephant"),
+                            ("Human", "Human"),
+                            ("Leopard", "Leopard"),
+                            ("Lion", "Lion"),
+                            ("Tiger", "Tiger"),
+                            ("Boar", "Boar"),
+                            ("Bision", "Bision"),
+                            ("Leopord", "Leopord"),
+                            ("Wild Boar", "Wild Boar"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("last_seen_at", models.DateTimeField()),
+                ("frame_count", models.PositiveIntegerField(default=1)),
+                (
+                    "best_confidence",
+                    models.FloatField(
+                        help_text="Highest frame confidence seen in this event (0-1)"
+                    ),
+                ),
+                (
+                    "best_image",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="best_of_events",
+                        to="api.capturedimage",
+                    ),
+                ),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="detection_events",
+                        to="api.device",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Detection Event",
+                "verbose_name_plural": "Detection Events",
+                "ordering": ["-last_seen_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="capturedimage",
+            name="event",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Animal visit this frame belongs to",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="frames",
+                to="api.detectionevent",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="detectionevent",
+            index=models.Index(
+                fields=["device", "animal_type", "last_seen_at"],
+                name="api_detecti_device__1bc306_idx",
+            ),
+        ),
+    ]
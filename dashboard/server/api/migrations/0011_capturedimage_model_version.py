@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_detectionevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="capturedimage",
+            name="model_version",
+            field=models.CharField(
+                blank=True,
+                help_text="Version of the YOLO model that produced the detections",
+                max_length=64,
+            ),
+        ),
+    ]
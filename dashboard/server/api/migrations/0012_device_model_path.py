@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_capturedimage_model_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="device",
+            name="model_path",
+            field=models.CharField(
+                blank=True,
+                help_text="YOLO checkpoint for this device (relative to best_models/); empty = region route or default",
+                max_length=255,
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_device_model_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="device",
+            name="gate_min_brightness",
+            field=models.FloatField(
+                blank=True,
+                help_text="Mean brightness (0-255) below which frames are skipped; empty = CAPTURE_GATE_MIN_BRIGHTNESS",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="device",
+            name="gate_min_foreground",
+            field=models.FloatField(
+                blank=True,
+                help_text="Fraction of pixels that must differ from the background to run inference; empty = CAPTURE_GATE_MIN_FOREGROUND",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="device",
+            name="gate_min_sharpness",
+            field=models.FloatField(
+                blank=True,
+                help_text="Laplacian variance below which frames are skipped as blurred; empty = CAPTURE_GATE_MIN_SHARPNESS",
+                null=True,
+            ),
+        ),
+    ]
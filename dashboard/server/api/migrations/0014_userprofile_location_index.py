@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_device_gate_thresholds"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="userprofile",
+            index=models.Index(
+                fields=["user_type", "home_lat", "home_lon"],
+                name="api_userpro_user_ty_3208f4_idx",
+            ),
+        ),
+    ]
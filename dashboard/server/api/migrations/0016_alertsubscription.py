@@ -0,0 +1,113 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:21
+
+import math
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Alert radii at the time of this migration (notifications.ALERT_RADII_KM)
+ALERT_RADII_KM = {"ranger": 50, "public": 10}
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+    a = (
+        math.sin(delta_lat / 2) ** 2
+        + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2
+    )
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return 6371 * c
+
+
+def populate_subscriptions(apps, schema_editor):
+    """Subscribe every existing home to the devices in range, so alerts keep working."""
+    AlertSubscription = apps.get_model("api", "AlertSubscription")
+    Device = apps.get_model("api", "Device")
+    UserProfile = apps.get_model("api", "UserProfile")
+
+    profiles = list(
+        UserProfile.objects.filter(
+            home_lat__isnull=False,
+            home_lon__isnull=False,
+            user_type__in=list(ALERT_RADII_KM),
+        ).values_list("user_id", "home_lat", "home_lon", "user_type")
+    )
+    devices = Device.objects.filter(lat__isnull=False, lon__isnull=False)
+    for device_id, lat, lon in devices.values_list("id", "lat", "lon"):
+        rows = []
+        for user_id, home_lat, home_lon, user_type in profiles:
+            distance = haversine_distance(lat, lon, home_lat, home_lon)
+            if distance <= ALERT_RADII_KM[user_type]:
+                rows.append(
+                    AlertSubscription(
+                        device_id=device_id,
+                        user_id=user_id,
+                        role=user_type,
+                        distance=distance,
+                    )
+                )
+        AlertSubscription.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_userprofile_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AlertSubscription",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[("public", "Public"), ("ranger", "Ranger")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "distance",
+                    models.FloatField(
+                        help_text="Distance from the device to the user's home (km)"
+                    ),
+                ),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alert_subscriptions",
+                        to="api.device",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alert_subscriptions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Alert Subscription",
+                "verbose_name_plural": "Alert Subscriptions",
+                "unique_together": {("device", "user")},
+            },
+        ),
+        migrations.RunPython(populate_subscriptions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_alertsubscription"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="capturejob",
+            name="not_before",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="A failed job is not retried before this time",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="capturejob",
+            name="captured_image",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Capture stored by this job; set in the insert transaction so a retry never stores it twice",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="jobs",
+                to="api.capturedimage",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:55
+
+from django.db import migrations
+
+BOX_FIELDS = ("animal_type", "class_id", "confidence", "x1", "y1", "x2", "y2")
+
+
+def copy_duplicate_detections(apps, schema_editor):
+    """Give existing burst duplicates copies of their original's boxes, so box filters find them."""
+    CapturedImage = apps.get_model("api", "CapturedImage")
+    Detection = apps.get_model("api", "Detection")
+
+    duplicates = (
+        CapturedImage.objects.filter(duplicate_of__isnull=False, boxes__isnull=True)
+        .values_list("id", "duplicate_of_id")
+        .order_by("duplicate_of_id")
+    )
+    boxes = {}
+    rows = []
+    for duplicate_id, original_id in list(duplicates):
+        if original_id not in boxes:
+            boxes = {original_id: list(Detection.objects.filter(captured_image_id=original_id).values(*BOX_FIELDS))}
+        rows.extend(Detection(captured_image_id=duplicate_id, **box) for box in boxes[original_id])
+        if len(rows) >= 5000:
+            Detection.objects.bulk_create(rows)
+            rows = []
+    Detection.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_capturejob_not_before"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_duplicate_detections, migrations.RunPython.noop),
+    ]
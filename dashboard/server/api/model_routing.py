@@ -0,0 +1,45 @@
+"""
+Per-device and per-region model routing.
+
+Reserves see different species sets, so devices can be served by smaller
+specialised checkpoints instead of the 8-class best.pt. A device's own
+`model_path` wins; otherwise the first entry of MODEL_REGION_ROUTES whose
+bounding box contains the device location; otherwise the default model.
+Relative paths are resolved against the default checkpoint's directory.
+Loaded models live in the shared LRU `inference.registry`.
+"""
+
+from pathlib import Path
+from django.conf import settings
+
+from .inference import get_default_model_path
+
+
+def _resolve(model_path):
+    path = Path(model_path)
+    if not path.is_absolute():
+        path = get_default_model_path().parent / path
+    return path
+
+
+def get_region_routes():
+    """
+    MODEL_REGION_ROUTES entries look like
+    {"name": "reserve-north", "bbox": [south, west, north, east], "model": "north.pt"}.
+    """
+    return getattr(settings, 'MODEL_REGION_ROUTES', None) or []
+
+
+def resolve_model_path(device):
+    """Checkpoint to use for `device`, or None for the default model."""
+    if device is None:
+        return None
+    if device.model_path:
+        return _resolve(device.model_path)
+
+    if device.lat is not None and device.lon is not None:
+        for route in get_region_routes():
+            south, west, north, east = route["bbox"]
+            if south <= device.lat <= north and west <= device.lon <= east:
+                return _resolve(route["model"])
+    return None
@@ -1,6 +1,8 @@
-from django.db import models
+import functools
+import uuid
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 
 
@@ -18,6 +20,7 @@ class UserProfile(models.Model):
     home_lat = models.FloatField(null=True, blank=True, help_text="Home Latitude")
     home_lon = models.FloatField(null=True, blank=True, help_text="Home Longitude")
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, default='public')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, help_text="Last change; other processes sync their recipient tables from it")
     
     def __str__(self):
         return f"{self.user.username}'s profile ({self.user_type})"
@@ -25,6 +28,8 @@ class UserProfile(models.Model):
     class Meta:
         verbose_name = "User Profile"
         verbose_name_plural = "User Profiles"
+        # Bounding-box prefilter of alert recipients (see notifications.get_users_within_radius)
+        indexes = [models.Index(fields=['user_type', 'home_lat', 'home_lon'])]
 
 
 @receiver(post_save, sender=User)
@@ -41,6 +46,21 @@ def save_user_profile(sender, instance, **kwargs):
         instance.profile.save()
 
 
+@receiver(post_init, sender=UserProfile)
+def remember_home_location(sender, instance, **kwargs):
+    """Note the home location as loaded, to tell when alert subscriptions go stale."""
+    from .subscriptions import remember_location
+    remember_location(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+def update_user_subscriptions(sender, instance, created, update_fields=None, **kwargs):
+    """Recompute the user's alert subscriptions, once the save commits, when their home location or type changes."""
+    from . import subscriptions
+    if subscriptions.is_enabled() and subscriptions.location_changed(instance, created, update_fields):
+        transaction.on_commit(functools.partial(subscriptions.subscribe_profile, instance))
+
+
 class Device(models.Model):
     """
     Model to store IoT device information.
@@ -49,6 +69,10 @@ class Device(models.Model):
     lat = models.FloatField(null=True, blank=True, help_text="Latitude")
     lon = models.FloatField(null=True, blank=True, help_text="Longitude")
     owned_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="devices")
+    model_path = models.CharField(max_length=255, blank=True, help_text="YOLO checkpoint for this device (relative to best_models/); empty = region route or default")
+    gate_min_foreground = models.FloatField(null=True, blank=True, help_text="Fraction of pixels that must differ from the background to run inference; empty = CAPTURE_GATE_MIN_FOREGROUND")
+    gate_min_brightness = models.FloatField(null=True, blank=True, help_text="Mean brightness (0-255) below which frames are skipped; empty = CAPTURE_GATE_MIN_BRIGHTNESS")
+    gate_min_sharpness = models.FloatField(null=True, blank=True, help_text="Laplacian variance below which frames are skipped as blurred; empty = CAPTURE_GATE_MIN_SHARPNESS")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -60,6 +84,41 @@ class Device(models.Model):
         verbose_name_plural = "Devices"
 
 
+class AlertSubscription(models.Model):
+    """
+    A user whose home is within alert range of a device (50 km for rangers,
+    10 km for the public). Precomputed when a device or a home location moves
+    so that an alert reads its recipients with one query (see api.subscriptions).
+    """
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name="alert_subscriptions")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="alert_subscriptions")
+    role = models.CharField(max_length=10, choices=UserProfile.USER_TYPE_CHOICES)
+    distance = models.FloatField(help_text="Distance from the device to the user's home (km)")
+    
+    class Meta:
+        unique_together = [('device', 'user')]
+        verbose_name = "Alert Subscription"
+        verbose_name_plural = "Alert Subscriptions"
+    
+    def __str__(self):
+        return f"{self.device.device_id} -> {self.user.username} ({self.role}, {self.distance:.1f} km)"
+
+
+@receiver(post_init, sender=Device)
+def remember_device_location(sender, instance, **kwargs):
+    """Note the device location as loaded, to tell when alert subscriptions go stale."""
+    from .subscriptions import remember_location
+    remember_location(instance)
+
+
+@receiver(post_save, sender=Device)
+def update_device_subscriptions(sender, instance, created, update_fields=None, **kwargs):
+    """Recompute the device's alert subscriptions, once the save commits, when it moves."""
+    from . import subscriptions
+    if subscriptions.is_enabled() and subscriptions.location_changed(instance, created, update_fields):
+        transaction.on_commit(functools.partial(subscriptions.subscribe_device, instance))
+
+
 class DeviceMessage(models.Model):
     """
     Model to store device connection messages/pings from ESP32.
@@ -99,6 +158,10 @@ class CapturedImage(models.Model):
     annotated_image = models.ImageField(upload_to="annotated_images/%Y/%m/%d/", null=True, blank=True, help_text="YOLO annotated image with bounding boxes")
     animal_type = models.CharField(max_length=20, choices=ANIMAL_CHOICES)
     confidence = models.FloatField(help_text="Confidence score from YOLO model (0-1)")
+    detections = models.JSONField(null=True, blank=True, help_text="Compact YOLO boxes, classes and scores used to render the annotated image")
+    duplicate_of = models.ForeignKey("self", on_delete=models.SET_NULL, null=True, blank=True, related_name="duplicates", help_text="Earlier frame of the same burst whose image and classification this record reuses")
+    model_version = models.CharField(max_length=64, blank=True, help_text="Version of the YOLO model that produced the detections")
+    event = models.ForeignKey("DetectionEvent", on_delete=models.SET_NULL, null=True, blank=True, related_name="frames", help_text="Animal visit this frame belongs to")
     timestamp = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -108,3 +171,88 @@ class CapturedImage(models.Model):
     
     def __str__(self):
         return f"{self.device.device_id} - {self.animal_type} ({self.confidence:.2%})"
+
+
+class Detection(models.Model):
+    """
+    One YOLO box from a captured frame. Every box is kept (not only the best
+    one stored on CapturedImage) so history and analytics can filter by them.
+    """
+    captured_image = models.ForeignKey(CapturedImage, on_delete=models.CASCADE, related_name="boxes")
+    animal_type = models.CharField(max_length=20, choices=CapturedImage.ANIMAL_CHOICES)
+    class_id = models.PositiveSmallIntegerField()
+    confidence = models.FloatField(help_text="Box confidence from YOLO model (0-1)")
+    x1 = models.FloatField(null=True, blank=True)
+    y1 = models.FloatField(null=True, blank=True)
+    x2 = models.FloatField(null=True, blank=True)
+    y2 = models.FloatField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['captured_image', '-confidence']
+        indexes = [models.Index(fields=['animal_type', 'confidence'])]
+        verbose_name = "Detection"
+        verbose_name_plural = "Detections"
+    
+    def __str__(self):
+        return f"{self.captured_image_id} - {self.animal_type} ({self.confidence:.2%})"
+
+
+class DetectionEvent(models.Model):
+    """
+    One animal visit at a device: consecutive frames of the same species
+    within the event window. Alerts go out once per event; later frames only
+    update the frame count and the best frame.
+    """
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name="detection_events")
+    animal_type = models.CharField(max_length=20, choices=CapturedImage.ANIMAL_CHOICES)
+    started_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField()
+    frame_count = models.PositiveIntegerField(default=1)
+    best_confidence = models.FloatField(help_text="Highest frame confidence seen in this event (0-1)")
+    best_image = models.ForeignKey(CapturedImage, on_delete=models.SET_NULL, null=True, blank=True, related_name="best_of_events")
+    
+    class Meta:
+        ordering = ['-last_seen_at']
+        indexes = [models.Index(fields=['device', 'animal_type', 'last_seen_at'])]
+        verbose_name = "Detection Event"
+        verbose_name_plural = "Detection Events"
+    
+    def __str__(self):
+        return f"{self.device.device_id} - {self.animal_type} x{self.frame_count} ({self.best_confidence:.2%})"
+
+
+class CaptureJob(models.Model):
+    """
+    Durable queue entry for an image accepted in asynchronous capture mode.
+    The upload is stored immediately; classification, annotation and alerts
+    run later in a capture job worker.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name="capture_jobs")
+    image = models.ImageField(upload_to="captured_images/%Y/%m/%d/", help_text="Uploaded image awaiting classification")
+    base_url = models.CharField(max_length=255, blank=True, help_text="Absolute base URL used to build media links")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True, help_text="Capture response payload once processed")
+    captured_image = models.ForeignKey(CapturedImage, on_delete=models.SET_NULL, null=True, blank=True, related_name="jobs", help_text="Capture stored by this job; set in the insert transaction so a retry never stores it twice")
+    error = models.TextField(blank=True)
+    not_before = models.DateTimeField(null=True, blank=True, help_text="A failed job is not retried before this time")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        verbose_name = "Capture Job"
+        verbose_name_plural = "Capture Jobs"
+    
+    def __str__(self):
+        return f"{self.device.device_id} - {self.job_id} ({self.status})"
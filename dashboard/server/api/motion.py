@@ -0,0 +1,173 @@
+"""
+Motion and quality gating of capture frames before inference.
+
+Night frames, wind-blown foliage and blank IR frames are not worth a model
+pass. When CAPTURE_GATE_ENABLED is set, each frame is reduced to a small
+greyscale image and checked before inference:
+
+- too dark: mean brightness below the minimum;
+- too blurry: variance of the Laplacian below the minimum;
+- static: less than the minimum fraction of pixels differs from the device's
+  running background (an exponential moving average of its recent frames).
+
+Such frames get the no-detection response without running the model. The
+first frame of a device, and one frame per CAPTURE_GATE_KEYFRAME_SECONDS, is
+always classified so an animal that stands still long enough to become
+background is still seen. Devices can override each threshold
+(`Device.gate_min_*`).
+"""
+
+import threading
+import time
+from django.conf import settings
+
+
+THUMBNAIL_WIDTH = 64
+SHARPNESS_WIDTH = 256
+
+REASON_DARK = "too_dark"
+REASON_BLURRY = "too_blurry"
+REASON_STATIC = "no_motion"
+
+
+def greyscale(frame, width, box=None):
+    """Float32 greyscale array of a BGR frame (or its `box` crop), resized to `width` pixels wide."""
+    import numpy as np
+    from PIL import Image
+    from .inference import frame_to_image
+
+    image = frame_to_image(frame)
+    if box is not None:
+        image = image.crop(box)
+    height = max(1, round(image.height * width / image.width))
+    # Cheap box reduce first so the final resample works on a small image
+    factor = max(1, min(image.width // (width * 2), image.height // (height * 2)))
+    if factor > 1:
+        image = image.reduce(factor)
+    return np.asarray(image.convert("L").resize((width, height), Image.BILINEAR), dtype=np.float32)
+
+
+def sharpness(grey):
+    """Variance of the 4-neighbour Laplacian; low for blurred or featureless frames."""
+    laplacian = (
+        4 * grey[1:-1, 1:-1]
+        - grey[:-2, 1:-1] - grey[2:, 1:-1]
+        - grey[1:-1, :-2] - grey[1:-1, 2:]
+    )
+    return float(laplacian.var())
+
+
+def measure(frame, box=None):
+    """Brightness (0-255), sharpness and the background thumbnail of a frame."""
+    import numpy as np
+    from PIL import Image
+
+    grey = greyscale(frame, SHARPNESS_WIDTH, box)
+    height = max(1, round(grey.shape[0] * THUMBNAIL_WIDTH / grey.shape[1]))
+    thumbnail = Image.fromarray(grey).resize((THUMBNAIL_WIDTH, height), Image.BILINEAR)
+    thumbnail = np.asarray(thumbnail, dtype=np.float32)
+    return float(thumbnail.mean()), sharpness(grey), thumbnail
+
+
+class MotionGate:
+    """Thread-safe per-device background model with quality checks."""
+
+    def __init__(self, min_foreground, min_brightness, min_sharpness,
+                 pixel_delta, background_alpha, keyframe_seconds):
+        self.min_foreground = min_foreground
+        self.min_brightness = min_brightness
+        self.min_sharpness = min_sharpness
+        self.pixel_delta = pixel_delta
+        self.background_alpha = background_alpha
+        self.keyframe_seconds = keyframe_seconds
+        self._backgrounds = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            "checked": 0,
+            "passed": 0,
+            "keyframes": 0,
+            REASON_DARK: 0,
+            REASON_BLURRY: 0,
+            REASON_STATIC: 0,
+        }
+
+    def _threshold(self, device, name):
+        value = getattr(device, f"gate_{name}", None) if device is not None else None
+        return getattr(self, name) if value is None else value
+
+    def check(self, device_id, frame, device=None, box=None):
+        """
+        Return the reason to skip inference for this frame, or None to run it.
+        `box` limits the checks to the picture inside a letterboxed frame. The
+        device's background is updated either way.
+        """
+        brightness, frame_sharpness, thumbnail = measure(frame, box)
+        now = time.monotonic()
+
+        with self._lock:
+            self.counters["checked"] += 1
+            entry = self._backgrounds.get(device_id)
+            if entry is None or entry["background"].shape != thumbnail.shape:
+                # Nothing to compare with yet (or the frame size changed)
+                self._backgrounds[device_id] = {"background": thumbnail, "classified_at": now}
+                self.counters["keyframes"] += 1
+                return None
+
+            background = entry["background"]
+            foreground = float((abs(thumbnail - background) > self.pixel_delta).mean())
+            alpha = self.background_alpha
+            entry["background"] = background * (1 - alpha) + thumbnail * alpha
+
+            reason = None
+            if brightness < self._threshold(device, "min_brightness"):
+                reason = REASON_DARK
+            elif frame_sharpness < self._threshold(device, "min_sharpness"):
+                reason = REASON_BLURRY
+            elif foreground < self._threshold(device, "min_foreground"):
+                reason = REASON_STATIC
+
+            if reason is not None and now - entry["classified_at"] < self.keyframe_seconds:
+                self.counters[reason] += 1
+                return reason
+
+            self.counters["keyframes" if reason is not None else "passed"] += 1
+            entry["classified_at"] = now
+            return None
+
+    def stats(self):
+        with self._lock:
+            checked = self.counters["checked"]
+            skipped = self.counters[REASON_DARK] + self.counters[REASON_BLURRY] + self.counters[REASON_STATIC]
+            return {
+                **self.counters,
+                "skip_ratio": round(skipped / checked, 4) if checked else 0.0,
+                "devices": len(self._backgrounds),
+                "min_foreground": self.min_foreground,
+                "min_brightness": self.min_brightness,
+                "min_sharpness": self.min_sharpness,
+                "keyframe_seconds": self.keyframe_seconds,
+            }
+
+
+_gate = None
+_gate_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, 'CAPTURE_GATE_ENABLED', False)
+
+
+def get_gate():
+    global _gate
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                _gate = MotionGate(
+                    min_foreground=getattr(settings, 'CAPTURE_GATE_MIN_FOREGROUND', 0.01),
+                    min_brightness=getattr(settings, 'CAPTURE_GATE_MIN_BRIGHTNESS', 15),
+                    min_sharpness=getattr(settings, 'CAPTURE_GATE_MIN_SHARPNESS', 10),
+                    pixel_delta=getattr(settings, 'CAPTURE_GATE_PIXEL_DELTA', 25),
+                    background_alpha=getattr(settings, 'CAPTURE_GATE_BACKGROUND_ALPHA', 0.1),
+                    keyframe_seconds=getattr(settings, 'CAPTURE_GATE_KEYFRAME_SECONDS', 60),
+                )
+    return _gate
@@ -9,6 +9,10 @@ from django.conf import settings
 from django.contrib.auth.models import User
 
 
+# Alert range of each user type around the detecting device
+ALERT_RADII_KM = {'ranger': 50, 'public': 10}
+
+
 def get_twilio_client():
     """Get Twilio client lazily to avoid import errors if not configured."""
     try:
@@ -48,32 +52,76 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     return R * c
 
 
+def bounding_box(lat, lon, radius_km):
+    """
+    Latitude and longitude ranges that contain every point within `radius_km`
+    (haversine) of (lat, lon). Returns `(min_lat, max_lat, lon_ranges)`, where
+    `lon_ranges` is a list of `(min_lon, max_lon)` (two when the box crosses
+    the antimeridian), or None when the circle reaches a pole and every
+    longitude qualifies. The box is widened by a hair so rounding never drops
+    a point that the exact distance check would keep.
+    """
+    R = 6371  # Earth's radius in kilometers, as in haversine_distance
+    margin = 1e-6
+
+    angular = radius_km / R
+    delta_lat = math.degrees(angular) + margin
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90 or angular >= math.pi / 2:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None
+
+    # Widest longitude offset on the circle: asin(sin(r) / cos(lat))
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat))))) + margin
+    min_lon, max_lon = lon - delta_lon, lon + delta_lon
+    if min_lon < -180:
+        return min_lat, max_lat, [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return min_lat, max_lat, [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return min_lat, max_lat, [(min_lon, max_lon)]
+
+
 def get_users_within_radius(device_lat, device_lon, radius_km=10, user_type=None):
     """
     Get all users whose home location is within the specified radius of the device.
     
+    Only profiles inside the bounding box of the circle are read (an indexed
+    range scan on user_type/home_lat/home_lon); the exact haversine distance
+    is then checked on those candidates.
+    
     Args:
         device_lat: Device latitude
         device_lon: Device longitude
         radius_km: Radius in kilometers (default 10km)
     
     Returns:
-        QuerySet of User objects within radius
+        List of dicts with the user, mobile number and distance, in profile id order
     """
+    from django.db.models import Q
     from .models import UserProfile
     
     nearby_users = []
     
-    # Get all profiles with home coordinates
+    # Get profiles with home coordinates inside the bounding box
+    min_lat, max_lat, lon_ranges = bounding_box(device_lat, device_lon, radius_km)
     profiles = UserProfile.objects.filter(
         home_lat__isnull=False,
         home_lon__isnull=False,
-        mobile_number__isnull=False
+        mobile_number__isnull=False,
+        home_lat__gte=min_lat,
+        home_lat__lte=max_lat,
     ).exclude(mobile_number='')
 
+    if lon_ranges is not None:
+        lon_filter = Q()
+        for min_lon, max_lon in lon_ranges:
+            lon_filter |= Q(home_lon__gte=min_lon, home_lon__lte=max_lon)
+        profiles = profiles.filter(lon_filter)
+
     if user_type:
         profiles = profiles.filter(user_type=user_type)
     
+    profiles = profiles.select_related('user').order_by('pk')
+    
     for profile in profiles:
         distance = haversine_distance(
             device_lat, device_lon,
@@ -90,6 +138,23 @@ def get_users_within_radius(device_lat, device_lon, radius_km=10, user_type=None
     return nearby_users
 
 
+def find_nearby_users(device_lat, device_lon, radii):
+    """
+    Users near the device for several user types at once: `radii` maps user
+    type to radius in km. Answered from the in-memory recipient table in one
+    vectorized pass (see api.recipients), or with one indexed query per user
+    type when the table is not in use.
+    """
+    from . import recipients
+    
+    if recipients.is_enabled():
+        return recipients.find_nearby_users(device_lat, device_lon, radii)
+    return {
+        user_type: get_users_within_radius(device_lat, device_lon, radius_km=radius_km, user_type=user_type)
+        for user_type, radius_km in radii.items()
+    }
+
+
 def send_whatsapp_message(to_number, message):
     """
     Send a WhatsApp message using Twilio.
@@ -212,6 +277,8 @@ def send_wildlife_alerts(device, animal_type, confidence, image_url=None):
         confidence: Detection confidence (0-1)
         image_url: Optional URL to the captured image
     """
+    from . import subscriptions
+    
     def _send_alerts():
         try:
             device_lat = device.lat
@@ -236,9 +303,14 @@ def send_wildlife_alerts(device, animal_type, confidence, image_url=None):
             if image_url:
                 alert_message += f"\n\nImage: {image_url}"
             
-            # Get rangers within 50km radius and public users within 10km radius
-            nearby_rangers = get_users_within_radius(device_lat, device_lon, radius_km=50, user_type='ranger')
-            nearby_public = get_users_within_radius(device_lat, device_lon, radius_km=10, user_type='public')
+            # Get rangers within 50km radius and public users within 10km radius:
+            # the device's precomputed subscribers, or a geo match right now
+            if subscriptions.is_enabled():
+                nearby = subscriptions.nearby_users(device)
+            else:
+                nearby = find_nearby_users(device_lat, device_lon, ALERT_RADII_KM)
+            nearby_rangers = nearby['ranger']
+            nearby_public = nearby['public']
             
             print(
                 f"Found {len(nearby_rangers)} rangers within 50km and {len(nearby_public)} public users within 10km of device {device.device_id}"
@@ -0,0 +1,187 @@
+"""
+Prometheus text exposition of this worker's metrics.
+
+Collects capture stage timers, SQL query counts, queue depths and model state
+into the text format (version 0.0.4) served at `/metrics`. Everything except
+the capture job counts is per process, so scrape every worker.
+"""
+
+from .metrics import capture_outcomes, capture_queries, capture_stages
+
+PREFIX = "wildlife"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Exposition:
+    """Builds the exposition text, writing HELP/TYPE once per metric family."""
+
+    def __init__(self):
+        self.lines = []
+        self._declared = set()
+
+    def _declare(self, name, kind, help_text):
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, kind, help_text, value, labels=None):
+        name = f"{PREFIX}_{name}"
+        self._declare(name, kind, help_text)
+        self.lines.append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name, help_text, snapshot, labels=None):
+        """Write a `Histogram.snapshot()` (its buckets are already cumulative)."""
+        name = f"{PREFIX}_{name}"
+        labels = labels or {}
+        self._declare(name, "histogram", help_text)
+        for bound, count in snapshot["buckets"].items():
+            self.lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {count}")
+        self.lines.append(f"{name}_sum{_labels(labels)} {snapshot['sum']}")
+        self.lines.append(f"{name}_count{_labels(labels)} {snapshot['count']}")
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def _capture_metrics(out):
+    for stage, snapshot in sorted(capture_stages.snapshot().items()):
+        out.histogram(
+            "capture_stage_duration_milliseconds",
+            "Time spent in each stage of the capture path.",
+            snapshot, {"stage": stage},
+        )
+    out.histogram(
+        "capture_db_queries",
+        "SQL queries run per ingested capture.",
+        capture_queries.snapshot(),
+    )
+    for outcome, count in sorted(capture_outcomes.snapshot().items()):
+        out.sample(
+            "captures_total", "counter",
+            "Captures handled, by outcome.",
+            count, {"outcome": outcome},
+        )
+
+
+def _queue_metrics(out):
+    from django.db.models import Count
+    from .batching import all_batchers
+    from .models import CaptureJob
+
+    # Shared by all workers, so the same value is reported by each of them
+    jobs = dict(CaptureJob.objects.values_list("status").annotate(total=Count("id")))
+    for status, _ in CaptureJob.STATUS_CHOICES:
+        out.sample(
+            "capture_jobs", "gauge",
+            "Capture jobs in the queue table, by status.",
+            jobs.get(status, 0), {"status": status},
+        )
+
+    for model, batcher in sorted(all_batchers().items(), key=lambda item: item[0] or ""):
+        labels = {"model": model or "default"}
+        stats = batcher.stats()
+        out.sample(
+            "batcher_queue_depth", "gauge",
+            "Frames waiting for the micro-batcher.",
+            stats["queue_depth"], labels,
+        )
+        out.histogram("batcher_batch_size", "Frames per batched predict call.", stats["batch_size"], labels)
+        out.histogram(
+            "batcher_queue_wait_milliseconds",
+            "Time frames waited in the micro-batcher.",
+            stats["queue_wait_ms"], labels,
+        )
+
+
+def _model_metrics(out):
+    from . import cascade, motion
+    from .inference import registry
+    from .shadow import get_evaluator
+    from .warmup import is_ready
+
+    # A scrape must not start warm-up in a cold worker
+    out.sample("model_ready", "gauge", "1 once this worker has warmed up the model.", int(is_ready(start=False)))
+
+    stats = registry.stats()
+    for model in stats["models"]:
+        out.sample(
+            "model_loaded", "gauge",
+            "Checkpoints loaded in this worker.",
+            1, {"path": model["path"], "backend": model["backend"], "version": model["version"]},
+        )
+        out.sample(
+            "model_weights_bytes", "gauge",
+            "Size of each loaded checkpoint.",
+            model["weights_bytes"], {"version": model["version"]},
+        )
+    for counter, help_text in (
+        ("hits", "Model lookups served from the registry."),
+        ("misses", "Model lookups that loaded a checkpoint."),
+        ("evictions", "Checkpoints evicted from the registry."),
+    ):
+        out.sample(f"model_registry_{counter}_total", "counter", help_text, stats[counter])
+    out.sample(
+        "model_load_seconds_total", "counter",
+        "Time spent loading checkpoints.",
+        stats["load_seconds_total"],
+    )
+    for version, snapshot in sorted(stats["latency_ms_by_version"].items()):
+        out.histogram(
+            "model_predict_duration_milliseconds",
+            "Batched predict latency per model version.",
+            snapshot, {"version": version},
+        )
+    out.sample(
+        "process_resident_memory_bytes", "gauge",
+        "Resident set size of this worker.",
+        stats["process_rss_bytes"],
+    )
+
+    evaluator = get_evaluator()
+    if evaluator is not None:
+        out.sample(
+            "shadow_pending", "gauge",
+            "Frames queued for the shadow model.",
+            evaluator.stats()["pending"],
+        )
+
+    if cascade.is_enabled():
+        cascade_stats = cascade.get_cascade().stats()
+        for stage in (cascade.STAGE_GATE_EMPTY, cascade.STAGE_GATE_ACCEPTED, cascade.STAGE_FULL):
+            out.sample(
+                "cascade_frames_total", "counter",
+                "Frames decided by each cascade stage.",
+                cascade_stats[stage], {"stage": stage},
+            )
+        out.sample(
+            "cascade_audit_missed_total", "counter",
+            "Audited gate-empty frames in which the full model found an animal.",
+            cascade_stats["audit_missed"],
+        )
+
+    if motion.is_enabled():
+        gate_stats = motion.get_gate().stats()
+        for reason in (motion.REASON_DARK, motion.REASON_BLURRY, motion.REASON_STATIC):
+            out.sample(
+                "capture_gate_skipped_total", "counter",
+                "Frames skipped by the motion and quality gate.",
+                gate_stats[reason], {"reason": reason},
+            )
+
+
+def render_metrics():
+    out = Exposition()
+    _capture_metrics(out)
+    _queue_metrics(out)
+    _model_metrics(out)
+    return out.text()
@@ -0,0 +1,215 @@
+"""
+INT8 variants of the capture model and their evaluation against FP32.
+
+ONNX models are quantized with ONNX Runtime: statically (QDQ, per-channel
+weights, activation ranges calibrated on training images run through the
+same letterbox as inference) or dynamically (weights only, no calibration).
+OpenVINO models are quantized by ultralytics/NNCF during export, which
+calibrates on the dataset described by a data.yaml such as model/data.yaml.
+The result is written to `backends.exported_path(..., "int8")`, where the
+exported backends pick it up when INFERENCE_PRECISION=int8.
+"""
+
+import time
+from pathlib import Path
+
+from .backends import ensure_exported, export_lock, exported_path, get_image_size, letterbox
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def list_images(directory, limit=None):
+    """Image files under `directory`, sorted so runs are reproducible."""
+    files = sorted(p for p in Path(directory).rglob('*') if p.suffix.lower() in IMAGE_EXTS)
+    return files[:limit] if limit else files
+
+
+def dataset_split(data_yaml, split):
+    """Image directory of a split (`train`, `val`) in an ultralytics data.yaml, or None if missing."""
+    import yaml
+
+    with open(data_yaml) as f:
+        data = yaml.safe_load(f) or {}
+    entry = data.get(split)
+    if not entry:
+        return None
+    root = Path(data.get("path") or Path(data_yaml).parent)
+    directory = Path(entry) if Path(entry).is_absolute() else root / entry
+    return directory if directory.is_dir() else None
+
+
+def preprocess(path, imgsz):
+    """NCHW float32 batch of one image, letterboxed exactly as the ONNX backend does."""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as image:
+        array, _, _, _ = letterbox(image.convert("RGB"), imgsz)
+    return np.ascontiguousarray(array.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def _calibration_reader(images, input_name, imgsz):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._images = iter(images)
+
+        def get_next(self):
+            path = next(self._images, None)
+            return None if path is None else {input_name: preprocess(path, imgsz)}
+
+    return Reader()
+
+
+def quantize_onnx(checkpoint, calibration_images=None, imgsz=None, method="static"):
+    """
+    Write the INT8 ONNX variant of `checkpoint` and return its path. Static
+    quantization needs `calibration_images`; dynamic ignores them.
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    imgsz = imgsz or get_image_size()
+    source = ensure_exported(checkpoint, "onnx", imgsz=imgsz)
+    target = exported_path(checkpoint, "onnx", "int8")
+
+    with export_lock(target):
+        started = time.perf_counter()
+        if method == "dynamic":
+            quantize_dynamic(str(source), str(target), weight_type=QuantType.QInt8)
+        else:
+            if not calibration_images:
+                raise ValueError("Static quantization needs calibration images")
+            input_name = ort.InferenceSession(
+                str(source), providers=["CPUExecutionProvider"]
+            ).get_inputs()[0].name
+            quantize_static(
+                str(source),
+                str(target),
+                _calibration_reader(calibration_images, input_name, imgsz),
+                quant_format=QuantFormat.QDQ,
+                per_channel=True,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+            )
+        _copy_onnx_metadata(source, target)
+        print(f"Quantized {source.name} ({method}) in {time.perf_counter() - started:.1f}s: {target}")
+    return target
+
+
+def _copy_onnx_metadata(source, target):
+    """Keep the class names, imgsz and task ultralytics stored in the FP32 export."""
+    import onnx
+
+    metadata = {prop.key: prop.value for prop in onnx.load(str(source), load_external_data=False).metadata_props}
+    model = onnx.load(str(target))
+    existing = {prop.key for prop in model.metadata_props}
+    for key, value in metadata.items():
+        if key not in existing:
+            prop = model.metadata_props.add()
+            prop.key, prop.value = key, value
+    onnx.save(model, str(target))
+
+
+def quantize_openvino(checkpoint, data_yaml, imgsz=None):
+    """Write the INT8 OpenVINO variant of `checkpoint` (NNCF calibration on `data_yaml`)."""
+    from ultralytics import YOLO
+
+    target = exported_path(checkpoint, "openvino", "int8")
+    with export_lock(target):
+        started = time.perf_counter()
+        YOLO(str(checkpoint)).export(
+            format="openvino",
+            imgsz=imgsz or get_image_size(),
+            dynamic=True,
+            int8=True,
+            data=str(data_yaml),
+        )
+        print(f"Quantized {Path(checkpoint).name} (openvino) in {time.perf_counter() - started:.1f}s: {target}")
+    if not target.exists():
+        raise FileNotFoundError(f"INT8 export did not produce {target}")
+    return target
+
+
+# ==================== Evaluation ====================
+
+def measure_accuracy(model_file, data_yaml, imgsz):
+    """mAP of a checkpoint or exported model on the data.yaml val split (ultralytics val, CPU)."""
+    from ultralytics import YOLO
+
+    model_file = Path(model_file)
+    # ultralytics loads OpenVINO models from their directory
+    source = model_file.parent if model_file.suffix == ".xml" else model_file
+    metrics = YOLO(str(source), task="detect").val(
+        data=str(data_yaml), imgsz=imgsz, batch=1, device="cpu", plots=False, verbose=False
+    )
+    return {
+        "map50": round(float(metrics.box.map50), 4),
+        "map50_95": round(float(metrics.box.map), 4),
+        "precision": round(float(metrics.box.mp), 4),
+        "recall": round(float(metrics.box.mr), 4),
+    }
+
+
+def measure_latency(backend, images, warmup=3):
+    """Single-frame predict latency (ms) and memory of a loaded backend over `images`."""
+    import numpy as np
+    from .capture import decode_upload
+    from .inference import get_rss_bytes
+
+    frames = []
+    for path in images:
+        with open(path, "rb") as f:
+            frames.append(decode_upload(f))
+    for frame in frames[:warmup]:
+        backend.predict([frame])
+
+    timings = []
+    rss_peak = get_rss_bytes()
+    for frame in frames:
+        started = time.perf_counter()
+        backend.predict([frame])
+        timings.append((time.perf_counter() - started) * 1000)
+        rss_peak = max(rss_peak, get_rss_bytes())
+
+    timings = np.array(timings)
+    return {
+        "frames": len(timings),
+        "mean_ms": round(float(timings.mean()), 3),
+        "p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+        "peak_rss_bytes": rss_peak,
+    }
+
+
+def evaluate_variant(name, precision, checkpoint, images, data_yaml=None, imgsz=None):
+    """Accuracy, latency and memory of one backend/precision combination."""
+    from .backends import create_backend
+    from .inference import get_rss_bytes
+
+    imgsz = imgsz or get_image_size()
+    rss_before = get_rss_bytes()
+    started = time.perf_counter()
+    backend = create_backend(name, checkpoint, precision).load()
+    load_seconds = time.perf_counter() - started
+
+    model_file = Path(getattr(backend, "model_file", None) or checkpoint)
+    weights = model_file.parent if model_file.suffix == ".xml" else model_file
+    weights_bytes = (
+        sum(p.stat().st_size for p in weights.rglob('*') if p.is_file()) if weights.is_dir()
+        else weights.stat().st_size
+    )
+
+    result = {
+        "backend": name,
+        "precision": precision,
+        "model_file": str(model_file),
+        "weights_bytes": weights_bytes,
+        "load_seconds": round(load_seconds, 3),
+        "load_rss_delta_bytes": max(get_rss_bytes() - rss_before, 0),
+        "latency": measure_latency(backend, images),
+        "accuracy": measure_accuracy(model_file, data_yaml, imgsz) if data_yaml else None,
+    }
+    del backend
+    return result
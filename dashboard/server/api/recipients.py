@@ -0,0 +1,356 @@
+"""
+In-memory table of alert recipients for geo-matching.
+
+Every worker keeps the home coordinates, user types and mobile numbers of all
+profiles in NumPy arrays, loaded once. An alert then matches all user types
+against their radii in one vectorized haversine pass instead of a query
+and a Python loop per user type. Profiles within a hair of their radius are
+re-checked with the scalar `haversine_distance`, so the recipients are
+exactly those of `get_users_within_radius`; distances agree with it to
+floating-point rounding.
+
+It is the fallback recipient matcher: alerts read precomputed subscriptions
+(api.subscriptions) unless ALERT_SUBSCRIPTIONS_ENABLED is off, and only then
+is the table used and its signals connected (see `connect_signals`).
+
+The table follows profile changes incrementally. `post_save`/`post_delete`
+signals update it in the process that made the change, once the transaction
+commits. At most every RECIPIENT_SYNC_INTERVAL_SECONDS a lookup also reads
+the profiles whose `updated_at` moved since the last sync, so changes made by
+other processes (web workers, the capture job worker) are seen too. Profiles
+deleted elsewhere linger until the periodic full reload
+(RECIPIENT_RELOAD_INTERVAL_SECONDS), but their user is gone with them, so
+`find_nearby_users` never returns them.
+"""
+
+import math
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .notifications import haversine_distance
+
+EARTH_RADIUS_KM = 6371  # As in haversine_distance
+USER_TYPES = ("public", "ranger")
+FIELDS = ("pk", "user_id", "home_lat", "home_lon", "mobile_number", "user_type")
+
+# Slack of the vectorized pass; candidates inside it get the exact scalar check
+TOLERANCE = 1e-9
+
+
+def is_eligible(lat, lon, mobile_number):
+    """Same conditions as get_users_within_radius: home coordinates and a mobile number."""
+    return lat is not None and lon is not None and bool(mobile_number)
+
+
+class RecipientTable:
+    """Array-backed profile coordinates with incremental updates; thread-safe."""
+
+    def __init__(self, lookback_seconds=60, sync_interval_seconds=5, reload_interval_seconds=900):
+        self.lookback = timedelta(seconds=lookback_seconds)
+        self.sync_interval = sync_interval_seconds
+        self.reload_interval = reload_interval_seconds
+        self._lock = threading.RLock()
+        self._synced_at = None
+        self._next_sync = 0.0  # time.monotonic() deadlines
+        self._next_reload = 0.0
+        self._rows = {}  # profile id -> row in the arrays
+        self.counters = {"lookups": 0, "reloads": 0, "updates": 0}
+        self._clear()
+
+    def _clear(self):
+        import numpy as np
+
+        self._size = 0
+        self._profile_ids = np.zeros(0, dtype=np.int64)
+        self._user_ids = np.zeros(0, dtype=np.int64)
+        self._lat = np.zeros(0, dtype=np.float64)
+        self._lon = np.zeros(0, dtype=np.float64)
+        self._lat_rad = np.zeros(0, dtype=np.float64)
+        self._cos_lat = np.zeros(0, dtype=np.float64)
+        self._lon_rad = np.zeros(0, dtype=np.float64)
+        self._types = np.zeros(0, dtype=np.int8)
+        self._active = np.zeros(0, dtype=bool)
+        self._mobile = []
+        self._rows = {}
+        self._by_lat = None  # Per user type: rows sorted by latitude, rebuilt lazily after changes
+
+    # ==================== Loading ====================
+
+    def reload(self):
+        """Load every profile from the database."""
+        from .models import UserProfile
+
+        synced_at = timezone.now()
+        rows = list(UserProfile.objects.order_by("pk").values_list(*FIELDS))
+        with self._lock:
+            self._clear()
+            self._append(rows)
+            self._synced_at = synced_at
+            now = time.monotonic()
+            self._next_sync = now + self.sync_interval
+            self._next_reload = now + self.reload_interval
+            self.counters["reloads"] += 1
+        print(f"Recipient table loaded: {len(rows)} profile(s), {int(self._active.sum())} reachable")
+
+    def _append(self, rows):
+        import numpy as np
+
+        if not rows:
+            return
+        profile_ids, user_ids, lats, lons, mobiles, user_types = zip(*rows)
+        active = np.array([is_eligible(*values) for values in zip(lats, lons, mobiles)], dtype=bool)
+        lat = np.array([value if value is not None else np.nan for value in lats], dtype=np.float64)
+        lon = np.array([value if value is not None else np.nan for value in lons], dtype=np.float64)
+
+        start = self._size
+        self._profile_ids = np.concatenate([self._profile_ids[:start], np.array(profile_ids, dtype=np.int64)])
+        self._user_ids = np.concatenate([self._user_ids[:start], np.array(user_ids, dtype=np.int64)])
+        self._lat = np.concatenate([self._lat[:start], lat])
+        self._lon = np.concatenate([self._lon[:start], lon])
+        self._lat_rad = np.radians(self._lat)
+        self._cos_lat = np.cos(self._lat_rad)
+        self._lon_rad = np.radians(self._lon)
+        self._types = np.concatenate([self._types[:start], np.array([self._type_code(t) for t in user_types], dtype=np.int8)])
+        self._active = np.concatenate([self._active[:start], active])
+        self._mobile.extend(mobiles)
+        self._by_lat = None
+        for offset, profile_id in enumerate(profile_ids):
+            self._rows[profile_id] = start + offset
+        self._size = start + len(rows)
+
+    @staticmethod
+    def _type_code(user_type):
+        return USER_TYPES.index(user_type) if user_type in USER_TYPES else -1
+
+    # ==================== Incremental updates ====================
+
+    def upsert(self, rows):
+        """Insert or update profiles given as FIELDS tuples."""
+        with self._lock:
+            if self._synced_at is None:
+                return
+            new_rows = []
+            for row in rows:
+                profile_id, user_id, lat, lon, mobile, user_type = row
+                index = self._rows.get(profile_id)
+                if index is None:
+                    new_rows.append(row)
+                    continue
+                self._user_ids[index] = user_id
+                self._lat[index] = lat if lat is not None else math.nan
+                self._lon[index] = lon if lon is not None else math.nan
+                self._lat_rad[index] = math.radians(self._lat[index])
+                self._by_lat = None
+                self._cos_lat[index] = math.cos(self._lat_rad[index])
+                self._lon_rad[index] = math.radians(self._lon[index])
+                self._types[index] = self._type_code(user_type)
+                self._active[index] = is_eligible(lat, lon, mobile)
+                self._mobile[index] = mobile
+            self._append(new_rows)
+            self.counters["updates"] += len(rows)
+
+    def remove(self, profile_id):
+        """Drop a deleted profile; its row stays behind inactive until the next reload."""
+        with self._lock:
+            index = self._rows.pop(profile_id, None)
+            if index is not None:
+                self._active[index] = False
+                self.counters["updates"] += 1
+            if self._size > 1000 and len(self._rows) < self._size * 3 // 4:
+                # Mostly dead rows: start over rather than scanning them on every lookup
+                self._synced_at = None
+
+    def sync(self):
+        """
+        Catch up with profile changes made by any process since the last
+        sync, unless that was less than the sync interval ago. Reloads
+        everything once the reload interval has passed.
+        """
+        from .models import UserProfile
+
+        with self._lock:
+            now = time.monotonic()
+            if self._synced_at is None or now >= self._next_reload:
+                self.reload()
+                return
+            if now < self._next_sync:
+                return
+            synced_at = timezone.now()
+            changed = list(
+                UserProfile.objects.filter(updated_at__gte=self._synced_at - self.lookback).values_list(*FIELDS)
+            )
+            self.upsert(changed)
+            self._synced_at = synced_at
+            self._next_sync = now + self.sync_interval
+
+    # ==================== Lookup ====================
+
+    def within(self, lat, lon, radii):
+        """
+        Reachable profiles within a radius of (lat, lon), for several user
+        types at once: `radii` maps user type to radius in km. Returns
+        {user_type: [(profile_id, user_id, mobile_number, distance_km), ...]},
+        each list in profile id order.
+        """
+        import numpy as np
+
+        self.sync()
+        results = {user_type: [] for user_type in radii}
+        with self._lock:
+            self.counters["lookups"] += 1
+            if not self._size:
+                return results
+
+            if self._by_lat is None:
+                self._by_lat = {}
+                for code in range(len(USER_TYPES)):
+                    members = np.flatnonzero(self._types == code)
+                    members = members[np.argsort(self._lat_rad[members], kind="stable")]
+                    self._by_lat[code] = (members, self._lat_rad[members])
+
+            # Per user type, the latitude band of its radius by binary search;
+            # then the haversine term for all bands in one pass:
+            # distance <= r exactly when a <= sin^2(r / 2R)
+            lat_rad = math.radians(lat)
+            bands, radians = [], []
+            for user_type, radius_km in radii.items():
+                if user_type not in USER_TYPES:
+                    continue
+                members, sorted_lat_rad = self._by_lat[self._type_code(user_type)]
+                angular = radius_km / EARTH_RADIUS_KM
+                margin = angular * TOLERANCE + TOLERANCE
+                band = members[
+                    np.searchsorted(sorted_lat_rad, lat_rad - angular - margin, side="left"):
+                    np.searchsorted(sorted_lat_rad, lat_rad + angular + margin, side="right")
+                ]
+                bands.append(band)
+                radians.append(np.full(len(band), angular))
+            if not bands:
+                return results
+            rows, angular = np.concatenate(bands), np.concatenate(radians)
+            keep = self._active[rows]
+            rows, angular = rows[keep], angular[keep]
+            a = (
+                np.sin((self._lat_rad[rows] - lat_rad) / 2) ** 2
+                + math.cos(lat_rad) * self._cos_lat[rows] * np.sin((self._lon_rad[rows] - math.radians(lon)) / 2) ** 2
+            )
+            bound = np.sin(np.minimum(angular, math.pi) / 2) ** 2
+            keep = a <= bound * (1 + TOLERANCE) + TOLERANCE
+            rows, a, bound = rows[keep], a[keep], bound[keep]
+            order = np.argsort(self._profile_ids[rows], kind="stable")
+            rows, a, bound = rows[order], a[order], bound[order]
+
+            distance = 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+            # Rows this close to their radius get the scalar check, so rounding
+            # in the vectorized pass never decides who is alerted
+            borderline = a >= bound * (1 - TOLERANCE) - TOLERANCE
+
+            for index, profile_id, user_id, type_code, distance_km, check in zip(
+                rows.tolist(), self._profile_ids[rows].tolist(), self._user_ids[rows].tolist(),
+                self._types[rows].tolist(), distance.tolist(), borderline.tolist(),
+            ):
+                user_type = USER_TYPES[type_code]
+                if check:
+                    distance_km = haversine_distance(lat, lon, float(self._lat[index]), float(self._lon[index]))
+                    if distance_km > radii[user_type]:
+                        continue
+                results[user_type].append((profile_id, user_id, self._mobile[index], distance_km))
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "profiles": len(self._rows),
+                "reachable": int(self._active.sum()),
+                "rows": self._size,
+            }
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def is_enabled():
+    """Whether alerts use the table: RECIPIENT_TABLE_ENABLED, and subscriptions are off."""
+    from . import subscriptions
+    return getattr(settings, 'RECIPIENT_TABLE_ENABLED', True) and not subscriptions.is_enabled()
+
+
+def get_table():
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = RecipientTable(
+                    lookback_seconds=getattr(settings, 'RECIPIENT_SYNC_LOOKBACK_SECONDS', 60),
+                    sync_interval_seconds=getattr(settings, 'RECIPIENT_SYNC_INTERVAL_SECONDS', 5),
+                    reload_interval_seconds=getattr(settings, 'RECIPIENT_RELOAD_INTERVAL_SECONDS', 900),
+                )
+    return _table
+
+
+def connect_signals():
+    """Keep this process's table current with profile saves and deletes (called from AppConfig.ready)."""
+    from django.db.models.signals import post_delete, post_save
+    from .models import UserProfile
+
+    post_save.connect(
+        lambda sender, instance, **kwargs: profile_saved(instance),
+        sender=UserProfile, weak=False, dispatch_uid="recipient_table_profile_saved",
+    )
+    post_delete.connect(
+        lambda sender, instance, **kwargs: profile_deleted(instance),
+        sender=UserProfile, weak=False, dispatch_uid="recipient_table_profile_deleted",
+    )
+
+
+def profile_saved(profile):
+    """post_save hook: update this process's table, if it was loaded, once the save commits."""
+    row = (
+        profile.pk, profile.user_id, profile.home_lat, profile.home_lon,
+        profile.mobile_number, profile.user_type,
+    )
+
+    def apply():
+        if _table is not None:
+            _table.upsert([row])
+
+    transaction.on_commit(apply)
+
+
+def profile_deleted(profile):
+    """post_delete hook: drop the profile from this process's table, if it was loaded, once the delete commits."""
+    profile_id = profile.pk
+
+    def apply():
+        if _table is not None:
+            _table.remove(profile_id)
+
+    transaction.on_commit(apply)
+
+
+def find_nearby_users(lat, lon, radii, table=None):
+    """
+    `get_users_within_radius` for several user types at once, answered from
+    the in-memory table (this process's by default):
+    {user_type: [{'user', 'mobile_number', 'distance'}, ...]}.
+    """
+    from django.contrib.auth.models import User
+
+    matches = (table or get_table()).within(lat, lon, radii)
+    users = User.objects.in_bulk(
+        [user_id for hits in matches.values() for _, user_id, _, _ in hits]
+    )
+    return {
+        user_type: [
+            {'user': users[user_id], 'mobile_number': mobile_number, 'distance': distance}
+            for _, user_id, mobile_number, distance in hits
+            if user_id in users
+        ]
+        for user_type, hits in matches.items()
+    }
@@ -0,0 +1,209 @@
+"""
+Re-scoring of stored captures with the current (or another) checkpoint.
+
+Rows are read in primary-key order with keyset pagination (`pk > last`), so
+each chunk is one indexed range scan however deep into the archive it is and
+a run can resume from the last primary key it committed. Each chunk is
+classified in batched predicts off the micro-batcher (live ingest keeps its
+own queue), each capture with the checkpoint its device is routed to unless a
+model is forced, and written back with one `bulk_update` plus a replacement
+of its Detection rows. Burst duplicates share their original's image and are
+updated from its result instead of being classified again.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from django.db import transaction
+
+from .backends import get_image_size
+from .capture import build_detection_rows, normalize_animal_type, prepare_frame, restore_summary
+from .inference import get_model, predict_images
+from .model_routing import resolve_model_path
+from .models import CaptureJob, CapturedImage, Detection
+from .rendering import pack_detections
+
+logger = logging.getLogger(__name__)
+
+UPDATED_FIELDS = ["animal_type", "confidence", "detections", "model_version", "annotated_image"]
+
+
+def target_version(model_path=None):
+    """Version string the re-scored rows will carry (loads the model)."""
+    return get_model(model_path).version
+
+
+def iter_chunks(after_pk, up_to_pk, chunk_size, queryset=None):
+    """Yield lists of original (non-duplicate) captures with after_pk < pk <= up_to_pk."""
+    queryset = CapturedImage.objects.all() if queryset is None else queryset
+    queryset = (
+        queryset.filter(duplicate_of__isnull=True, pk__lte=up_to_pk)
+        .select_related("device")
+        .order_by("pk")
+    )
+    while True:
+        chunk = list(
+            queryset.filter(pk__gt=after_pk)
+            .only(
+                "id", "image", "annotated_image", "animal_type", "confidence", "detections", "model_version",
+                "device__model_path", "device__lat", "device__lon",
+            )[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        after_pk = chunk[-1].pk
+
+
+def group_by_model(rows, model_path=None):
+    """
+    Split rows into {checkpoint: rows}. A forced `model_path` takes every
+    row; otherwise each row goes to the checkpoint its device is routed to
+    (None = default model), as at ingest.
+    """
+    if model_path is not None:
+        return {model_path: list(rows)}
+    routes = {}
+    groups = {}
+    for row in rows:
+        if row.device_id not in routes:
+            routes[row.device_id] = resolve_model_path(row.device)
+        groups.setdefault(routes[row.device_id], []).append(row)
+    return groups
+
+
+def classify_rows(rows, model_path=None, batch_size=16, limiter=None):
+    """
+    Classify the stored image of each row with its checkpoint (see
+    group_by_model); returns {pk: summary}. Rows whose file is missing or
+    unreadable map to None; rows already scored by their checkpoint's
+    current version are left out. `limiter` paces every predict batch.
+    """
+    size = get_image_size()
+    results = {}
+    for path, group in group_by_model(rows, model_path).items():
+        version = get_model(path).version
+        group = [row for row in group if row.model_version != version]
+        for start in range(0, len(group), batch_size):
+            batch = []
+            for row in group[start:start + batch_size]:
+                try:
+                    with row.image.open("rb") as image_file:
+                        batch.append((row, *prepare_frame(image_file, size)))
+                except (OSError, ValueError) as e:
+                    logger.warning("Reclassify: skipping capture %s: %s", row.pk, e)
+                    results[row.pk] = None
+            if not batch:
+                continue
+            if limiter is not None:
+                limiter.wait(len(batch))
+            summaries = predict_images([frame for _, frame, _ in batch], path)
+            for (row, _, transform), summary in zip(batch, summaries):
+                results[row.pk] = restore_summary(summary, transform)
+    return results
+
+
+def _apply(row, summary):
+    """Copy a summary onto a row; returns whether the best label changed."""
+    previous = row.animal_type
+    if summary["detections"]:
+        best = summary["detections"][0]
+        row.animal_type = normalize_animal_type(best["label"])
+        row.confidence = best["confidence"]
+    else:
+        # Nothing found any more: keep the label for history, drop the score
+        row.confidence = 0.0
+    row.detections = pack_detections(summary)
+    row.model_version = summary.get("model_version", "")
+    return row.animal_type != previous
+
+
+def save_results(rows, results):
+    """
+    Write the new classifications of a chunk (and of the burst duplicates of
+    its rows) in one transaction. Eagerly rendered annotated images are
+    dropped so they are re-rendered lazily from the new detections. Returns
+    the number of rows whose best label changed.
+    """
+    updated = [row for row in rows if results.get(row.pk) is not None]
+    if not updated:
+        return 0
+
+    changed = 0
+    stale_files = set()
+    for row in updated:
+        changed += _apply(row, results[row.pk])
+        if row.annotated_image:
+            stale_files.add(row.annotated_image.name)
+            row.annotated_image = None
+
+    # Duplicates share the original's annotated file and get copies of its boxes
+    duplicates = list(
+        CapturedImage.objects.filter(duplicate_of_id__in=[row.pk for row in updated])
+        .only("id", "duplicate_of_id", "annotated_image", "animal_type", "confidence", "detections", "model_version")
+    )
+    for duplicate in duplicates:
+        changed += _apply(duplicate, results[duplicate.duplicate_of_id])
+        duplicate.annotated_image = None
+
+    with transaction.atomic():
+        CapturedImage.objects.bulk_update(updated + duplicates, UPDATED_FIELDS)
+        Detection.objects.filter(captured_image__in=updated + duplicates).delete()
+        Detection.objects.bulk_create([
+            detection for row in updated for detection in build_detection_rows(row, results[row.pk])
+        ] + [
+            detection for duplicate in duplicates
+            for detection in build_detection_rows(duplicate, results[duplicate.duplicate_of_id])
+        ])
+
+    storage = CapturedImage._meta.get_field("annotated_image").storage
+    for name in stale_files:
+        storage.delete(name)
+    return changed
+
+
+class RateLimiter:
+    """Spaces calls out to at most `rate` items per second (0 = unlimited)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._next = time.monotonic()
+
+    def wait(self, items):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(self._next, now) + items / self.rate
+
+
+def wait_for_live_queue(max_pending, poll_interval=1.0):
+    """Block while more than `max_pending` capture jobs wait for a worker (0 = never)."""
+    if max_pending <= 0:
+        return 0.0
+    waited = 0.0
+    while CaptureJob.objects.filter(status="pending").count() > max_pending:
+        time.sleep(poll_interval)
+        waited += poll_interval
+    return waited
+
+
+# ==================== Progress ====================
+
+def load_progress(path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def save_progress(path, progress):
+    """Write the progress file atomically so an interruption never leaves it half written."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(progress, indent=2))
+    os.replace(tmp, path)
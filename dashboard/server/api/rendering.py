@@ -0,0 +1,263 @@
+"""
+Lazy rendering of annotated capture images.
+
+Ingest stores only the detection geometry (`CapturedImage.detections`). The
+annotated JPEG is drawn the first time someone asks for it and kept in a
+two-level cache: a byte-bounded in-memory LRU in front of a size-bounded disk
+directory that evicts the least recently used files.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from django.conf import settings
+
+
+# ==================== Compact detection storage ====================
+
+def pack_detections(summary):
+    """
+    Compact form of a detection summary for `CapturedImage.detections`:
+    {"mode": ..., "size": [w, h], "boxes": [[class_id, label, conf, x1, y1, x2, y2], ...]}
+    (coordinates are null for classification results).
+    """
+    boxes = []
+    for detection in summary["detections"]:
+        box = detection["box"] or [None, None, None, None]
+        boxes.append([
+            detection["class_id"],
+            detection["label"],
+            round(detection["confidence"], 4),
+            *box,
+        ])
+    return {"mode": summary["mode"], "size": list(summary["size"]), "boxes": boxes}
+
+
+def unpack_detections(packed):
+    """Inverse of `pack_detections`: rebuild the detection summary dict."""
+    detections = []
+    for class_id, label, confidence, x1, y1, x2, y2 in packed.get("boxes", []):
+        detections.append({
+            "class_id": class_id,
+            "label": label,
+            "confidence": confidence,
+            "box": None if x1 is None else [x1, y1, x2, y2],
+        })
+    return {"mode": packed.get("mode", "detect"), "size": tuple(packed.get("size", (0, 0))), "detections": detections}
+
+
+# ==================== Cache ====================
+
+class MemoryLRU:
+    """Thread-safe LRU of bytes values bounded by their total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+class DiskLRU:
+    """
+    Directory of cached files bounded by total size. Reads refresh the file's
+    mtime; when the directory grows past `max_bytes` the oldest files go first.
+    """
+
+    def __init__(self, directory, max_bytes, check_every=50):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.check_every = check_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / f"{key}.jpg"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def set(self, key, value):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(value)
+        os.replace(tmp_path, path)  # Atomic, so readers never see a partial file
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.check_every == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        try:
+            entries = [(entry.stat().st_mtime, entry.stat().st_size, entry) for entry in os.scandir(self.directory)
+                       if entry.name.endswith(".jpg")]
+        except FileNotFoundError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry.path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+class AnnotatedImageCache:
+    """Memory cache in front of the disk cache, with per-key render locks."""
+
+    def __init__(self, memory_bytes, disk_directory, disk_bytes):
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = DiskLRU(disk_directory, disk_bytes)
+        self.hits = {"memory": 0, "disk": 0, "render": 0}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def get_or_render(self, key, render):
+        data = self.memory.get(key)
+        if data is not None:
+            self.hits["memory"] += 1
+            return data
+
+        lock = self._lock_for(key)
+        with lock:
+            # A concurrent request may have rendered it while we waited
+            data = self.memory.get(key)
+            if data is None:
+                data = self.disk.get(key)
+                if data is not None:
+                    self.hits["disk"] += 1
+                else:
+                    data = render()
+                    self.hits["render"] += 1
+                    self.disk.set(key, data)
+                self.memory.set(key, data)
+            else:
+                self.hits["memory"] += 1
+
+        with self._locks_guard:
+            self._locks.pop(key, None)
+        return data
+
+    def stats(self):
+        return {"hits": dict(self.hits), "memory": self.memory.stats()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                directory = getattr(settings, 'ANNOTATION_CACHE_DIR', None) or Path(settings.MEDIA_ROOT) / "annotated_cache"
+                _cache = AnnotatedImageCache(
+                    memory_bytes=getattr(settings, 'ANNOTATION_CACHE_MEMORY_MB', 32) * 1024 * 1024,
+                    disk_directory=directory,
+                    disk_bytes=getattr(settings, 'ANNOTATION_CACHE_DISK_MB', 512) * 1024 * 1024,
+                )
+    return _cache
+
+
+# ==================== Rendering ====================
+
+def cache_key(captured_image):
+    """
+    Key changes whenever the stored detections change (e.g. re-classification).
+    Burst duplicates share the image of their original, so they share its key.
+    """
+    digest = hashlib.sha1(
+        json.dumps(captured_image.detections, sort_keys=True).encode()
+    ).hexdigest()[:12]
+    return f"{captured_image.duplicate_of_id or captured_image.pk}-{digest}"
+
+
+def render_captured_image(captured_image):
+    """Draw the stored detections onto the original image and JPEG-encode it."""
+    from .capture import decode_upload, encode_annotated
+
+    summary = unpack_detections(captured_image.detections)
+
+    with captured_image.image.open('rb') as image_file:
+        if summary["mode"] == "classify":
+            # For classification, annotated image is same as original
+            return image_file.read()
+        frame = decode_upload(image_file)
+    return encode_annotated(frame, summary)
+
+
+def get_annotated_image_bytes(captured_image):
+    """Return the annotated JPEG for a capture, rendering it on first request."""
+    if captured_image.annotated_image:
+        # Rendered eagerly at ingest
+        with captured_image.annotated_image.open('rb') as f:
+            return f.read()
+
+    return get_cache().get_or_render(
+        cache_key(captured_image),
+        lambda: render_captured_image(captured_image),
+    )
+
+
+def should_render_eagerly():
+    return getattr(settings, 'ANNOTATION_RENDER_MODE', 'lazy') == 'eager'
+
+
+def annotated_image_path(captured_image):
+    """URL path of the annotated image: the stored file, or the signed lazy render endpoint."""
+    from .links import signed_path
+
+    if captured_image.annotated_image:
+        return captured_image.annotated_image.url
+    if captured_image.detections:
+        return signed_path("captured_image_annotated", captured_image)
+    return None
@@ -0,0 +1,125 @@
+"""
+Capture result cache for retried uploads.
+
+Firmware on flaky links re-posts the exact same JPEG when it misses the
+response. Results are cached by device and SHA-256 of the upload bytes, so a
+byte-identical retry gets the original payload (and record id) back without
+running inference, storing the frame or alerting again. A retry that arrives
+while the original is still being processed waits for it instead of racing.
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+def upload_digest(image_file, chunk_size=64 * 1024):
+    """SHA-256 hex digest of an upload; the file is rewound afterwards."""
+    sha256 = hashlib.sha256()
+    image_file.seek(0)
+    for chunk in iter(lambda: image_file.read(chunk_size), b""):
+        sha256.update(chunk)
+    image_file.seek(0)
+    return sha256.hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU of capture payloads bounded by entry count and age."""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        """Cached payload for `key` (a copy), or None if missing or expired."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            stored_at, payload = item
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            self.counters["hits"] += 1
+        return copy.deepcopy(payload)
+
+    def set(self, key, payload):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (time.monotonic(), copy.deepcopy(payload))
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def _lock_for(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def get_or_compute(self, key, compute):
+        """
+        Return `(payload, hit)`. On a miss `compute()` runs once per key at a
+        time; concurrent callers with the same key wait and reuse its result.
+        """
+        payload = self.get(key)
+        if payload is not None:
+            return payload, True
+
+        lock = self._lock_for(key)
+        try:
+            with lock:
+                payload = self.get(key)
+                if payload is not None:
+                    return payload, True
+
+                with self._lock:
+                    self.counters["misses"] += 1
+                payload = compute()
+                self.set(key, payload)
+                return payload, False
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "entries": len(self._items),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, 'CAPTURE_RESULT_CACHE_ENABLED', True)
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(
+                    max_entries=getattr(settings, 'CAPTURE_RESULT_CACHE_MAX_ENTRIES', 1024),
+                    ttl_seconds=getattr(settings, 'CAPTURE_RESULT_CACHE_TTL_SECONDS', 600),
+                )
+    return _cache
+
+
+def cache_key(device_id, image_file):
+    return f"{device_id}:{upload_digest(image_file)}"
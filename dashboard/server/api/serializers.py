@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from .models import UserProfile, Device, DeviceMessage, CapturedImage
+from .rendering import annotated_image_path
 import re
 
 
@@ -148,7 +149,7 @@ class DeviceSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Device
-        fields = ['id', 'device_id', 'location', 'owned_by', 'owned_by_username', 'created_at', 'updated_at']
+        fields = ['id', 'device_id', 'location', 'owned_by', 'owned_by_username', 'gate_min_foreground', 'gate_min_brightness', 'gate_min_sharpness', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_location(self, obj):
@@ -208,12 +209,18 @@ class DeviceUpdateSerializer(serializers.Serializer):
     lat = serializers.FloatField(required=False, allow_null=True)
     lon = serializers.FloatField(required=False, allow_null=True)
     owned_by = serializers.IntegerField(required=False, allow_null=True)
+    gate_min_foreground = serializers.FloatField(required=False, allow_null=True, min_value=0, max_value=1)
+    gate_min_brightness = serializers.FloatField(required=False, allow_null=True, min_value=0, max_value=255)
+    gate_min_sharpness = serializers.FloatField(required=False, allow_null=True, min_value=0)
     
     def update(self, instance, validated_data):
         if 'lat' in validated_data:
             instance.lat = validated_data['lat']
         if 'lon' in validated_data:
             instance.lon = validated_data['lon']
+        for field in ('gate_min_foreground', 'gate_min_brightness', 'gate_min_sharpness'):
+            if field in validated_data:
+                setattr(instance, field, validated_data[field])
         if 'owned_by' in validated_data:
             owned_by_id = validated_data['owned_by']
             if owned_by_id:
@@ -263,7 +270,7 @@ class CapturedImageSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = CapturedImage
-        fields = ['id', 'device', 'device_id', 'image_url', 'annotated_image_url', 'animal_type', 'confidence', 'confidence_percentage', 'timestamp', 'device_location']
+        fields = ['id', 'device', 'device_id', 'image_url', 'annotated_image_url', 'animal_type', 'confidence', 'confidence_percentage', 'model_version', 'duplicate_of', 'timestamp', 'device_location']
         read_only_fields = ['id', 'timestamp']
     
     def get_confidence_percentage(self, obj):
@@ -274,6 +281,13 @@ class CapturedImageSerializer(serializers.ModelSerializer):
             return None
         return request.build_absolute_uri(file_field.url) if request else file_field.url
 
+    def _build_annotated_url(self, request, obj):
+        """Stored annotated image, or the endpoint that renders it on demand."""
+        path = annotated_image_path(obj)
+        if not path:
+            return None
+        return request.build_absolute_uri(path) if request else path
+
     def get_image_url(self, obj):
         """Return original image (if allowed)."""
         request = self.context.get('request')
@@ -299,10 +313,10 @@ class CapturedImageSerializer(serializers.ModelSerializer):
 
         # Rangers/owners: prefer annotated if available; else original
         if is_ranger or is_owner:
-            return self._build_url(request, obj.annotated_image) or self._build_url(request, obj.image)
+            return self._build_annotated_url(request, obj) or self._build_url(request, obj.image)
 
         # Public users: only annotated; fallback to original if no annotated
-        return self._build_url(request, obj.annotated_image) or self._build_url(request, obj.image)
+        return self._build_annotated_url(request, obj) or self._build_url(request, obj.image)
     
     def get_device_location(self, obj):
         """Return device location only for rangers and device owners."""
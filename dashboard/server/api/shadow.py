@@ -0,0 +1,139 @@
+"""
+Shadow evaluation of a candidate model on live capture traffic.
+
+When YOLO_SHADOW_MODEL_PATH is set, every frame classified by the active
+model is also run through the candidate on a background thread. Its result is
+never stored or alerted on; it is only compared with the active model's
+(top label, number of detections, IoU of the best boxes) and the agreement is
+accumulated per (active version, candidate version) pair, next to the
+per-version latency the model registry records. Promote a candidate with
+`python manage.py promote_model`.
+"""
+
+import copy
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+
+def box_iou(a, b):
+    inter_w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    inter_h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class ShadowEvaluator:
+    """Runs a candidate checkpoint next to the active one, dropping frames when it falls behind."""
+
+    def __init__(self, model_path, max_pending):
+        self.model_path = model_path
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-model")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.counters = {"submitted": 0, "dropped": 0, "errors": 0}
+        self._comparisons = {}
+
+    def submit(self, frame, primary_summary):
+        """Queue a frame for the candidate; never blocks the capture path."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.counters["dropped"] += 1
+                return
+            self._pending += 1
+            self.counters["submitted"] += 1
+        self._executor.submit(self._evaluate, frame, copy.deepcopy(primary_summary))
+
+    def _evaluate(self, frame, primary):
+        from .inference import predict_images
+
+        try:
+            shadow = predict_images([frame], self.model_path)[0]
+            self._record(primary, shadow)
+        except Exception:
+            traceback.print_exc()
+            with self._lock:
+                self.counters["errors"] += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(self, primary, shadow):
+        pair = f"{primary.get('model_version', '?')} vs {shadow.get('model_version', '?')}"
+        primary_detections = primary["detections"]
+        shadow_detections = shadow["detections"]
+
+        with self._lock:
+            entry = self._comparisons.setdefault(pair, {
+                "compared": 0,
+                "top_label_agree": 0,
+                "count_agree": 0,
+                "primary_only": 0,
+                "shadow_only": 0,
+                "best_iou_sum": 0.0,
+                "best_iou_count": 0,
+            })
+            entry["compared"] += 1
+            if len(primary_detections) == len(shadow_detections):
+                entry["count_agree"] += 1
+            if primary_detections and not shadow_detections:
+                entry["primary_only"] += 1
+            elif shadow_detections and not primary_detections:
+                entry["shadow_only"] += 1
+
+            primary_label = primary_detections[0]["label"] if primary_detections else None
+            shadow_label = shadow_detections[0]["label"] if shadow_detections else None
+            if primary_label == shadow_label:
+                entry["top_label_agree"] += 1
+
+            if primary_detections and shadow_detections:
+                primary_box, shadow_box = primary_detections[0]["box"], shadow_detections[0]["box"]
+                if primary_box is not None and shadow_box is not None:
+                    entry["best_iou_sum"] += box_iou(primary_box, shadow_box)
+                    entry["best_iou_count"] += 1
+
+    def stats(self):
+        with self._lock:
+            comparisons = {}
+            for pair, entry in self._comparisons.items():
+                compared = entry["compared"]
+                comparisons[pair] = {
+                    "compared": compared,
+                    "top_label_agreement": round(entry["top_label_agree"] / compared, 4),
+                    "count_agreement": round(entry["count_agree"] / compared, 4),
+                    "primary_only": entry["primary_only"],
+                    "shadow_only": entry["shadow_only"],
+                    "mean_best_iou": (
+                        round(entry["best_iou_sum"] / entry["best_iou_count"], 4)
+                        if entry["best_iou_count"] else None
+                    ),
+                }
+            return {
+                "model_path": str(self.model_path),
+                **self.counters,
+                "pending": self._pending,
+                "comparisons": comparisons,
+            }
+
+
+_evaluator = None
+_evaluator_lock = threading.Lock()
+
+
+def get_evaluator():
+    """The process-wide shadow evaluator, or None when no candidate is configured."""
+    global _evaluator
+    model_path = getattr(settings, 'YOLO_SHADOW_MODEL_PATH', '')
+    if not model_path:
+        return None
+    if _evaluator is None:
+        with _evaluator_lock:
+            if _evaluator is None:
+                _evaluator = ShadowEvaluator(
+                    model_path,
+                    max_pending=getattr(settings, 'SHADOW_MAX_PENDING', 4),
+                )
+    return _evaluator
@@ -0,0 +1,160 @@
+"""
+Precomputed alert recipients per device.
+
+Who gets alerted for a device only changes when the device moves or a user's
+home location (or user type) changes, so the pairs within range are kept in
+AlertSubscription and an alert reads them with one indexed query instead of
+matching every profile again. A device's subscriptions are recomputed when
+its lat/lon changes, a user's when their home_lat/home_lon or user_type
+changes; both use the bounding-box prefilter of get_users_within_radius.
+Whether a subscriber currently has a mobile number is checked at alert time,
+so adding or changing a number needs no recompute.
+
+Saves that bypass signals (queryset.update, bulk_create, raw SQL) and changes
+to ALERT_RADII_KM need: python manage.py rebuild_alert_subscriptions
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .notifications import ALERT_RADII_KM, bounding_box, haversine_distance
+
+# Fields whose change invalidates subscriptions, per model
+TRACKED_FIELDS = {
+    "Device": ("lat", "lon"),
+    "UserProfile": ("home_lat", "home_lon", "user_type"),
+}
+
+
+def is_enabled():
+    return getattr(settings, 'ALERT_SUBSCRIPTIONS_ENABLED', True)
+
+
+def _in_box(lat_field, lon_field, lat, lon, radius_km):
+    """Q for rows whose coordinates fall in the bounding box of the circle."""
+    min_lat, max_lat, lon_ranges = bounding_box(lat, lon, radius_km)
+    box = Q(**{f"{lat_field}__gte": min_lat, f"{lat_field}__lte": max_lat})
+    if lon_ranges is not None:
+        lon_filter = Q()
+        for min_lon, max_lon in lon_ranges:
+            lon_filter |= Q(**{f"{lon_field}__gte": min_lon, f"{lon_field}__lte": max_lon})
+        box &= lon_filter
+    return box
+
+
+def device_subscriptions(device):
+    """Unsaved AlertSubscription rows for every home within range of a device."""
+    from .models import AlertSubscription, UserProfile
+
+    if device.lat is None or device.lon is None:
+        return []
+    rows = []
+    for role, radius_km in ALERT_RADII_KM.items():
+        profiles = UserProfile.objects.filter(
+            _in_box("home_lat", "home_lon", device.lat, device.lon, radius_km),
+            user_type=role,
+        ).values_list("user_id", "home_lat", "home_lon")
+        for user_id, home_lat, home_lon in profiles:
+            distance = haversine_distance(device.lat, device.lon, home_lat, home_lon)
+            if distance <= radius_km:
+                rows.append(AlertSubscription(device=device, user_id=user_id, role=role, distance=distance))
+    return rows
+
+
+def profile_subscriptions(profile):
+    """Unsaved AlertSubscription rows for every device within range of a user's home."""
+    from .models import AlertSubscription, Device
+
+    radius_km = ALERT_RADII_KM.get(profile.user_type)
+    if radius_km is None or profile.home_lat is None or profile.home_lon is None:
+        return []
+    rows = []
+    devices = Device.objects.filter(
+        _in_box("lat", "lon", profile.home_lat, profile.home_lon, radius_km)
+    ).values_list("id", "lat", "lon")
+    for device_id, lat, lon in devices:
+        # Same argument order as at alert time, so distances match exactly
+        distance = haversine_distance(lat, lon, profile.home_lat, profile.home_lon)
+        if distance <= radius_km:
+            rows.append(AlertSubscription(device_id=device_id, user_id=profile.user_id, role=profile.user_type, distance=distance))
+    return rows
+
+
+def subscribe_device(device):
+    from .models import AlertSubscription
+
+    rows = device_subscriptions(device)
+    with transaction.atomic():
+        AlertSubscription.objects.filter(device=device).delete()
+        AlertSubscription.objects.bulk_create(rows)
+    return len(rows)
+
+
+def subscribe_profile(profile):
+    from .models import AlertSubscription
+
+    rows = profile_subscriptions(profile)
+    with transaction.atomic():
+        AlertSubscription.objects.filter(user_id=profile.user_id).delete()
+        AlertSubscription.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild(batch_size=5000):
+    """Recompute every subscription from scratch; returns the number of rows."""
+    from .models import AlertSubscription, Device
+
+    total = 0
+    with transaction.atomic():
+        AlertSubscription.objects.all().delete()
+        for device in Device.objects.filter(lat__isnull=False, lon__isnull=False).only("id", "lat", "lon"):
+            rows = device_subscriptions(device)
+            AlertSubscription.objects.bulk_create(rows, batch_size=batch_size)
+            total += len(rows)
+    return total
+
+
+# ==================== Change tracking ====================
+
+def remember_location(instance):
+    """post_init hook: note the tracked fields as loaded."""
+    fields = TRACKED_FIELDS[type(instance).__name__]
+    instance._subscription_state = tuple(instance.__dict__.get(field) for field in fields)
+
+
+def location_changed(instance, created, update_fields):
+    """Whether a save changed any tracked field since the instance was loaded."""
+    fields = TRACKED_FIELDS[type(instance).__name__]
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return False
+    state = tuple(getattr(instance, field) for field in fields)
+    changed = created or state != getattr(instance, "_subscription_state", None)
+    instance._subscription_state = state
+    return changed
+
+
+# ==================== Lookup ====================
+
+def nearby_users(device):
+    """
+    Subscribers of a device that can be reached now, in the shape of
+    get_users_within_radius: {role: [{'user', 'mobile_number', 'distance'}, ...]},
+    each list in profile id order. One query.
+    """
+    from .models import AlertSubscription
+
+    subscriptions = (
+        AlertSubscription.objects.filter(device=device, user__profile__mobile_number__isnull=False)
+        .exclude(user__profile__mobile_number='')
+        .select_related("user__profile")
+        .order_by("user__profile__id")
+    )
+    nearby = {role: [] for role in ALERT_RADII_KM}
+    for subscription in subscriptions:
+        nearby.setdefault(subscription.role, []).append({
+            'user': subscription.user,
+            'mobile_number': subscription.user.profile.mobile_number,
+            'distance': subscription.distance,
+        })
+    return nearby
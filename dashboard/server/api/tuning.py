@@ -0,0 +1,109 @@
+"""
+Host-specific inference tuning.
+
+`python manage.py tune_inference` sweeps the intra-op thread count, the
+micro-batch size and the input size on this host and writes the fastest
+configuration to INFERENCE_TUNING_FILE. Serving processes apply that file at
+startup (`ApiConfig.ready`) when it was produced on a host with the same CPU
+count for the same backend and precision; settings set explicitly in the
+environment or .env always win.
+"""
+
+import json
+import os
+import platform
+from pathlib import Path
+from decouple import config
+from django.conf import settings
+
+
+TUNED_SETTINGS = ("INFERENCE_THREADS", "INFERENCE_MAX_BATCH_SIZE", "INFERENCE_IMAGE_SIZE")
+
+# Values the tuning replaced, so tune_inference can measure against the configured ones
+_untuned = {}
+
+
+def get_tuning_file():
+    """Tuning file, by default inference_tuning.json next to the checkpoint."""
+    from .inference import get_default_model_path
+
+    path = getattr(settings, 'INFERENCE_TUNING_FILE', '')
+    return Path(path) if path else get_default_model_path().parent / "inference_tuning.json"
+
+
+def is_explicit(name):
+    """Whether a setting is set in the environment or the .env file read by decouple."""
+    if name in os.environ:
+        return True
+    repository = getattr(getattr(config, 'config', None), 'repository', None)
+    return repository is not None and name in repository
+
+
+def cpu_count():
+    """CPUs this process may run on (respects taskset/cgroup affinity where available)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def host_fingerprint():
+    from .backends import get_precision
+    from .inference import get_backend_name
+
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "cpu_count": cpu_count(),
+        "backend": get_backend_name(),
+        "precision": get_precision(),
+    }
+
+
+def save_tuning(path, tuning):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(tuning, indent=2))
+    os.replace(tmp, path)
+
+
+def apply_tuning():
+    """Apply the saved tuning to settings; returns the applied values (empty if none)."""
+    path = get_tuning_file()
+    if not path.exists():
+        return {}
+
+    try:
+        tuning = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        print(f"Ignoring inference tuning {path}: {e}")
+        return {}
+
+    host = host_fingerprint()
+    tuned_on = tuning.get("host", {})
+    mismatched = [
+        key for key in ("cpu_count", "backend", "precision")
+        if tuned_on.get(key) != host[key]
+    ]
+    if mismatched:
+        print(
+            f"Ignoring inference tuning {path}: tuned for a different "
+            f"{', '.join(mismatched)} ({', '.join(f'{k}={tuned_on.get(k)}' for k in mismatched)})"
+        )
+        return {}
+
+    applied = {}
+    for name, value in tuning.get("settings", {}).items():
+        if name in TUNED_SETTINGS and not is_explicit(name):
+            _untuned.setdefault(name, getattr(settings, name, None))
+            setattr(settings, name, value)
+            applied[name] = value
+    if applied:
+        print(f"Applied inference tuning from {path}: {applied}")
+    return applied
+
+
+def untuned_setting(name, default=None):
+    """A tuned setting as configured, before apply_tuning replaced it."""
+    return _untuned[name] if name in _untuned else getattr(settings, name, default)
@@ -10,7 +10,13 @@ from .views import (
     DeviceDetailView,
     DeviceMessageView,
     CapturedImageView,
+    CaptureJobStatusView,
     CapturedImageListView,
+    CapturedImageAnnotatedView,
+    CapturedImageDetectionsView,
+    DetectionEventImageView,
+    InferenceStatsView,
+    ReadinessView,
     TestView,
     TestWhatsAppView,
     TestSMSView,
@@ -31,10 +37,18 @@ urlpatterns = [
     path("device/register/", DeviceRegisterView.as_view(), name="device_register"),
     path("device/message/", DeviceMessageView.as_view(), name="device_message"),
     path("device/capture/", CapturedImageView.as_view(), name="capture_image"),
+    path("device/capture/<uuid:job_id>/", CaptureJobStatusView.as_view(), name="capture_job_status"),
     path("device/<str:device_id>/", DeviceDetailView.as_view(), name="device_detail"),
     
     # Captured images endpoints
     path("images/", CapturedImageListView.as_view(), name="captured_images"),
+    path("images/<int:pk>/annotated/", CapturedImageAnnotatedView.as_view(), name="captured_image_annotated"),
+    path("images/<int:pk>/detections/", CapturedImageDetectionsView.as_view(), name="captured_image_detections"),
+    path("events/<int:pk>/image/", DetectionEventImageView.as_view(), name="detection_event_image"),
+    
+    # Inference endpoints
+    path("inference/stats/", InferenceStatsView.as_view(), name="inference_stats"),
+    path("health/ready/", ReadinessView.as_view(), name="readiness"),
     
     # Test endpoints
     path("test/", TestView.as_view(), name="test"),
@@ -6,12 +6,11 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
-from django.core.files.base import ContentFile
-from pathlib import Path
-from PIL import Image
-import io
+from django.urls import reverse
+from django.http import HttpResponse
+from django.db.models import Count, Q
 
-from .models import Device, DeviceMessage, CapturedImage
+from .models import Device, DeviceMessage, CapturedImage, CaptureJob, DetectionEvent
 from .serializers import (
     UserSerializer,
     SignupSerializer,
@@ -25,7 +24,17 @@ from .serializers import (
     CapturedImageSerializer,
     CapturedImageUploadSerializer,
 )
-from .notifications import send_wildlife_alerts
+from .inference import registry
+from .batching import get_batcher
+from .capture import ingest_capture, lookup_retry
+from .jobs import enqueue_capture
+from .dedup import get_index
+from . import result_cache
+from .shadow import get_evaluator
+from . import cascade, motion
+from .metrics import capture_stages
+from .rendering import get_annotated_image_bytes, get_cache, unpack_detections
+from .links import has_valid_signature
 
 
 # ==================== Authentication Views ====================
@@ -288,65 +297,14 @@ class CapturedImageView(APIView):
     permission_classes = [AllowAny]
     parser_classes = [MultiPartParser, FormParser]
     
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self._model = None
-    
-    def get_model(self):
-        """Lazy load YOLO model."""
-        if self._model is None:
-            from ultralytics import YOLO
-            model_path = Path(__file__).resolve().parent.parent.parent.parent / "best_models" / "best.pt"
-            
-            if not model_path.exists():
-                raise FileNotFoundError(f"YOLO model not found at {model_path}")
-            
-            self._model = YOLO(str(model_path))
-        return self._model
-    
-    def classify_image(self, image_file):
-        """Run YOLO classification on the image and return annotated image."""
-        model = self.get_model()
-        
-        # Read and process image
-        image_data = image_file.read()
-        image_file.seek(0)  # Reset file pointer for saving later
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Run inference
-        results = model.predict(image, conf=0.25, verbose=False)
-        
-        animal_type = None
-        confidence = 0.0
-        annotated_image_data = None
+    def use_async(self, request):
+        """Async mode comes from settings, overridable per request with `async`."""
+        from django.conf import settings
         
-        if results and len(results) > 0:
-            result = results[0]
-            
-            if result.probs is not None:
-                # Classification mode
-                confidence = float(result.probs.top1conf)
-                class_id = int(result.probs.top1)
-                animal_type = result.names[class_id]
-                # For classification, annotated image is same as original
-                annotated_image_data = image_data
-            elif result.boxes and len(result.boxes) > 0:
-                # Detection mode - get annotated image with bounding boxes
-                best_box = result.boxes[0]
-                confidence = float(best_box.conf[0])
-                class_id = int(best_box.cls[0])
-                animal_type = result.names[class_id]
-                
-                # Generate annotated image with bounding boxes
-                annotated_array = result.plot()  # Returns numpy array with boxes drawn
-                annotated_pil = Image.fromarray(annotated_array)
-                
-                # Convert to bytes
-                annotated_buffer = io.BytesIO()
-                annotated_pil.save(annotated_buffer, format='JPEG', quality=90)
-                annotated_image_data = annotated_buffer.getvalue()
-        
-        return animal_type, confidence, annotated_image_data
+        value = request.query_params.get('async', request.data.get('async'))
+        if value is None:
+            return getattr(settings, 'CAPTURE_ASYNC_ENABLED', False)
+        return str(value).strip().lower() in ('1', 'true', 'yes')
     
     def post(self, request):
         serializer = CapturedImageUploadSerializer(data=request.data)
@@ -357,90 +315,35 @@ class CapturedImageView(APIView):
         device_id = serializer.validated_data['device_id']
         image_file = serializer.validated_data['image']
         
-        try:
-            # Run YOLO classification
-            animal_type, confidence, annotated_image_data = self.classify_image(image_file)
-            
-            # Handle no detection
-            if not animal_type:
-                return Response({
-                    "status": "no_detection",
-                    "message": "No animal detected in the image",
-                    "data": {
-                        "device_id": device_id,
-                        "animal_type": None,
-                        "confidence": 0.0,
-                        "timestamp": None
-                    }
-                }, status=status.HTTP_200_OK)
-            
-            # Normalize animal type to match class labels
-            animal_type_map = {
-                "bision": "Bison",
-                "bison": "Bison",
-                "boar": "Boar",
-                "wild boar": "Boar",
-                "leopord": "Leopard",
-                "leopard": "Leopard",
-                "bear": "Bear",
-                "elephant": "Elephant",
-                "human": "Human",
-                "lion": "Lion",
-                "tiger": "Tiger",
-            }
-            normalized_key = str(animal_type).strip().lower()
-            animal_type = animal_type_map.get(normalized_key, animal_type)
-
-            # Validate animal type
-            valid_animals = [choice[0] for choice in CapturedImage.ANIMAL_CHOICES]
-            if animal_type not in valid_animals:
-                animal_type = "Human"  # Default fallback
-            
-            # Get or create device
-            device, _ = Device.objects.get_or_create(device_id=device_id)
-            
-            # Save captured image
-            captured_image = CapturedImage.objects.create(
-                device=device,
-                image=image_file,
-                animal_type=animal_type,
-                confidence=confidence
-            )
-            
-            # Save annotated image if available
-            if annotated_image_data:
-                annotated_filename = f"annotated_{captured_image.id}.jpg"
-                captured_image.annotated_image.save(
-                    annotated_filename,
-                    ContentFile(annotated_image_data),
-                    save=True
-                )
-            
-            # Build response
-            image_url = None
-            annotated_url = None
-            if captured_image.image:
-                image_url = request.build_absolute_uri(captured_image.image.url)
-            if captured_image.annotated_image:
-                annotated_url = request.build_absolute_uri(captured_image.annotated_image.url)
-            
-            # Send wildlife alerts (WhatsApp to nearby users, call to device owner)
-            send_wildlife_alerts(device, animal_type, confidence, annotated_url or image_url)
-            
+        # A retry of an upload that was already classified gets the original result
+        cached, retry_key = lookup_retry(device_id, image_file)
+        if cached is not None:
+            if cached["status"] == "no_detection":
+                return Response(cached, status=status.HTTP_200_OK)
+            return Response(cached, status=status.HTTP_201_CREATED)
+        
+        if self.use_async(request):
+            # Store and acknowledge now; classification runs from the job queue
+            with capture_stages.time("enqueue"):
+                job = enqueue_capture(device_id, image_file, request.build_absolute_uri('/'))
             return Response({
-                "status": "success",
-                "message": "Image captured and classified",
+                "status": "accepted",
+                "message": "Image queued for classification",
                 "data": {
-                    "id": captured_image.id,
-                    "device_id": captured_image.device.device_id,
-                    "animal_type": captured_image.animal_type,
-                    "confidence": captured_image.confidence,
-                    "confidence_percentage": f"{captured_image.confidence * 100:.2f}%",
-                    "timestamp": captured_image.timestamp.isoformat(),
-                    "image_url": image_url,
-                    "annotated_image_url": annotated_url
+                    "job_id": str(job.job_id),
+                    "device_id": device_id,
+                    "status_url": request.build_absolute_uri(
+                        reverse("capture_job_status", args=[job.job_id])
+                    ),
                 }
-            }, status=status.HTTP_201_CREATED)
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        try:
+            payload = ingest_capture(device_id, image_file, request.build_absolute_uri, retry_key=retry_key)
+            
+            if payload["status"] == "no_detection":
+                return Response(payload, status=status.HTTP_200_OK)
+            return Response(payload, status=status.HTTP_201_CREATED)
             
         except FileNotFoundError as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -450,6 +353,52 @@ class CapturedImageView(APIView):
             return Response({"error": f"Classification error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class CaptureJobStatusView(APIView):
+    """Report the state and result of an asynchronous capture job."""
+    permission_classes = [AllowAny]
+    
+    def get(self, request, job_id):
+        job = get_object_or_404(CaptureJob.objects.select_related('device'), job_id=job_id)
+        
+        return Response({
+            "job_id": str(job.job_id),
+            "device_id": job.device.device_id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "created_at": job.created_at.isoformat(),
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "result": job.result,
+            "error": job.error or None,
+        }, status=status.HTTP_200_OK)
+
+
+def visible_captures(user):
+    """
+    Captures `user` may see: rangers see all, device owners their own
+    devices, everyone else (anonymous included) the last 24 hours.
+    """
+    queryset = CapturedImage.objects.all()
+    
+    if user.is_authenticated:
+        if hasattr(user, 'profile') and user.profile.user_type == 'ranger':
+            return queryset
+        owned_devices = Device.objects.filter(owned_by=user)
+        if owned_devices.exists():
+            return queryset.filter(device__in=owned_devices)
+    
+    from django.utils import timezone
+    from datetime import timedelta
+    last_24_hours = timezone.now() - timedelta(hours=24)
+    return queryset.filter(timestamp__gte=last_24_hours)
+
+
+def can_view_capture(request, pk):
+    """A signed link, or the capture list's visibility rules for this requester."""
+    if has_valid_signature(request, CapturedImage, pk):
+        return True
+    return visible_captures(request.user).filter(pk=pk).exists()
+
+
 class CapturedImageListView(generics.ListAPIView):
     """List captured images based on user access level.
     - Rangers: See all images from all devices
@@ -460,28 +409,7 @@ class CapturedImageListView(generics.ListAPIView):
     serializer_class = CapturedImageSerializer
     
     def get_queryset(self):
-        user = self.request.user
-        queryset = CapturedImage.objects.all()
-        
-        # Check user type
-        is_ranger = hasattr(user, 'profile') and user.profile.user_type == 'ranger'
-        
-        if is_ranger:
-            # Rangers see all images
-            pass
-        else:
-            # Check if user owns any devices
-            owned_devices = Device.objects.filter(owned_by=user)
-            
-            if owned_devices.exists():
-                # Device owners see only their device images
-                queryset = queryset.filter(device__in=owned_devices)
-            else:
-                # Public users without devices: see recent alerts (last 24 hours)
-                from django.utils import timezone
-                from datetime import timedelta
-                last_24_hours = timezone.now() - timedelta(hours=24)
-                queryset = queryset.filter(timestamp__gte=last_24_hours)
+        queryset = visible_captures(self.request.user)
         
         # Filter by device_id
         device_id = self.request.query_params.get('device_id')
@@ -493,6 +421,23 @@ class CapturedImageListView(generics.ListAPIView):
         if animal_type:
             queryset = queryset.filter(animal_type=animal_type)
         
+        # Filter by any box in the frame (not just the best one), optionally
+        # with a minimum box confidence and a minimum number of such boxes
+        detected = self.request.query_params.get('detected')
+        if detected:
+            box_filter = Q(boxes__animal_type=detected)
+            min_confidence = self.request.query_params.get('min_confidence')
+            if min_confidence:
+                try:
+                    box_filter &= Q(boxes__confidence__gte=float(min_confidence))
+                except ValueError:
+                    pass
+            queryset = queryset.annotate(matching_boxes=Count('boxes', filter=box_filter)).filter(matching_boxes__gt=0)
+            
+            min_count = self.request.query_params.get('min_count')
+            if min_count and min_count.isdigit():
+                queryset = queryset.filter(matching_boxes__gte=int(min_count))
+        
         return queryset.order_by('-timestamp')
     
     def list(self, request, *args, **kwargs):
@@ -512,6 +457,172 @@ class CapturedImageListView(generics.ListAPIView):
         })
 
 
+class CapturedImageAnnotatedView(APIView):
+    """
+    Serve the annotated image, rendering it from stored detections on first
+    request. Needs the signed link handed out with the capture, or a capture
+    the requester could list.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request, pk):
+        if not can_view_capture(request, pk):
+            return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
+        captured_image = get_object_or_404(CapturedImage, pk=pk)
+        
+        if not captured_image.annotated_image and not captured_image.detections:
+            return Response({"error": "No detections stored for this image"}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            image_data = get_annotated_image_bytes(captured_image)
+        except FileNotFoundError:
+            return Response({"error": "Original image file is missing"}, status=status.HTTP_404_NOT_FOUND)
+        
+        response = HttpResponse(image_data, content_type="image/jpeg")
+        # Access may come from the JWT alone, so shared caches must not keep
+        # it; short-lived because reclassify_captures can redraw the boxes
+        response["Cache-Control"] = "private, max-age=60"
+        response["Vary"] = "Authorization"
+        return response
+
+
+class DetectionEventImageView(APIView):
+    """
+    Serve the best annotated frame of a detection event. Alerts link here, so
+    the link shows the clearest frame of the visit even if it came later.
+    Alert links are signed; without a signature the best frame must be a
+    capture the requester could list.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request, pk):
+        event = get_object_or_404(DetectionEvent.objects.select_related('best_image'), pk=pk)
+        
+        if not has_valid_signature(request, DetectionEvent, pk) and not (
+            event.best_image_id and visible_captures(request.user).filter(pk=event.best_image_id).exists()
+        ):
+            return Response({"error": "Event not found"}, status=status.HTTP_404_NOT_FOUND)
+        
+        if event.best_image is None:
+            return Response({"error": "Event has no stored frame"}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            image_data = get_annotated_image_bytes(event.best_image)
+        except FileNotFoundError:
+            return Response({"error": "Original image file is missing"}, status=status.HTTP_404_NOT_FOUND)
+        
+        response = HttpResponse(image_data, content_type="image/jpeg")
+        response["Cache-Control"] = "private, max-age=60"  # Best frame may still change; access may be per user
+        response["Vary"] = "Authorization"
+        return response
+
+
+class CapturedImageDetectionsView(APIView):
+    """
+    Return the stored boxes so clients can draw the overlay themselves. Same
+    access rule as the annotated image: its signed link or a listable capture.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request, pk):
+        if not can_view_capture(request, pk):
+            return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
+        captured_image = get_object_or_404(CapturedImage, pk=pk)
+        
+        if not captured_image.detections:
+            return Response({"error": "No detections stored for this image"}, status=status.HTTP_404_NOT_FOUND)
+        
+        summary = unpack_detections(captured_image.detections)
+        return Response({
+            "id": captured_image.id,
+            "mode": summary["mode"],
+            "width": summary["size"][0],
+            "height": summary["size"][1],
+            "detections": summary["detections"],
+        }, status=status.HTTP_200_OK)
+
+
+# ==================== Inference Views ====================
+
+class InferenceStatsView(APIView):
+    """Report model versions, latency, batching and cache statistics for this worker process."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        from django.conf import settings
+        
+        stats = {
+            "model_registry": registry.stats(),
+            "batcher": get_batcher().stats(),
+            "annotation_cache": get_cache().stats(),
+            "burst_dedup": get_index().stats(),
+            "result_cache": result_cache.get_cache().stats(),
+            "shadow": None,
+            "cascade": None,
+            "capture_gate": None,
+            "service": None,
+        }
+        
+        if motion.is_enabled():
+            stats["capture_gate"] = motion.get_gate().stats()
+        if cascade.is_enabled():
+            stats["cascade"] = cascade.get_cascade().stats()
+        
+        evaluator = get_evaluator()
+        if evaluator is not None:
+            stats["shadow"] = evaluator.stats()
+        
+        if getattr(settings, 'INFERENCE_SERVICE_ADDRESS', ''):
+            from .inference_service import get_client
+            try:
+                stats["service"] = get_client().ping()
+            except Exception as e:
+                stats["service"] = {"error": str(e)}
+        
+        return Response(stats, status=status.HTTP_200_OK)
+
+
+class ReadinessView(APIView):
+    """
+    Readiness probe for the load balancer: 503 until this worker has loaded
+    and warmed up the model, 200 afterwards.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        from .warmup import get_state, is_enabled, is_ready
+        
+        state = get_state() if is_enabled() else {"status": "lazy"}
+        state.pop("pid", None)
+        ready = is_ready()
+        
+        return Response(
+            {"ready": ready, "warmup": state, "model_loaded": registry.is_loaded()},
+            status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+
+class MetricsView(APIView):
+    """
+    Prometheus scrape endpoint: capture stage timers, SQL query counts, queue
+    depths and model state of this worker. Requires `Authorization: Bearer
+    <METRICS_TOKEN>` when METRICS_TOKEN is set.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    def get(self, request):
+        from django.conf import settings
+        from django.utils.crypto import constant_time_compare
+        from .prometheus import render_metrics
+        
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if token and not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return HttpResponse("Unauthorized\n", status=401, content_type="text/plain")
+        
+        return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # ==================== Test View ====================
 
 class TestView(APIView):
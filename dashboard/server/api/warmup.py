@@ -0,0 +1,131 @@
+"""
+Model warm-up at worker start.
+
+Loading the checkpoint and running the first inferences (imports, graph
+optimisation, allocator growth) takes seconds, which the first capture after
+a deploy used to pay. When INFERENCE_WARMUP_ENABLED is set, `ApiConfig.ready`
+starts a background thread that loads the model and runs a few dummy frames
+through the same path captures use; the readiness endpoint reports not-ready
+until it finishes, so the load balancer only routes to warm workers.
+"""
+
+import os
+import sys
+import threading
+import time
+import traceback
+from django.conf import settings
+
+
+_state = {"status": "cold", "pid": None}
+_state_lock = threading.Lock()
+
+RETRY_FAILED_AFTER_SECONDS = 30
+
+# Programs (argv[0]) and server modules (also under `python -m`) that serve requests
+SERVER_PROGRAMS = ("gunicorn", "uwsgi", "uvicorn", "daphne", "hypercorn", "waitress-serve")
+SERVER_MODULES = ("gunicorn", "uwsgi", "mod_wsgi", "uvicorn", "daphne", "hypercorn", "waitress")
+
+
+def is_enabled():
+    return getattr(settings, 'INFERENCE_WARMUP_ENABLED', True)
+
+
+def should_warm_up_process():
+    """
+    Warm up in serving processes only: WSGI/ASGI servers, the runserver child
+    and the capture job worker. Anything else (migrate, shell, django-admin,
+    pytest, one-off scripts) loads the model lazily, if at all.
+    """
+    if not is_enabled():
+        return False
+    if any(module in sys.modules for module in SERVER_MODULES):
+        return True
+    if not sys.argv:
+        return False
+    program = os.path.basename(sys.argv[0])
+    if program in SERVER_PROGRAMS:
+        return True
+    if program not in ("manage.py", "django-admin"):
+        return False
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "runserver":
+        # The autoreloader parent only watches files
+        return os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv
+    return command == "process_capture_jobs"
+
+
+def warm_up(iterations=None):
+    """Load the model (and the cascade gate) and run dummy frames through `predict_frame`."""
+    from . import cascade
+    from .inference import dummy_frame, predict_frame
+
+    iterations = iterations or getattr(settings, 'INFERENCE_WARMUP_ITERATIONS', 2)
+    frame = dummy_frame()
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        predict_frame(frame)
+        if cascade.is_enabled():
+            cascade.get_cascade().predict_gate(frame)
+        timings.append(round(time.perf_counter() - started, 4))
+    return timings
+
+
+def _run():
+    started = time.perf_counter()
+    try:
+        timings = warm_up()
+    except Exception as e:
+        traceback.print_exc()
+        with _state_lock:
+            _state.update(status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+        print(f"Model warm-up failed: {e}")
+        return
+
+    seconds = time.perf_counter() - started
+    with _state_lock:
+        _state.update(
+            status="ready",
+            warmup_seconds=round(seconds, 4),
+            inference_seconds=timings,
+            finished_at=time.time(),
+        )
+    print(f"Model warm-up finished in {seconds:.2f}s (dummy inferences: {timings})")
+
+
+def start_warmup(retry=False):
+    """Start warm-up in a background thread, once per process (or again after a failure with `retry`)."""
+    with _state_lock:
+        if _state["pid"] == os.getpid() and not (retry and _state["status"] == "failed"):
+            return
+        # Also covers forked workers (e.g. gunicorn --preload), which start over in their own process
+        _state.clear()
+        _state.update(status="warming", pid=os.getpid(), started_at=time.time())
+
+    threading.Thread(target=_run, name="model-warmup", daemon=True).start()
+
+
+def get_state():
+    """
+    Warm-up state of this process. Starts warm-up if it never ran here, and
+    retries a failed one (e.g. the inference service was not up yet).
+    """
+    if is_enabled():
+        if _state["pid"] != os.getpid():
+            start_warmup()
+        elif _state["status"] == "failed" and time.time() - _state["finished_at"] > RETRY_FAILED_AFTER_SECONDS:
+            start_warmup(retry=True)
+    with _state_lock:
+        return dict(_state)
+
+
+def is_ready(start=True):
+    """Whether this process has warmed up; `start=False` only reads the state, never starting warm-up."""
+    if not is_enabled():
+        return True  # Lazy loading: the first capture loads the model
+    if start:
+        return get_state()["status"] == "ready"
+    with _state_lock:
+        return _state["pid"] == os.getpid() and _state["status"] == "ready"
@@ -2,6 +2,7 @@
 Django settings for server project with MySQL and JWT configured.
 """
 
+import json
 from pathlib import Path
 from datetime import timedelta
 from decouple import config, Csv
@@ -150,3 +151,139 @@ TWILIO_ACCOUNT_SID = config("TWILIO_ACCOUNT_SID", default="")
 TWILIO_AUTH_TOKEN = config("TWILIO_AUTH_TOKEN", default="")
 TWILIO_PHONE_NUMBER = config("TWILIO_PHONE_NUMBER", default="")  # For voice calls
 TWILIO_WHATSAPP_NUMBER = config("TWILIO_WHATSAPP_NUMBER", default="")  # For WhatsApp messages
+
+# YOLO inference
+# Defaults to best_models/best.pt at the repository root
+YOLO_MODEL_PATH = config("YOLO_MODEL_PATH", default=str(BASE_DIR.parent.parent / "best_models" / "best.pt"))
+# pytorch (ultralytics), onnx (ONNX Runtime) or openvino; exports are cached next to best.pt
+INFERENCE_BACKEND = config("INFERENCE_BACKEND", default="pytorch")
+# fp32, or int8 for the onnx/openvino variant built by: python manage.py quantize_model
+INFERENCE_PRECISION = config("INFERENCE_PRECISION", default="fp32")
+INFERENCE_IMAGE_SIZE = config("INFERENCE_IMAGE_SIZE", cast=int, default=384)  # imgsz=360 rounded up to stride 32
+INFERENCE_THREADS = config("INFERENCE_THREADS", cast=int, default=0)  # 0 = runtime default
+# Host-specific threads, batch size and input size written by: python manage.py tune_inference
+# (default: inference_tuning.json next to the checkpoint); applied at startup to
+# the settings not set explicitly in the environment or .env
+INFERENCE_TUNING_FILE = config("INFERENCE_TUNING_FILE", default="")
+# Workers check this often whether YOLO_MODEL_PATH was replaced and hot-swap to
+# the new checkpoint in the background (0 disables); see promote_model
+MODEL_RELOAD_CHECK_SECONDS = config("MODEL_RELOAD_CHECK_SECONDS", cast=float, default=5)
+# Candidate checkpoint evaluated in shadow on live captures (empty = none)
+YOLO_SHADOW_MODEL_PATH = config("YOLO_SHADOW_MODEL_PATH", default="")
+SHADOW_MAX_PENDING = config("SHADOW_MAX_PENDING", cast=int, default=4)
+# Region-specific checkpoints: JSON list of
+# {"name": ..., "bbox": [south, west, north, east], "model": "north.pt"}
+# (Device.model_path overrides per device). Loaded models share an LRU bounded
+# by count and by weights size
+MODEL_REGION_ROUTES = config("MODEL_REGION_ROUTES", default="[]", cast=json.loads)
+MODEL_REGISTRY_MAX_MODELS = config("MODEL_REGISTRY_MAX_MODELS", cast=int, default=4)
+MODEL_REGISTRY_MAX_MB = config("MODEL_REGISTRY_MAX_MB", cast=int, default=1024)
+# Cascade inference: a cheap gate (a small checkpoint, or the capture model at a
+# lower input size) screens each frame; only frames whose top confidence falls
+# between the low and high thresholds run the full model. A sample of gate
+# decisions is re-checked by the full model to measure missed detections
+CASCADE_ENABLED = config("CASCADE_ENABLED", cast=bool, default=False)
+CASCADE_GATE_MODEL_PATH = config("CASCADE_GATE_MODEL_PATH", default="")
+CASCADE_GATE_IMAGE_SIZE = config("CASCADE_GATE_IMAGE_SIZE", cast=int, default=192)
+CASCADE_LOW_CONFIDENCE = config("CASCADE_LOW_CONFIDENCE", cast=float, default=0.1)
+CASCADE_HIGH_CONFIDENCE = config("CASCADE_HIGH_CONFIDENCE", cast=float, default=0.7)
+CASCADE_AUDIT_RATE = config("CASCADE_AUDIT_RATE", cast=float, default=0.02)
+# Motion and quality gate before inference: dark, blurred or unchanged frames
+# (vs. a running per-device background) get the no-detection response without
+# a model pass. Devices can override the minimums; one frame per keyframe
+# interval is always classified
+CAPTURE_GATE_ENABLED = config("CAPTURE_GATE_ENABLED", cast=bool, default=False)
+CAPTURE_GATE_MIN_FOREGROUND = config("CAPTURE_GATE_MIN_FOREGROUND", cast=float, default=0.01)
+CAPTURE_GATE_MIN_BRIGHTNESS = config("CAPTURE_GATE_MIN_BRIGHTNESS", cast=float, default=15)
+CAPTURE_GATE_MIN_SHARPNESS = config("CAPTURE_GATE_MIN_SHARPNESS", cast=float, default=10)
+CAPTURE_GATE_PIXEL_DELTA = config("CAPTURE_GATE_PIXEL_DELTA", cast=float, default=25)
+CAPTURE_GATE_BACKGROUND_ALPHA = config("CAPTURE_GATE_BACKGROUND_ALPHA", cast=float, default=0.1)
+CAPTURE_GATE_KEYFRAME_SECONDS = config("CAPTURE_GATE_KEYFRAME_SECONDS", cast=float, default=60)
+# Decode uploads straight to the model input size (JPEG DCT scaling + letterbox);
+# the stored original is untouched
+CAPTURE_PRERESIZE_ENABLED = config("CAPTURE_PRERESIZE_ENABLED", cast=bool, default=True)
+# Load the model and run dummy inferences when a serving process starts;
+# /api/health/ready/ returns 503 until this is done
+INFERENCE_WARMUP_ENABLED = config("INFERENCE_WARMUP_ENABLED", cast=bool, default=True)
+INFERENCE_WARMUP_ITERATIONS = config("INFERENCE_WARMUP_ITERATIONS", cast=int, default=2)
+
+# Bearer token required by the Prometheus /metrics endpoint (empty = open)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Micro-batching of concurrent capture uploads
+INFERENCE_BATCHING_ENABLED = config("INFERENCE_BATCHING_ENABLED", cast=bool, default=True)
+INFERENCE_MAX_BATCH_SIZE = config("INFERENCE_MAX_BATCH_SIZE", cast=int, default=8)
+INFERENCE_MAX_WAIT_MS = config("INFERENCE_MAX_WAIT_MS", cast=float, default=10)
+
+# Standalone inference service (python manage.py run_inference_service)
+# Leave the address empty to run inference inside the Django workers
+INFERENCE_SERVICE_ADDRESS = config("INFERENCE_SERVICE_ADDRESS", default="")
+# Required when the address is host:port; a local socket falls back to SECRET_KEY
+INFERENCE_SERVICE_AUTHKEY = config("INFERENCE_SERVICE_AUTHKEY", default="")
+INFERENCE_SERVICE_WORKERS = config("INFERENCE_SERVICE_WORKERS", cast=int, default=0)  # 0 = one per CPU core
+INFERENCE_SERVICE_SHARED_MEMORY = config("INFERENCE_SERVICE_SHARED_MEMORY", cast=bool, default=True)
+INFERENCE_SERVICE_TIMEOUT = config("INFERENCE_SERVICE_TIMEOUT", cast=float, default=30)
+
+# Asynchronous capture ingestion (accept with 202, classify from the job queue)
+# Devices can also opt in per request with ?async=1
+CAPTURE_ASYNC_ENABLED = config("CAPTURE_ASYNC_ENABLED", cast=bool, default=False)
+CAPTURE_JOB_IN_PROCESS_WORKER = config("CAPTURE_JOB_IN_PROCESS_WORKER", cast=bool, default=True)
+CAPTURE_JOB_WORKER_THREADS = config("CAPTURE_JOB_WORKER_THREADS", cast=int, default=1)
+CAPTURE_JOB_MAX_ATTEMPTS = config("CAPTURE_JOB_MAX_ATTEMPTS", cast=int, default=3)
+# Failed jobs wait this long before their first retry, doubling with each attempt
+CAPTURE_JOB_RETRY_BACKOFF_SECONDS = config("CAPTURE_JOB_RETRY_BACKOFF_SECONDS", cast=float, default=5)
+CAPTURE_JOB_STALE_SECONDS = config("CAPTURE_JOB_STALE_SECONDS", cast=int, default=300)
+
+# Annotated images: "lazy" renders them from stored detections on first request,
+# "eager" renders and stores them at ingest
+ANNOTATION_RENDER_MODE = config("ANNOTATION_RENDER_MODE", default="lazy")
+ANNOTATION_CACHE_DIR = config("ANNOTATION_CACHE_DIR", default=str(MEDIA_ROOT / "annotated_cache"))
+ANNOTATION_CACHE_MEMORY_MB = config("ANNOTATION_CACHE_MEMORY_MB", cast=int, default=32)
+ANNOTATION_CACHE_DISK_MB = config("ANNOTATION_CACHE_DISK_MB", cast=int, default=512)
+
+# Burst dedup: near-identical frames (perceptual hash within THRESHOLD of 64
+# bits) from the same device within WINDOW_SECONDS reuse the earlier result
+CAPTURE_DEDUP_ENABLED = config("CAPTURE_DEDUP_ENABLED", cast=bool, default=True)
+CAPTURE_DEDUP_THRESHOLD = config("CAPTURE_DEDUP_THRESHOLD", cast=int, default=6)
+CAPTURE_DEDUP_WINDOW_SECONDS = config("CAPTURE_DEDUP_WINDOW_SECONDS", cast=float, default=10)
+
+# Byte-identical upload retries (same device, same SHA-256) return the original
+# result for this long instead of being classified and stored again
+CAPTURE_RESULT_CACHE_ENABLED = config("CAPTURE_RESULT_CACHE_ENABLED", cast=bool, default=True)
+CAPTURE_RESULT_CACHE_TTL_SECONDS = config("CAPTURE_RESULT_CACHE_TTL_SECONDS", cast=int, default=600)
+CAPTURE_RESULT_CACHE_MAX_ENTRIES = config("CAPTURE_RESULT_CACHE_MAX_ENTRIES", cast=int, default=1024)
+
+# With subscriptions off, alert recipients are matched from an in-memory NumPy
+# table of profile coordinates (one vectorized pass per alert) instead of a
+# query per user type.
+# Lookups re-read profiles changed since the last sync (minus the lookback) at
+# most every sync interval, and reload the whole table every reload interval
+RECIPIENT_TABLE_ENABLED = config("RECIPIENT_TABLE_ENABLED", cast=bool, default=True)
+RECIPIENT_SYNC_LOOKBACK_SECONDS = config("RECIPIENT_SYNC_LOOKBACK_SECONDS", cast=int, default=60)
+RECIPIENT_SYNC_INTERVAL_SECONDS = config("RECIPIENT_SYNC_INTERVAL_SECONDS", cast=float, default=5)
+RECIPIENT_RELOAD_INTERVAL_SECONDS = config("RECIPIENT_RELOAD_INTERVAL_SECONDS", cast=float, default=900)
+
+# Alerts read each device's recipients from precomputed AlertSubscription rows,
+# kept current as devices and homes move (rebuild: python manage.py rebuild_alert_subscriptions).
+# This is the default recipient path; the recipient table above is its fallback
+ALERT_SUBSCRIPTIONS_ENABLED = config("ALERT_SUBSCRIPTIONS_ENABLED", cast=bool, default=True)
+
+# Detection events: frames of the same species from a device that arrive within
+# this many seconds of each other form one visit and alert once
+DETECTION_EVENT_WINDOW_SECONDS = config("DETECTION_EVENT_WINDOW_SECONDS", cast=int, default=120)
+
+# Registry loads, evictions and hot swaps and reclassify skips log under "api";
+# INFO and up go to the console so log aggregation picks them up
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "default": {"format": "%(asctime)s %(levelname)s %(process)d %(threadName)s %(name)s: %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "default"},
+    },
+    "loggers": {
+        "api": {"handlers": ["console"], "level": config("API_LOG_LEVEL", default="INFO"), "propagate": False},
+    },
+}